@@ -1,20 +1,17 @@
 import imagehash
 from PIL import Image, ImageDraw, ImageGrab
+from image_fingerprint import default_hasher
 
 
-def are_images_similar(image_path1, image_path2, threshold=0.95):
+def are_images_similar(image_path1, image_path2, threshold=0.95, hasher=None):
     """
-    Compares two images using perceptual hash to determine if they are similar.
+    Compares two images using perceptual hash to determine if they are similar. hasher is the
+    image_fingerprint.ImageHasher whose cache is used, by default the shared one.
     Returns:
     - True if images are considered the same, False otherwise.
     """
-    # Open the images
-    image1 = Image.open(image_path1)
-    image2 = Image.open(image_path2)
-
-    # Calculate hash for both images
-    hash1 = imagehash.phash(image1)
-    hash2 = imagehash.phash(image2)
+    # Calculate hash for both images, decoded in parallel and cached by content
+    hash1, hash2 = (hasher or default_hasher).hash_images([image_path1, image_path2], 'perceptual')
 
     # Calculate the similarity (normalized Hamming distance)
     # Normalize by dividing by the maximum possible Hamming distance (64 for phash)
@@ -60,29 +57,16 @@ def overlay_boxes_on_image(image_path, blue_boxes, red_boxes, green_boxes, purpl
 
 
 # Displaying stuff
-def compare_images(file1, file2, threshold=0.9, target_size=(8, 8)):
-    """Compares images using image hashing (average hash).
+def compare_images(file1, file2, threshold=0.9, target_size=(8, 8), reducing_gap=None, hasher=None):
+    """Compares images using image hashing (average hash). A reducing_gap trades a little accuracy for speed, see
+    image_fingerprint.ImageHasher.average_hash. hasher is the ImageHasher whose cache is used, by default the shared
+    one.
     Returns:
         A boolean indicating whether the images are similar above the specified threshold.
     """
-    # Open the images
-    if isinstance(file1, str):
-        image1 = Image.open(file1)
-    else:
-        image1 = Image.open(file1)
-
-    if isinstance(file2, str):
-        image2 = Image.open(file2)
-    else:
-        image2 = Image.open(file2)
-
-    # Resize the images
-    image1 = image1.resize(target_size)
-    image2 = image2.resize(target_size)
-
-    # Calculate the average hash for each image
-    hash1 = imagehash.average_hash(image1)
-    hash2 = imagehash.average_hash(image2)
+    # Calculate the average hash of both images resized to target_size, decoded in parallel and cached by content
+    hash1, hash2 = (hasher or default_hasher).hash_images([file1, file2], 'average', target_size=target_size,
+                                                          reducing_gap=reducing_gap)
 
     # Calculate the similarity and convert it to a percentage
     similarity = hash1 - hash2
@@ -0,0 +1,93 @@
+import os
+from typing import Iterable, List, NamedTuple
+from node import Node
+from image_fingerprint import ImageHasher
+from detectors import analyze_scenario
+from results_folder import save_scenario_results
+from results_sink import scenario_record
+from scenario import ScenarioContext
+from scenario_cache import DEFAULT_CACHE_SIZE, DEFAULT_MEMORY_CACHE_SIZE, MemoryScenarioCache, ScenarioCache
+
+
+class Findings(NamedTuple):
+    """Problematic dynamic content changes of a scenario, in the order of the analysis results tuple"""
+    short_lived: List[Node]
+    disappearing: List[Node]
+    appearing: List[Node]
+    moving: List[Node]
+    attributes_changed: List[Node]
+    window_changed: bool
+
+    @property
+    def results(self) -> tuple:
+        """The results tuple localizer.py saves, without window_changed"""
+        return self[:5]
+
+    def count(self) -> int:
+        return sum(len(nodes) for nodes in self.results)
+
+    def to_record(self, scenario: str) -> dict:
+        """Flattens the findings of a scenario folder or base path into the JSON-compatible record results.jsonl
+        stores"""
+        return scenario_record(scenario_base_path(scenario), self.window_changed, self.results)
+
+
+def scenario_base_path(scenario: str) -> str:
+    """Returns the base path of a scenario given as its folder or as a base path. Base paths are the scenario folder
+    followed by the scenario name, like those of utils.get_base_paths"""
+    scenario = scenario.replace(os.sep, '/').rstrip('/')
+    if os.path.isdir(scenario):
+        return f"{scenario}/{os.path.basename(scenario)}"
+    return scenario
+
+
+class Analyzer:
+    """Analyzes scenarios in-process, e.g. right after each capture, without starting a new localizer run.
+
+    Parsed scenarios and screenshot hashes are kept in memory between calls, up to memory_cache_size bytes of
+    scenarios, so analyzing a scenario again only pays for what changed. cache_dir also keeps them on disk between
+    processes, like localizer.py --cache-dir. With cache_scenarios=False only the screenshot hashes are kept, e.g.
+    for uploaded scenarios that are never analyzed twice."""
+    def __init__(self, cache_dir: str = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                 memory_cache_size: int = DEFAULT_MEMORY_CACHE_SIZE, cache_scenarios: bool = True):
+        self.cache = None
+        if cache_scenarios:
+            self.cache = MemoryScenarioCache(memory_cache_size,
+                                             ScenarioCache(cache_dir, cache_size) if cache_dir else None)
+        self.hasher = ImageHasher(os.path.join(cache_dir, "images") if cache_dir else None)
+
+    def load(self, scenario: str) -> ScenarioContext:
+        """Loads the frames and events of a scenario folder or base path"""
+        return ScenarioContext.from_base_path(scenario_base_path(scenario), self.cache, self.hasher)
+
+    def analyze(self, scenario) -> Findings:
+        """Analyzes a scenario given as its folder, its base path or a ScenarioContext returned by load(). Detectors
+        update the nodes of the context, so a context is only analyzed once"""
+        ctx = scenario if isinstance(scenario, ScenarioContext) else self.load(scenario)
+        return Findings(*analyze_scenario(ctx), bool(ctx.wc))
+
+    def analyze_many(self, scenarios: Iterable):
+        """Analyzes scenarios one after the other, yielding (scenario, findings) as each one finishes"""
+        for scenario in scenarios:
+            yield scenario, self.analyze(scenario)
+
+    def save(self, scenario: str, findings: Findings, images: str = "render", image_format: str = "png") -> None:
+        """Writes results.txt and the result images of a scenario to the results folder, like localizer.py"""
+        save_scenario_results(scenario_base_path(scenario), findings.window_changed, findings.results, images,
+                              image_format)
+
+    def close(self) -> None:
+        self.hasher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def analyze(scenario, cache_dir: str = None) -> Findings:
+    """Analyzes a single scenario given as its folder, its base path or a loaded ScenarioContext. Use an Analyzer to
+    keep the caches warm between scenarios"""
+    with Analyzer(cache_dir) as analyzer:
+        return analyzer.analyze(scenario)
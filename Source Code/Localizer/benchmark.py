@@ -0,0 +1,153 @@
+import argparse
+import datetime
+import glob
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import image_fingerprint
+from event_log import parse_event_log
+from frame_diff import FrameDiff, save_node_states, restore_node_states
+from detectors import (get_appearing_elements, get_attributes_changed_elements, get_disappearing_elements,
+                       get_moving_elements, get_short_lived_elements)
+from overlay_renderer import IMAGE_FORMATS, overlay_spec, render_overlays
+from run_manifest import code_version
+from scenario import ScenarioContext
+from synthetic_scenarios import generate_scenario
+from utils import compare_images, get_problematic_dynamic_content_changes, import_data, load_all_elements
+
+BENCHMARK_RESULTS = "benchmark_results.jsonl"
+
+
+def time_stage(function, repeat: int, setup=None) -> dict:
+    """Runs function repeat times, calling setup untimed before each run, and returns its timings in seconds and
+    the size of its last result"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    count = len(result) if hasattr(result, '__len__') else None
+    return {"min": min(timings), "median": statistics.median(timings), "runs": repeat, "count": count}
+
+
+def benchmark_scenario(base_path: str, repeat: int, image_format: str = "png") -> dict:
+    """Times every stage of the analysis of a scenario and returns {stage: timings}"""
+    folder = os.path.dirname(base_path)
+    dumps = [glob.glob(f"{folder}/*{suffix}")[0] for suffix in (".1-a11y.xml", ".action-a11y.xml", ".3-a11y.xml")]
+    frames = [glob.glob(f"{folder}/*{suffix}")[0] for suffix in (".1.png", ".action.2.png", ".3.png")]
+    stages = dict()
+
+    # Parsing
+    stages["parse_events"] = time_stage(lambda: parse_event_log(glob.glob(f"{folder}/*-ev.txt")[0]).events, repeat)
+    stages["parse_xml"] = time_stage(lambda: [node for dump in dumps for node in load_all_elements(dump)], repeat)
+    stages["compare_images"] = time_stage(lambda: [compare_images(frames[0], frames[2])], repeat,
+                                          setup=image_fingerprint.clear_memory_cache)
+    stages["import_data"] = time_stage(lambda: import_data(base_path), repeat,
+                                       setup=image_fingerprint.clear_memory_cache)
+    ctx = ScenarioContext.from_base_path(base_path)
+
+    # Detectors, each on the node states left by loading the scenario
+    states = save_node_states(ctx)
+    reset = lambda: restore_node_states(states)
+    isn, icn = ctx.is_scrolling_new_content, ctx.is_click_new_window
+    detectors = {
+        "appearing": lambda: get_appearing_elements(ctx, isn, icn, ctx.is_significant_content, ctx.is_focus_changed),
+        "moving": lambda: get_moving_elements(ctx),
+        "short_lived": lambda: get_short_lived_elements(ctx),
+        "attributes_changed": lambda: get_attributes_changed_elements(ctx, ctx.target_elements_1,
+                                                                      ctx.target_element_middle,
+                                                                      ctx.target_elements_2),
+        "disappearing": lambda: get_disappearing_elements(ctx, isn, icn, ctx.is_significant_content,
+                                                          ctx.is_focus_changed),
+    }
+    for name, detector in detectors.items():
+        stages[f"detector_{name}"] = time_stage(detector, repeat, setup=reset)
+    stages["frame_diff"] = time_stage(lambda: FrameDiff(ctx).classify(), repeat, setup=reset)
+
+    # Filter stage, on a copy of the changes since it returns new lists
+    reset()
+    changes = FrameDiff(ctx).classify()
+    stages["filter"] = time_stage(
+        lambda: get_problematic_dynamic_content_changes(list(changes.attributes_changed), list(changes.moving),
+                                                        list(changes.short_lived), list(changes.disappearing),
+                                                        list(changes.appearing), ctx.target_elements_1,
+                                                        ctx.target_elements_2)[0],
+        repeat)
+
+    # Rendering, with the boxes of all changes so every category is drawn
+    regions = [[node.bounds for node in nodes] for nodes in (changes.short_lived, changes.disappearing,
+                                                              changes.appearing, changes.moving,
+                                                              changes.attributes_changed)]
+    spec = overlay_spec(frames, regions)
+    output_folder = tempfile.mkdtemp(prefix="render_", dir=folder)
+    stages["render"] = time_stage(lambda: [render_overlays(spec, output_folder, image_format)], repeat)
+    shutil.rmtree(output_folder)
+    reset()
+    return stages
+
+
+def load_previous(path: str) -> dict:
+    """Returns the last recorded timings of each case and stage in a results file"""
+    previous = dict()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.endswith('\n'):
+                    record = json.loads(line)
+                    previous[(json.dumps(record["case"], sort_keys=True), record["stage"])] = record
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the localizer stages on synthetic scenarios of growing size")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[250, 1000, 4000],
+                        help="Nodes per frame (default: 250 1000 4000)")
+    parser.add_argument("--depth", type=int, nargs="+", default=[8], help="Maximum depth of the frames (default: 8)")
+    parser.add_argument("--events", type=int, nargs="+", default=[200, 2000],
+                        help="Events per scenario (default: 200 2000)")
+    parser.add_argument("--change-rate", type=float, default=0.05,
+                        help="Fraction of the leaves changed between frames (default: 0.05)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each stage, the median is reported (default: 5)")
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS), default="png")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=BENCHMARK_RESULTS,
+                        help=f"JSON lines file the timings are appended to (default: {BENCHMARK_RESULTS})")
+    args = parser.parse_args()
+
+    previous = load_previous(args.output)
+    run = {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'), "code_version": code_version(),
+           "python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform(),
+           "cpu_count": os.cpu_count(), "repeat": args.repeat}
+    dataset = tempfile.mkdtemp(prefix="localizer_benchmark_")
+    try:
+        with open(args.output, 'a', encoding='utf-8') as output:
+            for nodes, depth, events in itertools.product(args.nodes, args.depth, args.events):
+                case = {"nodes": nodes, "depth": depth, "events": events, "change_rate": args.change_rate,
+                        "seed": args.seed}
+                name = f"n{nodes}_d{depth}_e{events}"
+                base_path = generate_scenario(f"{dataset}/synthetic/{name}", nodes, depth, events, args.change_rate,
+                                              seed=args.seed)
+                print(f"{name}:")
+                for stage, timings in benchmark_scenario(base_path, args.repeat, args.image_format).items():
+                    record = {"run": run, "case": case, "stage": stage, **timings}
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    change = ""
+                    last = previous.get((json.dumps(case, sort_keys=True), stage))
+                    if last is not None and last["median"] > 0:
+                        change = f"  {timings['median'] / last['median']:.2f}x previous"
+                    print(f"  {stage:<28}{timings['median'] * 1000:10.2f} ms{change}")
+    finally:
+        shutil.rmtree(dataset)
+
+
+if __name__ == "__main__":
+    main()
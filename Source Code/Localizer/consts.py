@@ -1,6 +1,14 @@
 DATASET_FOLDER = "app_scenarios"
 RESULTS_FOLDER = "results"
 RESULTS_PICKLE = "results.pickle"
+RESULTS_JSONL = "results.jsonl"
+RESULTS_DB = "results.sqlite"
+STAGE_TIMINGS = "stage_timings.jsonl"
+RESULTS_MANIFEST = "results_manifest.json"
+CACHE_FOLDER = ".scenario_cache"
+# Dumps taken between the action and the final dump, e.g. name.action-2-a11y.xml, numbered in timeline order
+TIMELINE_DUMP_PATTERN = '*.action-*-a11y.xml'
+TIMELINE_DUMP_REGEX = r'\.action-(\d+)-a11y\.xml$'
 BOUNDS_REGEX = r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]'
 SCREEN_BOUNDS = (0, 0, 1090, 2340)
 TOP_NAV_BAR_BOUNDS = (0, 66, 1080, 287)
@@ -0,0 +1,229 @@
+import json
+from collections import defaultdict
+from frame_diff import ChangeSet, FrameDiff, save_node_states, restore_node_states
+from instrumentation import span
+from node import Node, A11yFocusedStatus
+from scenario import ScenarioContext
+from utils import bounds_near_each_other, define_a11y_focus, define_a11y_focus_appearing_disappearing, \
+    filter_contained_elements, get_problematic_dynamic_content_changes, hash_nodes, in_bounds_2, \
+    is_within_nav_bars, is_within_refreshed_area, nodes_to_important_attrs_list
+
+
+def get_short_lived_elements(ctx: ScenarioContext) -> list:
+    """Returns a list of short-lived elements"""
+    # Create sets for quick lookup of elements by their unique identifiers in the first and last frames.
+    unique_identifiers_first = {element.identifier_group_alternative for element in ctx.target_elements_1}
+    unique_identifiers_last = {element.identifier_group_alternative for element in ctx.target_elements_2}
+
+    # Paper definition: "If the element S1 is not present in the first frame, and its container is observed
+    # in the second frame". With more intermediate frames, elements are taken from the frame they appear in
+    potential_short_lived = []
+    reported = set()
+    frames = [ctx.target_elements_1, ctx.target_element_middle, *ctx.intermediate_frames]
+    for previous_frame, frame in zip(frames, frames[1:]):
+        unique_identifiers_previous = {element.identifier_group_alternative for element in previous_frame}
+        found = [element for element in frame
+                 if element.identifier_group_alternative not in unique_identifiers_previous and
+                 element.identifier_group_alternative not in unique_identifiers_first and
+                 element.identifier_group_alternative not in unique_identifiers_last and
+                 element.identifier_group_alternative not in reported and
+                 element.parent.identifier_group_alternative in unique_identifiers_last and
+                 is_within_refreshed_area(element, ctx.refreshed_areas)]
+        potential_short_lived += found
+        reported.update(element.identifier_group_alternative for element in found)
+
+    # Potential short-lived elements are already refined by whether they are within refreshed areas.
+    short_lived_elements = potential_short_lived
+    define_a11y_focus(short_lived_elements, ctx.last_focused_bounds, ctx.accessibility_focuses)
+    return short_lived_elements
+
+
+def get_disappearing_elements(ctx: ScenarioContext, is_scrolling_new_content: bool, is_click_new_window: bool,
+                              is_significant_content: bool, is_focus_changed: bool) -> list:
+    """Returns a list of elements that are present in the initial state but not in the middle or final states."""
+    # Identifiers for elements in the final state for quick lookup
+    identifiers_in_final = {i.identifier_group for i in ctx.target_elements_2}
+
+    disappearing_content = []
+    if (is_significant_content and not is_focus_changed) or not is_significant_content:
+        if is_click_new_window:
+            # If the screen is different, focus on elements disappearing from the middle to the final frame
+            disappearing_content = [element for element in ctx.target_element_middle
+                                    if element.identifier_group not in identifiers_in_final and
+                                    in_bounds_2(ctx.refreshed_areas, element.bounds[0])]
+        elif is_scrolling_new_content == False and is_click_new_window == False:
+            # Elements in the initial state that do not appear in the final state
+            disappearing_content = [element for element in ctx.target_elements_1
+                                    if element.identifier_group not in identifiers_in_final and
+                                    in_bounds_2(ctx.refreshed_areas, element.bounds[0])]
+        # Adjust accessibility focus status if needed
+        if disappearing_content and ctx.accessibility_focuses:
+            define_a11y_focus_appearing_disappearing(disappearing_content, ctx.last_focused_bounds, ctx.accessibility_focuses, ctx.last_clicked_bounds)
+        disappearing_content = filter_contained_elements(disappearing_content)
+    return disappearing_content
+
+
+def get_appearing_elements(ctx: ScenarioContext, is_scrolling_new_content: bool, is_click_new_window: bool,
+                           is_significant_content: bool, is_focus_changed: bool) -> list:
+    """Returns a list of dynamically appearing elements that are not present in the initial state but appear in
+    the middle or final states."""
+    # Initial state identifiers for quick checks
+    identifiers_in_initial = {i.identifier_group for i in ctx.target_elements_1}
+
+    # Identifiers for elements that are in the middle state
+    identifiers_in_middle = {i.identifier_group for i in ctx.target_element_middle}
+
+    # Identifiers for elements that are in the final state
+    identifiers_in_final = {i.identifier_group for i in ctx.target_elements_2}
+
+    appearing_content = []
+    if (is_significant_content and not is_focus_changed) or not is_significant_content:
+        if is_click_new_window:
+            # Consider elements appearing in the final state but not in the middle as appearing content
+            appearing_content = [element for element in ctx.target_elements_2
+                                 if element.identifier_group not in identifiers_in_middle and
+                                 element.identifier_group in identifiers_in_final and
+                                 in_bounds_2(ctx.refreshed_areas, element.bounds[0])]
+        elif is_scrolling_new_content == False and is_click_new_window == False:
+            # Elements not in the initial state but appear in the middle or final states
+            appearing_content = [element for element in ctx.target_elements_2
+                                 if element.identifier_group not in identifiers_in_initial and
+                                 (
+                                             element.identifier_group in identifiers_in_middle or element.identifier_group in identifiers_in_final) and
+                                 in_bounds_2(ctx.refreshed_areas, element.bounds[0])]
+
+        # Adjust accessibility focus if needed
+        if appearing_content and ctx.accessibility_focuses:  # Check if not empty to avoid errors
+            define_a11y_focus_appearing_disappearing(appearing_content, ctx.last_focused_bounds, ctx.accessibility_focuses, ctx.last_clicked_bounds)
+        appearing_content = filter_contained_elements(appearing_content)
+    return appearing_content
+
+
+def get_moving_elements(ctx: ScenarioContext) -> list:
+    """Return a list of moving elements"""
+    moved_elements_set = set()
+
+    # Helper function to compare and mark moving elements
+    def compare_and_mark_moving(element, comparison_element):
+        error_margin = 100 if is_within_nav_bars(element.bounds) else 2000
+        if element.identifier_group_alternative == comparison_element.identifier_group_alternative:
+            if element.bounds != comparison_element.bounds and not bounds_near_each_other(element.bounds, comparison_element.bounds, error=error_margin):
+                moved_elements_set.add(element.identifier_group_alternative)
+                # Determine moving direction based on y-coordinate comparison
+                current_y = element.bounds[0][1]
+                previous_y = comparison_element.bounds[0][1]
+                if current_y > previous_y:
+                    element.moving_direction = 'Below'  # Moving downwards
+                elif current_y < previous_y:
+                    element.moving_direction = 'Above'  # Moving upwards
+                if element.a11yFocusedStatus == A11yFocusedStatus.AFTER and comparison_element.a11yFocusedStatus == A11yFocusedStatus.BEFORE:
+                    element.moving_from_above_to_below = True
+
+    # Group the comparison frame by identifier, since only elements with the same identifier can match
+    comparison_elements = ctx.target_element_middle if ctx.wc else ctx.target_elements_1
+    candidates_by_identifier = defaultdict(list)
+    for comparison_element in comparison_elements:
+        candidates_by_identifier[comparison_element.identifier_group_alternative].append(comparison_element)
+
+    # Compare elements between frames to identify moving elements
+    for element in ctx.target_elements_2:
+        for comparison_element in candidates_by_identifier.get(element.identifier_group_alternative, ()):
+            compare_and_mark_moving(element, comparison_element)
+
+    # Filter moving elements based on the set of moved elements
+    moving_content = [element for element in ctx.target_elements_2
+                      if element.identifier_group_alternative in moved_elements_set
+                      and element.important_for_accessibility == 'true' and is_within_refreshed_area(element, ctx.refreshed_areas)]
+    if moving_content and ctx.accessibility_focuses:  # Check if not empty to avoid errors
+        define_a11y_focus(moving_content, ctx.last_focused_bounds, ctx.accessibility_focuses)
+    moving_ids = {id(element) for element in moving_content}
+    for element in ctx.target_elements_2:
+        if id(element) not in moving_ids:
+            element.moving_direction = None
+    filtered_moving_elements = filter_contained_elements(moving_content)
+    return filtered_moving_elements
+
+
+def get_attributes_changed_elements(ctx: ScenarioContext, initial_screen_nodes, middle_screen_nodes, final_screen_nodes) -> list[Node]:
+    """Return a list of content modification elements that have changed attributes"""
+
+    # Hash all nodes from each screen and keep references to the nodes
+    initial_hashes, initial_nodes = hash_nodes(initial_screen_nodes)
+    middle_hashes, middle_nodes = hash_nodes(middle_screen_nodes)
+    final_hashes, final_nodes = hash_nodes(final_screen_nodes)
+
+    # Container for nodes with changed attributes, in the order of their keys so the filters keep the same node of
+    # a resource id in every run
+    changed_nodes = dict()
+    # Compare hash values across screens and identify changed nodes
+
+    if ctx.wc:
+        for key, hash_value in middle_hashes.items():
+            if key in final_hashes and hash_value != final_hashes[key]:
+                changed_nodes[middle_nodes[key]] = None
+    else:
+        for key, hash_value in initial_hashes.items():
+            if key in final_hashes and hash_value != final_hashes[key]:
+                changed_nodes[initial_nodes[key]] = None
+
+    define_a11y_focus(changed_nodes, ctx.last_focused_bounds, ctx.accessibility_focuses)
+    return list(changed_nodes)
+
+
+def detect_with_legacy_detectors(ctx: ScenarioContext) -> ChangeSet:
+    """Runs the per-category detectors above, which FrameDiff replaces"""
+    isn, icn = ctx.is_scrolling_new_content, ctx.is_click_new_window
+    with span("appearing") as stage:
+        appearing_nodes = get_appearing_elements(ctx, isn, icn, ctx.is_significant_content, ctx.is_focus_changed)
+        stage.count(findings=len(appearing_nodes))
+    with span("moving") as stage:
+        moving_nodes = get_moving_elements(ctx)
+        stage.count(findings=len(moving_nodes))
+    with span("short_lived") as stage:
+        short_lived_nodes = get_short_lived_elements(ctx)
+        stage.count(findings=len(short_lived_nodes))
+    with span("attributes_changed") as stage:
+        attributes_changed_nodes = get_attributes_changed_elements(ctx, ctx.target_elements_1,
+                                                                   ctx.target_element_middle, ctx.target_elements_2)
+        stage.count(findings=len(attributes_changed_nodes))
+    with span("disappearing") as stage:
+        disappearing_nodes = get_disappearing_elements(ctx, isn, icn, ctx.is_significant_content, ctx.is_focus_changed)
+        stage.count(findings=len(disappearing_nodes))
+    return ChangeSet(short_lived_nodes, disappearing_nodes, appearing_nodes, moving_nodes, attributes_changed_nodes)
+
+
+def analyze_scenario(ctx: ScenarioContext, legacy_detectors=False) -> tuple:
+    """Returns the problematic short-lived, disappearing, appearing, moving and attributes changed nodes of a
+    scenario"""
+    # Find accessibility issues
+    if not ctx.has_enough_data() or ctx.frames_unchanged():
+        return [], [], [], [], []
+    with span("detect_legacy" if legacy_detectors else "detect"):
+        changes = detect_with_legacy_detectors(ctx) if legacy_detectors else FrameDiff(ctx).classify()
+    with span("filter") as stage:
+        attributes_changed_nodes, moving_nodes, short_lived_nodes, disappearing_nodes, appearing_nodes = get_problematic_dynamic_content_changes(changes.attributes_changed,
+                                                                                                                                                 changes.moving,
+                                                                                                                                                 changes.short_lived, changes.disappearing, changes.appearing,
+                                                                                                                                                 ctx.target_elements_1, ctx.target_elements_2)
+        stage.count(findings=len(attributes_changed_nodes) + len(moving_nodes) + len(short_lived_nodes) +
+                    len(disappearing_nodes) + len(appearing_nodes))
+    return short_lived_nodes, disappearing_nodes, appearing_nodes, moving_nodes, attributes_changed_nodes
+
+
+def results_to_important_attrs(results: tuple) -> list:
+    short_lived_nodes, disappearing_nodes, appearing_nodes, moving_nodes, attributes_changed_nodes = results
+    return [nodes_to_important_attrs_list(short_lived_nodes), nodes_to_important_attrs_list(disappearing_nodes),
+            nodes_to_important_attrs_list(appearing_nodes), nodes_to_important_attrs_list(moving_nodes, is_moving=True),
+            # Compared regardless of their order
+            sorted(nodes_to_important_attrs_list(attributes_changed_nodes), key=lambda attrs: json.dumps(attrs, sort_keys=True))]
+
+
+def diff_engine_matches_legacy(ctx: ScenarioContext) -> bool:
+    """Checks that FrameDiff and the legacy detectors report the same findings for a scenario. Both run on the same
+    nodes, so their detection state is reset before and after each of them"""
+    states = save_node_states(ctx)
+    legacy_results = results_to_important_attrs(analyze_scenario(ctx, legacy_detectors=True))
+    restore_node_states(states)
+    engine_results = results_to_important_attrs(analyze_scenario(ctx))
+    restore_node_states(states)
+    return legacy_results == engine_results
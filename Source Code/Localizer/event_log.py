@@ -0,0 +1,171 @@
+import io
+import re
+from typing import NamedTuple, Optional
+import chardet
+
+LINE_REGEX = re.compile(r'(\d{2}-\d{2}) (\d{2}:\d{2}:\d{2}.\d{3}).*EventType: (\S*);.*EventTime: (\d*);.*boundsInScreen: ([^;]*);')
+RECT_REGEX = re.compile(r'Rect\((\d+), (\d+) - (\d+). (\d+)\)')
+EVENT_TYPE_REGEX = re.compile(r'EventType: (\S*);')
+
+FOLLOW_UP_EVENTS_SCROLL = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOW_CONTENT_CHANGED"}
+FOLLOW_UP_EVENTS_CLICK = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOWS_CHANGED"}
+WINDOW_CHANGE_EVENTS = ('TYPE_WINDOWS_CHANGED', 'TYPE_WINDOW_STATE_CHANGED')
+
+
+class EventRecord(NamedTuple):
+    """An event with bounds, indexable like a list of date, time, event type, event time, bounds and line"""
+    date: str
+    time: str
+    event_type: str
+    event_time: str
+    bounds: tuple
+    line: str
+
+
+class EventTypeRecord(NamedTuple):
+    """An event of any type, indexable like a tuple of event type and bounds"""
+    event_type: str
+    bounds: Optional[tuple]
+
+
+class EventLog:
+    """Everything import_data needs from an event log, collected in a single pass over the file"""
+    def __init__(self):
+        self.events = []
+        self.full_events = []
+        self.is_scrolling_new_content = False
+        self.is_click_new_window = False
+        self.last_focused_bounds = "Bounds not found."
+        self.last_clicked_bounds = "Bounds not found."
+        self.window_changed = False
+        self.is_accessibility_focus_changed = False
+
+
+def convert_to_tuple(bounds_str):
+    # Extract the substring that contains the numbers
+    start_index = bounds_str.find('Rect(') + len('Rect(')
+    numbers_str = bounds_str[start_index:-1]
+    # Use regular expression to find all numbers, including negatives
+    parts = re.findall(r'-?\d+', numbers_str)
+    # Convert parts to integers and create a tuple
+    bounds_tuple = tuple(int(part) for part in parts)
+    return bounds_tuple
+
+
+def extract_bounds(line: str):
+    """Returns the boundsInScreen of an event line, or "Bounds not found." """
+    start = line.find('boundsInScreen: Rect(')
+    if start != -1:
+        end = line.find(')', start) + 1
+        bounds = convert_to_tuple(line[start:end])
+        if bounds:
+            return bounds
+    return "Bounds not found."
+
+
+def parse_scroll_details(line):
+    details = {}
+    for part in line.split(";"):
+        if ":" in part:
+            key, value = part.split(":", 1)  # Split on first colon only
+            key = key.strip()
+            if key in ['ScrollDeltaX', 'ScrollDeltaY', 'FromIndex', 'ToIndex']:
+                try:
+                    details[key] = int(value.strip().split(" ")[0])
+                except ValueError:
+                    pass
+    return details
+
+
+def did_scroll_occur(scroll_details):
+    return scroll_details.get('ScrollDeltaX', 0) != 0 or scroll_details.get('ScrollDeltaY', 0) != 0
+
+
+def read_lines(path: str, raw_data: bytes = None) -> list:
+    """Reads the lines of a file as UTF-8, only falling back to chardet when decoding fails. raw_data is the content
+    of the file if it was already read"""
+    if raw_data is None:
+        with open(path, 'rb') as file:
+            raw_data = file.read()
+    try:
+        return io.TextIOWrapper(io.BytesIO(raw_data), encoding='utf-8').readlines()
+    except UnicodeDecodeError:
+        encoding = chardet.detect(raw_data)['encoding']
+        return io.TextIOWrapper(io.BytesIO(raw_data), encoding=encoding, errors='replace').readlines()
+
+
+def parse_event_log(path: str, raw_data: bytes = None) -> EventLog:
+    """Parses an event log once, deriving the events and all event-based flags of a scenario from it. raw_data is the
+    content of the log if it was already read"""
+    log = EventLog()
+    last_event_type = None
+    last_scroll_details = {}
+    clicked = False
+    last_focused_line = None
+    last_clicked_line = None
+
+    for line in read_lines(path, raw_data):
+        if not log.window_changed and (WINDOW_CHANGE_EVENTS[0] in line or WINDOW_CHANGE_EVENTS[1] in line):
+            log.window_changed = True
+        if "EventType:" not in line:
+            continue
+
+        # Events with bounds
+        if 'boundsInScreen: ' in line:
+            match = LINE_REGEX.match(line)
+            if match:
+                date, time, event_type, event_time, rect = match.groups()
+                match_rect = RECT_REGEX.match(rect)
+                if match_rect:
+                    log.events.append(EventRecord(date, time, event_type, event_time,
+                                                  tuple([int(i) for i in match_rect.groups()]), line))
+
+        # Events of any type
+        match = EVENT_TYPE_REGEX.search(line)
+        if match:
+            event_type = match.group(1)
+            coords = None
+            if event_type == 'TYPE_WINDOW_CONTENT_CHANGED':
+                match_rect = RECT_REGEX.search(line)
+                if match_rect:
+                    coords = tuple([int(i) for i in match_rect.groups()])
+            log.full_events.append(EventTypeRecord(event_type, coords))
+
+        is_scrolled = "EventType: TYPE_VIEW_SCROLLED" in line
+        is_clicked = "EventType: TYPE_VIEW_CLICKED" in line
+        current_event_type = None
+        if not is_clicked:
+            current_event_type = line.split("EventType:")[1].split(";")[0].strip()
+
+        # Scrolling that shows new content and clicks that open a new window
+        if is_scrolled:
+            last_event_type = "TYPE_VIEW_SCROLLED"
+            last_scroll_details = parse_scroll_details(line)
+        elif is_clicked:
+            last_event_type = "TYPE_VIEW_CLICKED"
+        else:
+            if last_event_type == "TYPE_VIEW_SCROLLED" and current_event_type in FOLLOW_UP_EVENTS_SCROLL:
+                if did_scroll_occur(last_scroll_details):
+                    log.is_scrolling_new_content = True
+            elif last_event_type == "TYPE_VIEW_CLICKED" and current_event_type in FOLLOW_UP_EVENTS_CLICK:
+                log.is_click_new_window = True
+            if "TYPE_VIEW_" not in current_event_type and last_event_type != "TYPE_VIEW_CLICKED":
+                last_event_type = None
+
+        # Accessibility focus moving after a click
+        if is_clicked:
+            clicked = True
+        elif clicked and current_event_type == "TYPE_VIEW_ACCESSIBILITY_FOCUSED":
+            log.is_accessibility_focus_changed = True
+
+        # Last focused and clicked elements
+        if 'EventType: TYPE_VIEW_ACCESSIBILITY_FOCUSED' in line:
+            last_focused_line = line
+        if is_clicked:
+            last_clicked_line = line
+
+    if last_focused_line:
+        log.last_focused_bounds = extract_bounds(last_focused_line)
+    if last_clicked_line:
+        log.last_clicked_bounds = extract_bounds(last_clicked_line)
+    return log
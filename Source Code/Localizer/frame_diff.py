@@ -0,0 +1,313 @@
+from collections import Counter, defaultdict
+from functools import cached_property
+from typing import List, NamedTuple
+import numpy as np
+import geometry
+from node import Node, A11yFocusedStatus
+from instrumentation import span
+from utils import a11y_focus_pivot, filter_contained_elements, frame_hash, hash_nodes
+
+# Refreshed areas from which the candidates are looked up in the spatial index of the scenario, one node at a time.
+# With fewer areas, comparing the bounds of all candidates with every area at once is faster. The two break even at
+# about 650 areas, whatever the number of candidates
+INDEXED_REFRESHED_AREAS = 600
+
+
+class ChangeSet(NamedTuple):
+    """Dynamic content changes of a scenario, before get_problematic_dynamic_content_changes filters them"""
+    short_lived: List[Node]
+    disappearing: List[Node]
+    appearing: List[Node]
+    moving: List[Node]
+    attributes_changed: List[Node]
+
+
+class FrameKeys:
+    """Identifier lookups, the bounds array and the hash of one frame, built on first use and shared by all change
+    categories"""
+    def __init__(self, nodes: List[Node]):
+        self.nodes = nodes
+        # Index of the frame from its loader, None for frames without nodes
+        self.tree = nodes[0].tree if nodes else None
+        # Results of changes_since, by the frame compared with
+        self._changes = dict()
+
+    @cached_property
+    def hash(self) -> int:
+        return frame_hash(self.nodes)
+
+    @cached_property
+    def bounds(self):
+        return geometry.bounds_array(self.nodes)
+
+    @cached_property
+    def identifier_groups(self) -> set:
+        return {node.identifier_group for node in self.nodes}
+
+    @cached_property
+    def alternative_identifiers(self) -> set:
+        return set(self.positions_by_alternative_identifier)
+
+    @cached_property
+    def positions_by_alternative_identifier(self) -> dict:
+        """Positions of the nodes in the frame, by identifier_group_alternative"""
+        positions = defaultdict(list)
+        for position, node in enumerate(self.nodes):
+            positions[node.identifier_group_alternative].append(position)
+        return positions
+
+    @cached_property
+    def subtree_hashes(self) -> Counter:
+        return Counter(node.subtree_hash for node in self.nodes)
+
+    @cached_property
+    def _hashed_nodes(self) -> tuple:
+        return hash_nodes(self.nodes)
+
+    @property
+    def attribute_hashes(self) -> dict:
+        return self._hashed_nodes[0]
+
+    @property
+    def nodes_by_key(self) -> dict:
+        return self._hashed_nodes[1]
+
+    def changes_since(self, previous: 'FrameKeys') -> tuple:
+        """Returns the nodes of this frame that are not in a subtree the previous frame has too, in frame order, and
+        the nodes of the previous frame that are not in a subtree this frame has too. Only the changed subtrees are
+        visited when both frames have a tree index, otherwise the nodes are matched one by one by subtree hash"""
+        changes = self._changes.get(previous)
+        if changes is None:
+            if self.tree is not None and previous.tree is not None:
+                changes = self.tree.diff(previous.tree)
+            elif self.hash == previous.hash:
+                changes = [], []
+            else:
+                changes = self._unmatched(previous.subtree_hashes), previous._unmatched(self.subtree_hashes)
+            self._changes[previous] = changes
+        return changes
+
+    def changed_since(self, previous: 'FrameKeys') -> List[Node]:
+        """The nodes of this frame that are not in a subtree the previous frame has too, in frame order"""
+        return self.changes_since(previous)[0]
+
+    def _unmatched(self, subtree_hashes: Counter) -> List[Node]:
+        left = subtree_hashes.copy()
+        unmatched = []
+        for node in self.nodes:
+            if left[node.subtree_hash] > 0:
+                left[node.subtree_hash] -= 1
+            else:
+                unmatched.append(node)
+        return unmatched
+
+
+class FrameDiff:
+    """Diffs the initial, middle and final frames of a scenario in one place, and each frame of its timeline against
+    the frame before it for short-lived elements.
+
+    Each frame is keyed once by identifier_group, identifier_group_alternative and resource_id, and classify()
+    derives all five change categories from those keys. The categories are computed in the same order as the legacy
+    detectors in detectors.py, because they share and update the accessibility focus status of the nodes. Subtrees
+    with the same hash in both frames a category compares are the same in both, so their nodes are skipped, and two
+    equal frames are skipped whole.
+
+    The geometric checks run on the bounds of all candidates at once with the kernels of geometry.py, instead of
+    node by node like the legacy detectors. Scenarios with at least INDEXED_REFRESHED_AREAS refreshed areas query
+    the spatial index of the scenario for each candidate instead."""
+    def __init__(self, ctx):
+        self.ctx = ctx
+        # None when the refreshed areas are queried through ctx.refreshed_areas
+        self.refreshed_areas = None
+        if len(ctx.refreshed_areas) < INDEXED_REFRESHED_AREAS:
+            self.refreshed_areas = geometry.rects_array(ctx.refreshed_areas)
+        self.initial = FrameKeys(ctx.target_elements_1)
+        self.middle = FrameKeys(ctx.target_element_middle)
+        self.final = FrameKeys(ctx.target_elements_2)
+
+    def classify(self) -> ChangeSet:
+        changes = dict()
+        for category in ('appearing', 'moving', 'short_lived', 'attributes_changed', 'disappearing'):
+            with span(category) as stage:
+                changes[category] = getattr(self, category)()
+                stage.count(findings=len(changes[category]))
+        return ChangeSet(**changes)
+
+    def _checks_appearing_and_disappearing(self) -> bool:
+        ctx = self.ctx
+        return (ctx.is_significant_content and not ctx.is_focus_changed) or not ctx.is_significant_content
+
+    def _define_focus(self, nodes: List[Node], bounds=None) -> None:
+        ctx = self.ctx
+        geometry.set_a11y_focus_status(nodes, a11y_focus_pivot(ctx.last_focused_bounds, ctx.accessibility_focuses),
+                                       bounds)
+
+    def _appearing_disappearing(self, nodes: List[Node]) -> List[Node]:
+        """Nodes whose top left corner lies strictly inside a refreshed area, with their accessibility focus status
+        defined"""
+        ctx = self.ctx
+        if self.refreshed_areas is None:
+            nodes = [node for node in nodes
+                     if ctx.refreshed_areas.contains_point(*node.bounds[0], strict=True)]
+            bounds = None
+        else:
+            bounds = geometry.bounds_array(nodes)
+            inside = geometry.top_left_inside_any(bounds, self.refreshed_areas)
+            nodes = geometry.select(nodes, inside)
+            bounds = bounds[inside]
+        if nodes and ctx.accessibility_focuses:
+            geometry.set_a11y_focus_status(nodes, a11y_focus_pivot(ctx.last_focused_bounds, ctx.accessibility_focuses,
+                                                                   ctx.last_clicked_bounds), bounds)
+        return filter_contained_elements(nodes)
+
+    def _in_refreshed_areas(self, nodes: List[Node]) -> List[Node]:
+        """Nodes that overlap or touch a refreshed area"""
+        if self.refreshed_areas is None:
+            return [node for node in nodes if self.ctx.refreshed_areas.overlaps(*node.bounds[0], *node.bounds[1])]
+        return geometry.select(nodes, geometry.overlaps_any(geometry.bounds_array(nodes), self.refreshed_areas))
+
+    def short_lived(self) -> List[Node]:
+        """Elements of the middle or later intermediate frames that are in neither the initial nor the final frame,
+        while their container is in the final frame.
+
+        Each frame is keyed once and only diffed against the frame before it: the subtrees both frames share are
+        skipped, and the identifiers of the previous frame are counted and updated with the nodes that changed. An
+        element is reported once, from the frame it first appeared in. The other categories compare the initial,
+        middle and final frames only"""
+        ctx = self.ctx
+        in_initial = self.initial.alternative_identifiers
+        in_final = self.final.alternative_identifiers
+        short_lived = []
+        reported = set()
+        in_previous = Counter(node.identifier_group_alternative for node in self.initial.nodes)
+        frames = [self.initial, self.middle, *(FrameKeys(frame) for frame in ctx.intermediate_frames)]
+        for previous, frame in zip(frames, frames[1:]):
+            added, removed = frame.changes_since(previous)
+            if not added and not removed:
+                continue
+            found = [node for node in added
+                     if in_previous[node.identifier_group_alternative] <= 0 and
+                     node.identifier_group_alternative not in in_initial and
+                     node.identifier_group_alternative not in in_final and
+                     node.identifier_group_alternative not in reported and
+                     node.parent.identifier_group_alternative in in_final]
+            found = self._in_refreshed_areas(found)
+            short_lived += found
+            reported.update(node.identifier_group_alternative for node in found)
+            in_previous.update(node.identifier_group_alternative for node in added)
+            in_previous.subtract(node.identifier_group_alternative for node in removed)
+        self._define_focus(short_lived)
+        return short_lived
+
+    def disappearing(self) -> List[Node]:
+        ctx = self.ctx
+        if not self._checks_appearing_and_disappearing():
+            return []
+        in_final = self.final.identifier_groups
+        if ctx.is_click_new_window:
+            # The window changed, so elements disappear between the middle and the final frame
+            frame = self.middle
+        elif not ctx.is_scrolling_new_content:
+            frame = self.initial
+        else:
+            return []
+        # Nodes in subtrees the final frame has too are in it
+        removed = {id(node) for node in self.final.changes_since(frame)[1]}
+        return self._appearing_disappearing([node for node in frame.nodes
+                                             if id(node) in removed and node.identifier_group not in in_final])
+
+    def appearing(self) -> List[Node]:
+        ctx = self.ctx
+        if not self._checks_appearing_and_disappearing():
+            return []
+        if ctx.is_click_new_window:
+            # The window changed, so elements appear between the middle and the final frame
+            frame = self.middle
+        elif not ctx.is_scrolling_new_content:
+            # Every final node is in the final frame, so only the initial frame decides
+            frame = self.initial
+        else:
+            return []
+        previous = frame.identifier_groups
+        return self._appearing_disappearing([node for node in self.final.changed_since(frame)
+                                             if node.identifier_group not in previous])
+
+    def moving(self) -> List[Node]:
+        ctx = self.ctx
+        comparison = self.middle if ctx.wc else self.initial
+        # Positions of every final node paired with each node of the comparison frame sharing its alternative
+        # identifier. A node in a subtree the comparison frame has too is paired with its copy there, which is in
+        # the same place, so it is skipped when the copy is its only candidate
+        candidates = comparison.positions_by_alternative_identifier
+        changed = {id(node) for node in self.final.changed_since(comparison)}
+        pairs = []
+        for position, node in enumerate(self.final.nodes):
+            matches = candidates.get(node.identifier_group_alternative, ())
+            if len(matches) != 1 or id(node) in changed:
+                pairs.extend((position, candidate) for candidate in matches)
+        pairs = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+        bounds = self.final.bounds[pairs[:, 0]]
+        previous_bounds = comparison.bounds[pairs[:, 1]]
+        error_margins = np.where(geometry.nav_bar_mask(bounds), 100, 2000)
+        moved = ((bounds != previous_bounds).any(axis=1) &
+                 ~geometry.near_each_other(bounds, previous_bounds, error_margins))
+        moved_identifiers = set()
+        for position in np.flatnonzero(moved).tolist():
+            node = self.final.nodes[pairs[position, 0]]
+            candidate = comparison.nodes[pairs[position, 1]]
+            moved_identifiers.add(node.identifier_group_alternative)
+            # Determine moving direction based on y-coordinate comparison
+            current_y = int(bounds[position, 1])
+            previous_y = int(previous_bounds[position, 1])
+            if current_y > previous_y:
+                node.moving_direction = 'Below'
+            elif current_y < previous_y:
+                node.moving_direction = 'Above'
+            if (node.a11yFocusedStatus == A11yFocusedStatus.AFTER and
+                    candidate.a11yFocusedStatus == A11yFocusedStatus.BEFORE):
+                node.moving_from_above_to_below = True
+
+        moving = self._in_refreshed_areas([node for node in self.final.nodes
+                                           if node.identifier_group_alternative in moved_identifiers and
+                                           node.important_for_accessibility == 'true'])
+        if moving and ctx.accessibility_focuses:
+            self._define_focus(moving)
+        moving_ids = {id(node) for node in moving}
+        for node in self.final.nodes:
+            if id(node) not in moving_ids:
+                node.moving_direction = None
+        return filter_contained_elements(moving)
+
+    def attributes_changed(self) -> List[Node]:
+        """Elements whose attributes differ between the initial (or middle) and the final frame, matched by their
+        resource id, or by their resource id and path when several elements share it"""
+        ctx = self.ctx
+        comparison = self.middle if ctx.wc else self.initial
+        added, removed = self.final.changes_since(comparison)
+        if not added and not removed:
+            return []
+        in_changed_subtree = {id(node) for node in removed}
+        final_hashes = self.final.attribute_hashes
+        nodes_by_key = comparison.nodes_by_key
+        changed = []
+        for key, hash_value in comparison.attribute_hashes.items():
+            # A node keyed by its unique resource id in a subtree the final frame has too is matched with its copy
+            if isinstance(key, str) and id(nodes_by_key[key]) not in in_changed_subtree:
+                continue
+            if key in final_hashes and hash_value != final_hashes[key]:
+                changed.append(nodes_by_key[key])
+        self._define_focus(changed)
+        return changed
+
+
+def save_node_states(ctx) -> list:
+    """Returns the detection state of all nodes of a scenario, to undo the changes detectors make to them"""
+    return [(node, node.a11yFocusedStatus, node.moving_direction, node.moving_from_above_to_below)
+            for frame in ctx.frames for node in frame]
+
+
+def restore_node_states(states: list) -> None:
+    for node, a11y_focused_status, moving_direction, moving_from_above_to_below in states:
+        node.a11yFocusedStatus = a11y_focused_status
+        node.moving_direction = moving_direction
+        node.moving_from_above_to_below = moving_from_above_to_below
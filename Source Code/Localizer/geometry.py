@@ -0,0 +1,90 @@
+import numpy as np
+from consts import BOTTOM_NAV_BAR_BOUNDS, SCREEN_BOUNDS, TOP_NAV_BAR_BOUNDS
+from node import A11yFocusedStatus
+
+# Upper bound of the elements of the temporary masks comparing bounds with rectangles, to keep them in the cache
+CHUNK_ELEMENTS = 1 << 20
+
+
+def bounds_array(nodes) -> np.ndarray:
+    """Returns the ((x1, y1), (x2, y2)) bounds of nodes as an (n, 4) int32 array of x1, y1, x2, y2"""
+    if not nodes:
+        return np.empty((0, 4), dtype=np.int32)
+    return np.array([(x1, y1, x2, y2) for (x1, y1), (x2, y2) in (node.bounds for node in nodes)], dtype=np.int32)
+
+
+def rects_array(rects) -> np.ndarray:
+    """Returns (x1, y1, x2, y2) rectangles, e.g. of a spatial_index.RectIndex, as an (m, 4) int64 array"""
+    rects = list(rects)
+    if not rects:
+        return np.empty((0, 4), dtype=np.int64)
+    return np.array(rects, dtype=np.int64)
+
+
+def clip_to_screen(coords: np.ndarray) -> tuple:
+    """Takes raw x1, y1, x2, y2 rows and returns them with flipped corners swapped, and the mask of the rows that
+    have no negative coordinate and lie within the screen bounds"""
+    x1, y1, x2, y2 = coords.T
+    clipped = np.stack([np.minimum(x1, x2), np.minimum(y1, y2), np.maximum(x1, x2), np.maximum(y1, y2)], axis=1)
+    screen_x1, screen_y1, screen_x2, screen_y2 = SCREEN_BOUNDS
+    on_screen = ((coords >= 0).all(axis=1) &
+                 (clipped[:, 0] >= screen_x1) & (clipped[:, 2] <= screen_x2) &
+                 (clipped[:, 1] >= screen_y1) & (clipped[:, 3] <= screen_y2))
+    return clipped, on_screen
+
+
+def nav_bar_mask(bounds: np.ndarray) -> np.ndarray:
+    """Vectorized utils.is_within_nav_bars"""
+    y1, y2 = bounds[:, 1], bounds[:, 3]
+    return (((y1 >= TOP_NAV_BAR_BOUNDS[1]) & (y2 <= TOP_NAV_BAR_BOUNDS[3])) |
+            ((y1 >= BOTTOM_NAV_BAR_BOUNDS[1]) & (y2 <= BOTTOM_NAV_BAR_BOUNDS[3])))
+
+
+def near_each_other(bounds: np.ndarray, other_bounds: np.ndarray, error) -> np.ndarray:
+    """Vectorized utils.bounds_near_each_other of two arrays of bounds, row by row. error is a number or an array
+    with one margin per row"""
+    error = np.asarray(error)
+    if error.ndim:
+        error = error[:, None]
+    return (np.abs(bounds.astype(np.int64) - other_bounds) <= error).all(axis=1)
+
+
+def _chunked(bounds: np.ndarray, rects: np.ndarray, test) -> np.ndarray:
+    mask = np.zeros(len(bounds), dtype=bool)
+    if len(bounds) == 0 or len(rects) == 0:
+        return mask
+    step = max(1, CHUNK_ELEMENTS // len(rects))
+    for start in range(0, len(bounds), step):
+        chunk = bounds[start:start + step, None, :]
+        mask[start:start + step] = test(chunk, rects[None, :, :]).any(axis=1)
+    return mask
+
+
+def overlaps_any(bounds: np.ndarray, rects: np.ndarray) -> np.ndarray:
+    """Vectorized utils.is_within_refreshed_area. Returns the mask of the bounds that overlap or touch any of the
+    rectangles"""
+    return _chunked(bounds, rects, lambda b, r: ~((b[..., 2] < r[..., 0]) | (b[..., 0] > r[..., 2]) |
+                                                  (b[..., 3] < r[..., 1]) | (b[..., 1] > r[..., 3])))
+
+
+def top_left_inside_any(bounds: np.ndarray, rects: np.ndarray) -> np.ndarray:
+    """Vectorized utils.in_bounds_2 of the top left corners of the bounds. Returns the mask of the bounds whose top
+    left corner lies strictly inside any of the rectangles"""
+    return _chunked(bounds, rects, lambda b, r: ((r[..., 0] < b[..., 0]) & (b[..., 0] < r[..., 2]) &
+                                                 (r[..., 1] < b[..., 1]) & (b[..., 1] < r[..., 3])))
+
+
+def select(nodes: list, mask: np.ndarray) -> list:
+    """Returns the nodes where mask is set, in their order"""
+    return [nodes[position] for position in np.flatnonzero(mask).tolist()]
+
+
+def set_a11y_focus_status(nodes, pivot_y, bounds: np.ndarray = None) -> None:
+    """Vectorized loop of utils.define_a11y_focus. Nodes ending above the pivot are BEFORE the accessibility focus,
+    all others AFTER it. Writes the status back to the nodes. bounds are those of the nodes, when already known"""
+    nodes = list(nodes)
+    if bounds is None:
+        bounds = bounds_array(nodes)
+    before = bounds[:, 3] <= pivot_y
+    for node, is_before in zip(nodes, before.tolist()):
+        node.a11yFocusedStatus = A11yFocusedStatus.BEFORE if is_before else A11yFocusedStatus.AFTER
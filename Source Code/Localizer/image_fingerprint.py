@@ -0,0 +1,129 @@
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import imagehash
+from PIL import Image
+
+# Size the perceptual hash resizes to, see imagehash.phash
+PHASH_SIZE = 32
+
+
+def _read(source) -> bytes:
+    """Reads an image given as a path, bytes or a binary file object"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.read()
+
+
+def _open(data: bytes, size: tuple, reducing_gap):
+    image = Image.open(io.BytesIO(data))
+    if reducing_gap is not None and image.format == 'JPEG':
+        # Lets the JPEG decoder skip most of the pixels. Other formats, like the PNG screenshots, are always decoded in
+        # full and only the following reduce() is faster
+        image.draft(image.mode, (int(size[0] * reducing_gap), int(size[1] * reducing_gap)))
+    return image
+
+
+class ImageHasher:
+    """Hashes screenshots, caching the hashes by the content hash of the image in memory and optionally in a folder.
+    Keeping one hasher alive keeps its cache and thread pool warm between scenarios"""
+    def __init__(self, cache_dir=None):
+        self.memory_cache = dict()
+        self.cache_dir = None
+        self.pool = None
+        self.set_cache_dir(cache_dir)
+
+    def set_cache_dir(self, cache_dir) -> None:
+        """Also keeps image hashes in the given folder, so they survive between runs. None disables it"""
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def clear_memory_cache(self) -> None:
+        """Forgets the hashes kept in memory, e.g. to time hashing without the cache"""
+        self.memory_cache.clear()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _cache_get(self, key: str):
+        hex_hash = self.memory_cache.get(key)
+        if hex_hash is None and self.cache_dir is not None:
+            try:
+                with open(os.path.join(self.cache_dir, key), encoding='ascii') as f:
+                    hex_hash = f.read()
+                self.memory_cache[key] = hex_hash
+            except OSError:
+                pass
+        return imagehash.hex_to_hash(hex_hash) if hex_hash else None
+
+    def _cache_put(self, key: str, image_hash) -> None:
+        hex_hash = str(image_hash)
+        self.memory_cache[key] = hex_hash
+        if self.cache_dir is not None:
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(hex_hash)
+            os.replace(temp_path, os.path.join(self.cache_dir, key))
+
+    def average_hash(self, source, target_size=(8, 8), reducing_gap=None):
+        """Returns the average hash compare_images uses, cached by the content hash of the image.
+
+        The screenshot is resized to target_size at full resolution. With a reducing_gap, it is first shrunk by an
+        integer factor to about reducing_gap times the target size. That can flip a few bits, and for PNG screenshots
+        only saves the resize, since decoding the PNG takes most of the time and cannot be skipped. compare_images
+        keeps the exact hash by default, and the cache spares the decoding on repeated runs"""
+        data = _read(source)
+        key = (f"{hashlib.blake2b(data, digest_size=16).hexdigest()}-average-{target_size[0]}x{target_size[1]}-"
+               f"{reducing_gap}")
+        image_hash = self._cache_get(key)
+        if image_hash is None:
+            with _open(data, target_size, reducing_gap) as image:
+                image_hash = imagehash.average_hash(image.resize(target_size, reducing_gap=reducing_gap))
+            self._cache_put(key, image_hash)
+        return image_hash
+
+    def perceptual_hash(self, source, reducing_gap=None):
+        """Returns the perceptual hash are_images_similar uses, cached by the content hash of the image"""
+        data = _read(source)
+        key = f"{hashlib.blake2b(data, digest_size=16).hexdigest()}-phash-{reducing_gap}"
+        image_hash = self._cache_get(key)
+        if image_hash is None:
+            with _open(data, (PHASH_SIZE, PHASH_SIZE), reducing_gap) as image:
+                if reducing_gap is not None:
+                    factor = int(min(image.size) // (PHASH_SIZE * reducing_gap))
+                    if factor > 1:
+                        image = image.reduce(factor)
+                image_hash = imagehash.phash(image)
+            self._cache_put(key, image_hash)
+        return image_hash
+
+    def hash_images(self, sources, kind='average', max_workers=None, **options) -> list:
+        """Hashes many images at once in a thread pool, since decoding and resizing release the GIL.
+        kind is either 'average' or 'perceptual', options are passed on to the hash function"""
+        hash_function = self.average_hash if kind == 'average' else self.perceptual_hash
+        sources = list(sources)
+        if len(sources) < 2:
+            return [hash_function(source, **options) for source in sources]
+        if max_workers is not None:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                return list(pool.map(lambda source: hash_function(source, **options), sources))
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+        return list(self.pool.map(lambda source: hash_function(source, **options), sources))
+
+
+# Used by the functions below, for code that does not keep its own hasher
+default_hasher = ImageHasher()
+set_cache_dir = default_hasher.set_cache_dir
+clear_memory_cache = default_hasher.clear_memory_cache
+average_hash = default_hasher.average_hash
+perceptual_hash = default_hasher.perceptual_hash
+hash_images = default_hasher.hash_images
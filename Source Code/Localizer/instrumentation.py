@@ -0,0 +1,142 @@
+import heapq
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_enabled = False
+_trace_memory = False
+# Stages and open spans of each thread, so stages running in parallel threads are recorded separately
+_local = threading.local()
+
+
+def _thread_state():
+    if not hasattr(_local, 'stages'):
+        _local.stages = []
+        _local.open_spans = []
+    return _local
+
+
+def enable(trace_memory: bool = False) -> None:
+    """Starts recording stages in this process. trace_memory also records the peak memory allocated in each stage
+    with tracemalloc, which slows the analysis down. Memory peaks are process-wide, so only trace memory while one
+    thread runs stages"""
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = trace_memory
+    _thread_state().stages = []
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def take_stages() -> list:
+    """Returns the stages the current thread recorded since the last call and starts a new list"""
+    if not _enabled:
+        return []
+    state = _thread_state()
+    stages, state.stages = state.stages, []
+    return stages
+
+
+class Span:
+    """A running stage. Counts, e.g. of nodes or events, can be added while it runs"""
+    __slots__ = ('name', 'counts', 'start_wall', 'start_cpu', 'start_memory', 'peak_memory')
+
+    def __init__(self, name: str, counts: dict):
+        self.name = name
+        self.counts = counts
+
+    def count(self, **counts) -> None:
+        self.counts.update(counts)
+
+
+class _DisabledSpan:
+    __slots__ = ()
+
+    def count(self, **counts) -> None:
+        pass
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+@contextmanager
+def span(name: str, **counts):
+    """Records the wall time, CPU time, counts and optionally the memory peak of a stage. Nested spans are named
+    after their parents, e.g. load_scenario.parse_events"""
+    if not _enabled:
+        yield _DISABLED_SPAN
+        return
+    state = _thread_state()
+    open_spans = state.open_spans
+    if open_spans:
+        name = f"{open_spans[-1].name}.{name}"
+    current = Span(name, counts)
+    if _trace_memory:
+        current.start_memory, outer_peak = tracemalloc.get_traced_memory()
+        # The outer span keeps the peak reached before this one, since resetting the peak loses it
+        if open_spans:
+            open_spans[-1].peak_memory = max(open_spans[-1].peak_memory, outer_peak)
+        tracemalloc.reset_peak()
+        current.peak_memory = 0
+    open_spans.append(current)
+    current.start_cpu = time.process_time()
+    current.start_wall = time.perf_counter()
+    try:
+        yield current
+    finally:
+        wall = time.perf_counter() - current.start_wall
+        cpu = time.process_time() - current.start_cpu
+        open_spans.pop()
+        stage = {'stage': name, 'wall': wall, 'cpu': cpu, **current.counts}
+        if _trace_memory:
+            peak = max(current.peak_memory, tracemalloc.get_traced_memory()[1])
+            stage['peak_memory'] = peak - current.start_memory
+            if open_spans:
+                open_spans[-1].peak_memory = max(open_spans[-1].peak_memory, peak)
+        state.stages.append(stage)
+
+
+class RunSummary:
+    """Aggregates the stages of every scenario of a run into the slowest scenarios and the totals of each stage,
+    without keeping the stages themselves"""
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.slowest_scenarios = []
+        self.scenario_count = 0
+        self.by_stage = dict()
+
+    def add(self, base_path: str, stages: list) -> None:
+        self.scenario_count += 1
+        # Nested stages are already part of the time of their parents
+        wall = sum(stage['wall'] for stage in stages if '.' not in stage['stage'])
+        if len(self.slowest_scenarios) < self.top:
+            heapq.heappush(self.slowest_scenarios, (wall, base_path))
+        else:
+            heapq.heappushpop(self.slowest_scenarios, (wall, base_path))
+        for stage in stages:
+            entry = self.by_stage.get(stage['stage'])
+            if entry is None:
+                entry = self.by_stage[stage['stage']] = {'wall': 0.0, 'cpu': 0.0, 'max': -1.0, 'max_scenario': None,
+                                                         'peak_memory': None}
+            entry['wall'] += stage['wall']
+            entry['cpu'] += stage['cpu']
+            if stage['wall'] > entry['max']:
+                entry['max'], entry['max_scenario'] = stage['wall'], base_path
+            if 'peak_memory' in stage:
+                entry['peak_memory'] = max(entry['peak_memory'] or 0, stage['peak_memory'])
+
+    def lines(self) -> list:
+        lines = [f"Slowest tests of {self.scenario_count}:"]
+        for wall, base_path in sorted(self.slowest_scenarios, reverse=True):
+            lines.append(f"  {wall * 1000:10.1f} ms  {base_path}")
+        lines.append("Stages by total wall time:")
+        for name, entry in sorted(self.by_stage.items(), key=lambda item: -item[1]['wall'])[:self.top]:
+            memory = f", peak {entry['peak_memory'] / 1024 / 1024:.1f} MB" if entry['peak_memory'] is not None else ""
+            lines.append(f"  {entry['wall'] * 1000:10.1f} ms (cpu {entry['cpu'] * 1000:.1f} ms{memory})  {name}, "
+                         f"slowest {entry['max'] * 1000:.1f} ms in {entry['max_scenario']}")
+        return lines
@@ -1,309 +1,330 @@
+import argparse
 import json
 import logging
 import shutil
-from collections import Counter
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
 from utils import *
 from node import Node, A11yFocusedStatus
 import os
-import pickle
-from consts import DATASET_FOLDER, RESULTS_FOLDER, RESULTS_PICKLE
+from consts import DATASET_FOLDER, RESULTS_FOLDER, RESULTS_PICKLE, RESULTS_JSONL, RESULTS_DB, RESULTS_MANIFEST, CACHE_FOLDER, \
+    STAGE_TIMINGS
 from GUI_utils import *
+from scenario import ScenarioContext
+from detectors import analyze_scenario, diff_engine_matches_legacy
+from results_folder import get_results_folder, save_scenario_results
+from overlay_renderer import IMAGE_FORMATS
+from scenario_cache import ScenarioCache, prefetch_scenario
+import image_fingerprint
+from run_manifest import RunManifest, code_version
+from results_sink import ResultsWriter, compact, convert_to_pickle, recorded_scenarios, scenario_record
+from results_store import ResultsStore
+import instrumentation
+from instrumentation import span
+from watcher import ScenarioWatcher
+from pipeline import Stage, run_pipeline
+
+
+def process_scenario(base_path: str, check_diff_engine=False, cache_dir=None, cache_size=None, images="render",
+                     image_format="png", profile=None) -> tuple:
+    """Analyzes a single scenario, saves its results and returns them as a flattened record, with the timed stages if
+    profile is "time" or "memory". Runs in a worker process when --workers > 1"""
+    if profile and not instrumentation.is_enabled():
+        instrumentation.enable(trace_memory=profile == "memory")
+    cache = ScenarioCache(cache_dir, cache_size) if cache_dir else None
+    if cache_dir:
+        image_fingerprint.set_cache_dir(os.path.join(cache_dir, "images"))
+    loaded = ScenarioContext.from_base_path(base_path, cache), []
+    return write_scenario(detect_scenario(loaded, check_diff_engine), images, image_format)
+
+
+# Stages of --pipeline. Each one returns the stages it timed along with its result, since the stages of a scenario
+# are recorded on different threads
+
+
+def read_scenario(base_path: str, cache=None) -> tuple:
+    with span("read_files") as stage:
+        prefetched = prefetch_scenario(base_path, cache)
+        stage.count(bytes=sum(len(data) for data in prefetched.files.values()))
+    return base_path, prefetched, instrumentation.take_stages()
+
+
+def parse_scenario(item: tuple, cache=None) -> tuple:
+    base_path, prefetched, stages = item
+    ctx = ScenarioContext.from_base_path(base_path, cache, prefetched=prefetched)
+    return ctx, stages + instrumentation.take_stages()
+
+
+def detect_scenario(item: tuple, check_diff_engine=False) -> tuple:
+    ctx, stages = item
+    matches_legacy = diff_engine_matches_legacy(ctx) if check_diff_engine else None
+    results = analyze_scenario(ctx)
+    return ctx.base_path, ctx.wc, results, matches_legacy, stages + instrumentation.take_stages()
+
+
+def write_scenario(item: tuple, images="render", image_format="png") -> tuple:
+    """Saves the results of a scenario and returns them like process_scenario"""
+    base_path, wc, results, matches_legacy, stages = item
+    with span("write_results"):
+        save_scenario_results(base_path, wc, results, images, image_format)
+    return base_path, scenario_record(base_path, wc, results), matches_legacy, stages + instrumentation.take_stages()
+
+
+def pipeline_stages(prefetch=4, check_diff_engine=False, cache_dir=None, cache_size=None, images="render",
+                    image_format="png") -> list:
+    """Returns the read, parse, detect and write stages of --pipeline. Up to prefetch scenarios are read at a time
+    and wait for parsing, while the other stages work on one scenario each"""
+    cache = ScenarioCache(cache_dir, cache_size) if cache_dir else None
+    if cache_dir:
+        image_fingerprint.set_cache_dir(os.path.join(cache_dir, "images"))
+    return [Stage("read", partial(read_scenario, cache=cache), concurrency=prefetch, queue_size=prefetch),
+            Stage("parse", partial(parse_scenario, cache=cache)),
+            Stage("detect", partial(detect_scenario, check_diff_engine=check_diff_engine)),
+            Stage("write", partial(write_scenario, images=images, image_format=image_format))]
+
+
+def init_worker(ignore_interrupt=False) -> None:
+    logging.basicConfig(level=logging.INFO)
+    if ignore_interrupt:
+        # Ctrl+C stops the watching process, which then shuts the pool down
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _stop_watching(signum, frame):
+    raise KeyboardInterrupt
+
+
+def watch_scenarios(process, executor, collect, manifest: RunManifest, version: str, analyzed: list,
+                    poll_interval: float = 1.0, settle_seconds: float = 2.0) -> int:
+    """Analyzes scenarios as soon as the capture scripts finished writing them, until interrupted with Ctrl+C, and
+    returns how many were analyzed.
+
+    Scenarios in analyzed are only analyzed again when their files change. Each result is passed to collect and
+    recorded in the manifest right away, and the base paths of new scenarios are appended to analyzed."""
+    count = 0
+    watcher = ScenarioWatcher(DATASET_FOLDER, settle_seconds=settle_seconds)
+    for base_path in analyzed:
+        watcher.mark_done(base_path)
+    pending = dict()
+    logging.info(f"Watching {DATASET_FOLDER} for new tests, press Ctrl+C to stop")
+    # Stopping the daemon with SIGTERM saves the results like Ctrl+C
+    previous_handler = signal.signal(signal.SIGTERM, _stop_watching)
+    try:
+        while True:
+            for base_path in watcher.poll():
+                logging.info(f"Analyzing new or modified test {base_path}")
+                if os.path.exists(get_results_folder(base_path)):
+                    shutil.rmtree(get_results_folder(base_path))
+                # Fingerprint before analyzing, so files changing meanwhile are picked up again
+                pending[executor.submit(process, base_path)] = (base_path, manifest.fingerprint(base_path))
+            if not pending:
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                base_path, fingerprints = pending.pop(future)
+                try:
+                    collect(future.result())
+                except Exception:
+                    logging.exception(f"Could not analyze {base_path}")
+                    continue
+                count += 1
+                if base_path not in analyzed:
+                    analyzed.append(base_path)
+                manifest.update(base_path, fingerprints, version)
+                manifest.save()
+    except KeyboardInterrupt:
+        logging.info("Stopped watching")
+        for future in pending:
+            future.cancel()
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+    return count
+
+
+def main():
+    # Configured here rather than on import, so the analysis can be imported without changing the caller's logging
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Localizes problematic dynamic content changes")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes analyzing scenarios in parallel (default: 1)")
+    parser.add_argument("--check-diff-engine", action="store_true",
+                        help="Also run the legacy detectors and report scenarios where their findings differ")
+    parser.add_argument("--cache-dir", default=CACHE_FOLDER,
+                        help=f"Folder caching parsed scenarios between runs (default: {CACHE_FOLDER})")
+    parser.add_argument("--cache-size-mb", type=int, default=1024,
+                        help="Size limit of the cache, least recently used scenarios are evicted first (default: 1024)")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every scenario again without the cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep the previous results and only analyze new or modified scenarios")
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS), default="png",
+                        help="Format of the result images, png-fast, jpeg and webp encode faster (default: png)")
+    image_modes = parser.add_mutually_exclusive_group()
+    image_modes.add_argument("--no-images", action="store_const", dest="images", const="none", default="render",
+                             help="Only write the results files, without images")
+    image_modes.add_argument("--lazy-images", action="store_const", dest="images", const="lazy",
+                             help="Describe the result images in overlays.json, to render them later with "
+                                  "overlay_renderer.py")
+    parser.add_argument("--no-pickle", action="store_true",
+                        help=f"Only stream the results to {RESULTS_JSONL}, without converting them to {RESULTS_PICKLE} "
+                             f"at the end. Keeps memory constant on big runs")
+    parser.add_argument("--db", nargs="?", const=RESULTS_DB,
+                        help=f"Also store the findings of the run in an SQLite database, to compare runs with "
+                             f"results_store.py (default: {RESULTS_DB})")
+    profiling = parser.add_mutually_exclusive_group()
+    profiling.add_argument("--profile", action="store_const", const="time",
+                           help=f"Record the wall time, CPU time and counts of each stage of every test in "
+                                f"{STAGE_TIMINGS} and log the slowest tests and stages at the end")
+    profiling.add_argument("--profile-memory", action="store_const", dest="profile", const="memory",
+                           help="Like --profile, and also record the peak memory of each stage with tracemalloc, "
+                                "which slows the analysis down")
+    parser.add_argument("--watch", action="store_true",
+                        help=f"After analyzing the existing tests, keep analyzing new or modified tests in "
+                             f"{DATASET_FOLDER} as soon as all their files are written, until Ctrl+C")
+    parser.add_argument("--settle-seconds", type=float, default=2.0,
+                        help="How long the files of a test must stay unchanged before --watch analyzes it "
+                             "(default: 2)")
+    parser.add_argument("--run-name", help="Name of the run in the database (default: the current time)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Read the files of the next tests while the current one is analyzed, with reading, "
+                             "parsing, detection and writing on threads of their own. Speeds up runs on network "
+                             "storage")
+    parser.add_argument("--prefetch", type=int, default=4,
+                        help="Tests --pipeline reads ahead of parsing (default: 4)")
+    args = parser.parse_args()
+    if args.pipeline and args.workers > 1:
+        parser.error("--pipeline overlaps the stages of one process, it cannot be combined with --workers")
+    if args.pipeline and args.profile == "memory":
+        parser.error("--profile-memory measures one stage at a time, which --pipeline overlaps")
 
-save_only_on_error = True
-logging.basicConfig(level=logging.INFO)
-
-def get_short_lived_elements() -> list:
-    """Returns a list of short-lived elements"""
-    # Create sets for quick lookup of elements by their unique identifiers in the first and last frames.
-    unique_identifiers_first = {element.identifier_group_alternative for element in target_elements_1}
-    unique_identifiers_last = {element.identifier_group_alternative for element in target_elements_2}
-
-    # Paper definition: "If the element S1 is not present in the first frame, and its container is observed
-    # in the second frame"
-    potential_short_lived = [element for element in target_element_middle
-                             if element.identifier_group_alternative not in unique_identifiers_first and
-                             element.identifier_group_alternative not in unique_identifiers_last and
-                             element.parent.identifier_group_alternative in unique_identifiers_last]
-
-    # Further refine potential short-lived elements by considering refreshed areas.
-    refreshed_areas = {(e[4][0], e[4][1], e[4][2], e[4][3]) for e in events if e[2] == 'TYPE_WINDOW_CONTENT_CHANGED'}
-
-    # Filter elements by whether they are within refreshed areas.
-    short_lived_elements = [element for element in potential_short_lived if is_within_refreshed_area(element, refreshed_areas)]
-    define_a11y_focus(short_lived_elements, last_focused_bounds, accessibility_focuses)
-    return short_lived_elements
-
-
-def get_disappearing_elements(is_scrolling_new_content: bool, is_click_new_window: bool, is_significant_content: bool,
-                              is_focus_changed: bool) -> list:
-    """Returns a list of elements that are present in the initial state but not in the middle or final states."""
-    # Identifiers for elements in the final state for quick lookup
-    identifiers_in_final = {i.identifier_group for i in target_elements_2}
-
-    # Find refreshed areas from events
-    refreshed_areas = {((e[4][0], e[4][1]), (e[4][2], e[4][3])) for e in events if
-                       e[2] == 'TYPE_WINDOW_CONTENT_CHANGED'}
-
-    disappearing_content = []
-    if (is_significant_content and not is_focus_changed) or not is_significant_content:
-        if is_click_new_window:
-            # If the screen is different, focus on elements disappearing from the middle to the final frame
-            disappearing_content = [element for element in target_element_middle
-                                    if element.identifier_group not in identifiers_in_final and
-                                    in_bounds_2(refreshed_areas, element.bounds[0])]
-        elif is_scrolling_new_content == False and is_click_new_window == False:
-            # Elements in the initial state that do not appear in the final state
-            disappearing_content = [element for element in target_elements_1
-                                    if element.identifier_group not in identifiers_in_final and
-                                    in_bounds_2(refreshed_areas, element.bounds[0])]
-        # Adjust accessibility focus status if needed
-        if disappearing_content and accessibility_focuses:
-            define_a11y_focus_appearing_disappearing(disappearing_content, last_focused_bounds, accessibility_focuses, last_clicked_bounds)
-        disappearing_content = filter_contained_elements(disappearing_content)
-    return disappearing_content
-
-
-def get_appearing_elements(is_scrolling_new_content: bool, is_click_new_window: bool, is_significant_content: bool,
-                           is_focus_changed: bool) -> list:
-    """Returns a list of dynamically appearing elements that are not present in the initial state but appear in
-    the middle or final states."""
-    # Initial state identifiers for quick checks
-    identifiers_in_initial = {i.identifier_group for i in target_elements_1}
-
-    # Identifiers for elements that are in the middle state
-    identifiers_in_middle = {i.identifier_group for i in target_element_middle}
-
-    # Identifiers for elements that are in the final state
-    identifiers_in_final = {i.identifier_group for i in target_elements_2}
-
-    # Refreshed areas derived from events
-    refreshed_areas = {((e[4][0], e[4][1]), (e[4][2], e[4][3])) for e in events if
-                       e[2] == 'TYPE_WINDOW_CONTENT_CHANGED'}
-
-    appearing_content = []
-    if (is_significant_content and not is_focus_changed) or not is_significant_content:
-        if is_click_new_window:
-            # Consider elements appearing in the final state but not in the middle as appearing content
-            appearing_content = [element for element in target_elements_2
-                                 if element.identifier_group not in identifiers_in_middle and
-                                 element.identifier_group in identifiers_in_final and
-                                 in_bounds_2(refreshed_areas, element.bounds[0])]
-        elif is_scrolling_new_content == False and is_click_new_window == False:
-            # Elements not in the initial state but appear in the middle or final states
-            appearing_content = [element for element in target_elements_2
-                                 if element.identifier_group not in identifiers_in_initial and
-                                 (
-                                             element.identifier_group in identifiers_in_middle or element.identifier_group in identifiers_in_final) and
-                                 in_bounds_2(refreshed_areas, element.bounds[0])]
-
-        # Adjust accessibility focus if needed
-        if appearing_content and accessibility_focuses:  # Check if not empty to avoid errors
-            define_a11y_focus_appearing_disappearing(appearing_content, last_focused_bounds, accessibility_focuses, last_clicked_bounds)
-        appearing_content = filter_contained_elements(appearing_content)
-    return appearing_content
-
-
-def get_moving_elements() -> list:
-    """Return a list of moving elements"""
-    moved_elements_set = set()
-
-    refreshed_areas = {(e[4][0], e[4][1], e[4][2], e[4][3]) for e in events if e[2] == 'TYPE_WINDOW_CONTENT_CHANGED'}
-    # Helper function to compare and mark moving elements
-    def compare_and_mark_moving(element, comparison_element):
-        error_margin = 100 if is_within_nav_bars(element.bounds) else 2000
-        if element.identifier_group_alternative == comparison_element.identifier_group_alternative:
-            if element.bounds != comparison_element.bounds and not bounds_near_each_other(element.bounds, comparison_element.bounds, error=error_margin):
-                moved_elements_set.add(element.identifier_group_alternative)
-                # Determine moving direction based on y-coordinate comparison
-                current_y = element.bounds[0][1]
-                previous_y = comparison_element.bounds[0][1]
-                if current_y > previous_y:
-                    element.moving_direction = 'Below'  # Moving downwards
-                elif current_y < previous_y:
-                    element.moving_direction = 'Above'  # Moving upwards
-                if element.a11yFocusedStatus == A11yFocusedStatus.AFTER and comparison_element.a11yFocusedStatus == A11yFocusedStatus.BEFORE:
-                    element.moving_from_above_to_below = True
-
-    # Compare elements between frames to identify moving elements
-    for element in target_elements_2:
-        if wc:
-            for element_middle in target_element_middle:
-                compare_and_mark_moving(element, element_middle)
-        else:
-            for element_1 in target_elements_1:
-                compare_and_mark_moving(element, element_1)
-
-    # Filter moving elements based on the set of moved elements
-    moving_content = [element for element in target_elements_2
-                      if element.identifier_group_alternative in moved_elements_set
-                      and element.important_for_accessibility == 'true' and is_within_refreshed_area(element, refreshed_areas)]
-    if moving_content and accessibility_focuses:  # Check if not empty to avoid errors
-        define_a11y_focus(moving_content, last_focused_bounds, accessibility_focuses)
-    for element in target_elements_2:
-        if element not in moving_content:
-            element.moving_direction = None
-    filtered_moving_elements = filter_contained_elements(moving_content)
-    return filtered_moving_elements
-
-
-def get_attributes_changed_elements(initial_screen_nodes, middle_screen_nodes, final_screen_nodes) -> list[Node]:
-    """Return a list of content modification elements that have changed attributes"""
-
-    # Hash all nodes from each screen and keep references to the nodes
-    initial_hashes, initial_nodes = hash_nodes(initial_screen_nodes)
-    middle_hashes, middle_nodes = hash_nodes(middle_screen_nodes)
-    final_hashes, final_nodes = hash_nodes(final_screen_nodes)
-
-    # Container for nodes with changed attributes
-    changed_nodes = set()
-    # Compare hash values across screens and identify changed nodes
-
-    if wc:
-        for resource_id, hash_value in middle_hashes.items():
-            if resource_id in final_hashes and hash_value != final_hashes[resource_id]:
-                changed_nodes.add(middle_nodes[resource_id])
-    else:
-        for resource_id, hash_value in initial_hashes.items():
-            if resource_id in final_hashes and hash_value != final_hashes[resource_id]:
-                changed_nodes.add(initial_nodes[resource_id])
-
-    define_a11y_focus(changed_nodes, last_focused_bounds, accessibility_focuses)
-    return changed_nodes
-
-
-if __name__ == "__main__":
     # Get all base paths
     base_paths = get_base_paths(DATASET_FOLDER)
     logging.info(f"Found {len(base_paths)} tests:")
     for base_path in base_paths:
         logging.info(base_path)
 
-    if os.path.exists(RESULTS_FOLDER):
-        shutil.rmtree(RESULTS_FOLDER)
+    version = code_version()
+    manifest = RunManifest.load(RESULTS_MANIFEST)
+    previous_scenarios = set()
+    if args.incremental and os.path.exists(RESULTS_JSONL):
+        previous_scenarios = recorded_scenarios(RESULTS_JSONL)
+    else:
+        if os.path.exists(RESULTS_FOLDER):
+            shutil.rmtree(RESULTS_FOLDER)
+
+        # Delete previous pickle file
+        if os.path.exists(RESULTS_PICKLE):
+            os.remove(RESULTS_PICKLE)
+    # Findings are appended as soon as each scenario is analyzed, so an interrupted run keeps the finished ones
+    writer = ResultsWriter(RESULTS_JSONL, append=args.incremental)
+
+    # Drop the results of scenarios that were removed from the dataset
+    current = set(base_paths)
+    for base_path in list(manifest.scenarios.keys() | previous_scenarios):
+        if base_path not in current:
+            if args.incremental:
+                logging.info(f"Removing results of deleted test {base_path}")
+            manifest.remove(base_path)
+            if base_path in previous_scenarios:
+                writer.remove(base_path)
+                previous_scenarios.discard(base_path)
+            if os.path.exists(get_results_folder(base_path)):
+                shutil.rmtree(get_results_folder(base_path))
+
+    fingerprints = {base_path: manifest.fingerprint(base_path) for base_path in base_paths}
+    stale_paths = [base_path for base_path in base_paths
+                   if base_path not in previous_scenarios or
+                   not manifest.is_current(base_path, fingerprints[base_path], version)]
+    if args.incremental:
+        logging.info(f"Analyzing {len(stale_paths)} new or modified tests, "
+                     f"{len(base_paths) - len(stale_paths)} are up to date")
+        for base_path in stale_paths:
+            # Findings are only saved for scenarios with issues, so outdated folders must not linger
+            if os.path.exists(get_results_folder(base_path)):
+                shutil.rmtree(get_results_folder(base_path))
+
+    mismatches = []
+
+    process = partial(process_scenario, check_diff_engine=args.check_diff_engine,
+                      cache_dir=None if args.no_cache else args.cache_dir,
+                      cache_size=args.cache_size_mb * 1024 * 1024, images=args.images,
+                      image_format=args.image_format, profile=args.profile)
+    if args.workers > 1 or args.watch:
+        # The pool stays warm for the tests --watch analyzes later
+        executor = ProcessPoolExecutor(max_workers=max(1, args.workers),
+                                       initializer=partial(init_worker, ignore_interrupt=args.watch))
+    else:
+        executor = None
+    stage_timings = open(STAGE_TIMINGS, 'w', encoding='utf-8') if args.profile else None
+    run_summary = instrumentation.RunSummary()
+
+    def collect(result):
+        base_path, record, matches_legacy, stages = result
+        writer.write(record)
+        if matches_legacy is False:
+            mismatches.append(base_path)
+        if stage_timings is not None:
+            stage_timings.write(json.dumps({'scenario': base_path, 'stages': stages}) + "\n")
+            stage_timings.flush()
+            run_summary.add(base_path, stages)
+
+    analyzed_paths = len(stale_paths)
+    if args.pipeline:
+        if args.profile:
+            instrumentation.enable()
+        stages = pipeline_stages(args.prefetch, args.check_diff_engine, None if args.no_cache else args.cache_dir,
+                                 args.cache_size_mb * 1024 * 1024, args.images, args.image_format)
+        # Results are collected in the order of stale_paths, like a serial run
+        run_pipeline(stale_paths, stages, collect)
+    else:
+        # map() yields in submission order, so results are merged in the same order as a serial run
+        scenario_results = executor.map(process, stale_paths) if executor is not None else map(process, stale_paths)
+        for result in scenario_results:
+            collect(result)
+    if args.watch:
+        for base_path in base_paths:
+            manifest.update(base_path, fingerprints[base_path], version)
+        manifest.save()
+        watched_paths = list(base_paths)
+        analyzed_paths += watch_scenarios(process, executor, collect, manifest, version, watched_paths,
+                                          settle_seconds=args.settle_seconds)
+        base_paths = watched_paths
+        fingerprints = {base_path: manifest.scenarios[base_path]['files'] for base_path in base_paths}
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+    writer.close()
+    if stage_timings is not None:
+        stage_timings.close()
+        for line in run_summary.lines():
+            logging.info(line)
+
+    if args.check_diff_engine:
+        for base_path in mismatches:
+            logging.error(f"Diff engine and legacy detectors differ for {base_path}")
+        logging.info(f"Diff engine matches the legacy detectors on {analyzed_paths - len(mismatches)}/"
+                     f"{analyzed_paths} scenarios")
 
-    # Delete previous pickle file
-    if os.path.exists(RESULTS_PICKLE):
-        os.remove(RESULTS_PICKLE)
+    for base_path in base_paths:
+        # Also records refreshed mtimes of touched but unchanged files
+        manifest.update(base_path, fingerprints[base_path], version)
+    if args.incremental or args.watch:
+        # Drop the records that were replaced or removed by this run
+        compact(RESULTS_JSONL)
+
+    if args.no_pickle:
+        if os.path.exists(RESULTS_PICKLE):
+            # Do not leave the findings of an earlier run next to the new results
+            os.remove(RESULTS_PICKLE)
+    else:
+        # Save results to pickle file, in the order of a full run
+        convert_to_pickle(RESULTS_JSONL, RESULTS_PICKLE, order=base_paths)
+    if args.db:
+        with ResultsStore(args.db) as store:
+            logging.info(f"Stored the findings as run {store.import_results(RESULTS_JSONL, args.run_name, version)}")
+    manifest.save()
 
-    results_dict = dict()
 
-    for base_path in base_paths:
-        events, full_events, target_elements_1, target_element_middle, target_elements_2, wc, af, isn, icn, last_focused_bounds, last_clicked_bounds, is_significant_content, is_focus_changed = import_data(
-            base_path)
-
-        # Find accessibility focuses
-        accessibility_focuses = [i.bounds for i in target_elements_1 if i.a11yFocused == 'true']
-        accessibility_focuses += [i.bounds for i in target_elements_2 if i.a11yFocused == 'true']
-        if af:
-            ally_focus = [i[4] for i in events if i[2] == 'TYPE_VIEW_ACCESSIBILITY_FOCUSED']
-            ally_focus = [((i[0], i[1]), (i[2], i[3])) for i in ally_focus]
-            accessibility_focuses += ally_focus
-
-        # Find accessibility issues
-        if len(target_elements_2) != 0 and (len(target_elements_1) != 0 or len(target_element_middle) != 0) and len(accessibility_focuses) != 0:
-            appearing_nodes = get_appearing_elements(isn, icn, is_significant_content, is_focus_changed)
-            moving_nodes = get_moving_elements()
-            short_lived_nodes = get_short_lived_elements()
-            attributes_changed_nodes = get_attributes_changed_elements(target_elements_1, target_element_middle,
-                                                                           target_elements_2)
-            disappearing_nodes = get_disappearing_elements(isn, icn, is_significant_content, is_focus_changed)
-            attributes_changed_nodes, moving_nodes, short_lived_nodes, disappearing_nodes, appearing_nodes = get_problematic_dynamic_content_changes(attributes_changed_nodes,
-                                                                                                                                                     moving_nodes,
-                                                                                                                                                     short_lived_nodes, disappearing_nodes, appearing_nodes,
-                                                                                                                                                     target_elements_1, target_elements_2)
-        else:
-            short_lived_nodes = []
-            disappearing_nodes = []
-            appearing_nodes = []
-            moving_nodes = []
-            attributes_changed_nodes = []
-        results_dict[base_path] = (
-        short_lived_nodes, disappearing_nodes, appearing_nodes, moving_nodes, attributes_changed_nodes)
-
-        if save_only_on_error and len(short_lived_nodes) == 0 and len(disappearing_nodes) == 0 and len(
-                appearing_nodes) == 0 and len(moving_nodes) == 0 and len(attributes_changed_nodes) == 0:
-            logging.info(f"\nTest: {base_path}")
-            logging.info("No accessibility issues found")
-            continue
-        # Announce results
-        short_lived_regions = [i.bounds for i in short_lived_nodes]
-        disappearing_regions = [i.bounds for i in disappearing_nodes]
-        appearing_regions = [i.bounds for i in appearing_nodes]
-        moving_regions = [i.bounds for i in moving_nodes]
-        attributes_changed_regions = [i.bounds for i in attributes_changed_nodes]
-        logging.info(f"\nTest: {base_path}")
-        logging.info(f"Short-lived regions [{len(short_lived_nodes)}]: {short_lived_regions}")
-        logging.info(f"Disappearing regions [{len(disappearing_nodes)}]: {disappearing_regions}")
-        logging.info(f"Appearing regions [{len(appearing_nodes)}]: {appearing_regions}")
-        logging.info(f"Moving regions [{len(moving_nodes)}]: {moving_regions}")
-        logging.info(f"Attributes changed regions [{len(attributes_changed_nodes)}]: {attributes_changed_regions}")
-        # Save results
-        # Create folder in results folder
-        folder_name = base_path.split('/')[-2]
-        folder_name = f"{RESULTS_FOLDER}/{folder_name}"
-        os.makedirs(folder_name, exist_ok=True)
-        # Print results to text file
-        has_error = False
-        short_lived_nodes = nodes_to_important_attrs_list(short_lived_nodes)
-        disappearing_nodes = nodes_to_important_attrs_list(disappearing_nodes)
-        appearing_nodes = nodes_to_important_attrs_list(appearing_nodes)
-        moving_nodes = nodes_to_important_attrs_list(moving_nodes, is_moving=True)
-        attributes_changed_nodes = nodes_to_important_attrs_list(attributes_changed_nodes)
-        with open(folder_name + "/results.txt", 'w', encoding="utf-8") as f:
-            f.write(f"Test: {base_path}\n")
-            f.write(f"Window changed: {'True' if wc else 'False'}\n")
-            f.write(f"Short-lived Elements [{len(short_lived_nodes)}]: \n")
-            for node in short_lived_nodes:
-                json_dump = json.dumps(node)
-                f.write(json_dump + "\n")
-            f.write(f"Disappearing Elements [{len(disappearing_nodes)}]: \n")
-            for node in disappearing_nodes:
-                json_dump = json.dumps(node)
-                f.write(json_dump + "\n")
-            f.write(f"Appearing Elements [{len(appearing_nodes)}]: \n")
-            for node in appearing_nodes:
-                json_dump = json.dumps(node)
-                f.write(json_dump + "\n")
-            f.write(f"Moving Elements [{len(moving_nodes)}]: \n")
-            for node in moving_nodes:
-                json_dump = json.dumps(node)
-                f.write(json_dump + "\n")
-            f.write(f"Attributes Changed Elements [{len(attributes_changed_nodes)}]: \n")
-            for node in attributes_changed_nodes:
-                json_dump = json.dumps(node)
-                f.write(json_dump + "\n")
-
-            parts = base_path.split('/')
-            # Rejoin the first parts up to the first three slashes
-            base_path = '/'.join(parts[:3])
-            # Print separate images
-            img1 = glob.glob(f"{base_path}/*.1.png")[0]
-            img2 = glob.glob(f"{base_path}/*.action.2.png")[0]
-            img3 = glob.glob(f"{base_path}/*.3.png")[0]
-            images = {"/sl_1_out.png": img1, "/sl_2_out.png": img2, "/sl_3_out.png": img3, "/d_1_out.png": img1,
-                      "/d_2_out.png": img2, "/d_3_out.png": img3, "/a_1_out.png": img1, "/a_2_out.png": img2,
-                      "/a_3_out.png": img3, "/m_1_out.png": img1, "/m_2_out.png": img2, "/m_3_out.png": img3,
-                      "/ca_1_out.png": img1, "/ca_2_out.png": img2, "/ca_3_out.png": img3}
-            for key, value in images.items():
-                try:
-                    if key.startswith("/sl") and len(short_lived_nodes) != 0:
-                        overlay_boxes_on_image(value, short_lived_regions, [], [], [], [], folder_name + key)
-                    elif key.startswith("/d") and len(disappearing_nodes) != 0:
-                        overlay_boxes_on_image(value, [], disappearing_regions, [], [], [], folder_name + key)
-                    elif key.startswith("/a") and len(appearing_regions) != 0:
-                        overlay_boxes_on_image(value, [], [], appearing_regions, [], [], folder_name + key)
-                    elif key.startswith("/m") and len(moving_regions) != 0:
-                        overlay_boxes_on_image(value, [], [], [], moving_regions, [], folder_name + key)
-                    elif key.startswith("/ca") and len(attributes_changed_regions) != 0:
-                        overlay_boxes_on_image(value, [], [], [], [], attributes_changed_regions, folder_name + key)
-                except:
-                    logging.error(f"Error showing image {value}")
-                    has_error = True
-        if has_error:
-            # Remove folder
-            shutil.rmtree(folder_name)
-            continue
-
-    # Save results to pickle file
-    with open(RESULTS_PICKLE, 'wb') as f:
-        pickle.dump(results_dict, f)
+if __name__ == "__main__":
+    main()
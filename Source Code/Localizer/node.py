@@ -1,4 +1,17 @@
+import zlib
 from enum import Enum
+from sys import intern
+
+
+def digest(values) -> int:
+    """Fast 64-bit hash of strings. Unlike the built-in hash of strings it is the same in every process, so hashes
+    can be cached and compared between runs.
+
+    Combines the CRC-32 of the data with the data read as an integer, which the built-in hash of ints reduces modulo
+    the prime 2**61 - 1. Both run in C and neither is cryptographic, and since one is linear over bits and the other
+    over integers, data colliding in one is not expected to collide in the other"""
+    data = '\x1f'.join(values).encode()
+    return hash((zlib.crc32(data), int.from_bytes(data, 'little')))
 
 
 class A11yFocusedStatus(Enum):
@@ -9,39 +22,169 @@ class A11yFocusedStatus(Enum):
     def __str__(self):
         return self.name
 class Node:
-    def __init__(self, element):
-        self.text = element.attrib.get('text', '')
-        self.content_description = element.attrib.get('content-desc', '')
-        self.class_name = element.attrib.get('class', '')
-        self.resource_id = element.attrib.get('resource-id', '')
-        self.bounds = element.attrib.get('bounds', '')
-        self.size = self.calculate_size(self.bounds)
-        self.a11yFocused = element.attrib.get('a11yFocused', '')
-        self.liveRegion = element.attrib.get('liveRegion', '')
-        self.visible = element.attrib.get('visible', '')
-        self.checked = element.attrib.get('checked', '')
+    # Slots instead of a per-instance dict, since a batch keeps many thousands of nodes alive
+    __slots__ = ('text', 'content_description', 'class_name', 'resource_id', 'bounds', 'size', 'a11yFocused',
+                 'liveRegion', 'visible', 'checked', 'moving_from_above_to_below', 'is_changed', 'is_appearing',
+                 'is_disappearing', 'is_short_lived', 'is_moving', 'index', 'action_list', 'a11yFocusedStatus',
+                 'clickable', 'important_for_accessibility', 'selected', 'focusable', 'enabled', 'drawing_order',
+                 'moving_direction', 'parent', 'tree', 'tree_position', '_is_ancestor_live_region', '_raw_bounds',
+                 '_identifier_group', '_identifier_group_alternative', '_identifier_group_alternative_2',
+                 '_attributes_hash', 'subtree_hash', '_path')
+
+    def __init__(self, element, coords=None):
+        # Attribute values repeat across nodes and frames, so they are interned to share a single copy
+        get = element.attrib.get
+        self.text = intern(get('text', ''))
+        self.content_description = intern(get('content-desc', ''))
+        self.class_name = intern(get('class', ''))
+        self.resource_id = intern(get('resource-id', ''))
+        self.bounds = intern(get('bounds', ''))
+        # The identifier groups use the bounds string from the dump, even after loaders replace bounds with coordinates
+        self._raw_bounds = self.bounds
+        # Loaders that already parsed the bounds pass them as coords to avoid parsing the string again
+        self.size = (abs(coords[2] - coords[0]), abs(coords[3] - coords[1])) if coords else self.calculate_size(self.bounds)
+        self.a11yFocused = intern(get('a11yFocused', ''))
+        self.liveRegion = intern(get('liveRegion', ''))
+        self.visible = intern(get('visible', ''))
+        self.checked = intern(get('checked', ''))
         self.moving_from_above_to_below = False
         self.is_changed = None
         self.is_appearing = None
         self.is_disappearing = None
         self.is_short_lived = None
         self.is_moving = None
-        self.index = element.attrib.get('index', '')
-        self.action_list = element.attrib.get('actionList', '')
+        self.index = intern(get('index', ''))
+        self.action_list = intern(get('actionList', ''))
         self.a11yFocusedStatus = A11yFocusedStatus.ON if self.a11yFocused == "true" else A11yFocusedStatus.UNCERTAIN
-        self.clickable = element.attrib.get('clickable', '')
-        self.important_for_accessibility = element.attrib.get('importantForAccessibility', '')
-        self.selected = element.attrib.get('selected', '')
-        self.focusable = element.attrib.get('focusable', '')
-        self.enabled = element.attrib.get('enabled', '')
-        self.drawing_order = element.attrib.get('drawingOrder', '')
-        self.identifier_group = tuple([self.resource_id, self.class_name, self.index, self.content_description, self.text, self.bounds])
+        self.clickable = intern(get('clickable', ''))
+        self.important_for_accessibility = intern(get('importantForAccessibility', ''))
+        self.selected = intern(get('selected', ''))
+        self.focusable = intern(get('focusable', ''))
+        self.enabled = intern(get('enabled', ''))
+        self.drawing_order = intern(get('drawingOrder', ''))
         self.moving_direction = None
-        self.identifier_group_alternative = tuple([self.class_name, self.resource_id, self.text, self.index,
-                                                   self.clickable, self.important_for_accessibility, self.liveRegion, self.content_description, self.drawing_order])
-        self.identifier_group_alternative_2 = tuple([self.class_name, self.resource_id, self.content_description, self.text])
+        # Identifier groups are built on first use
+        self._identifier_group = None
+        self._identifier_group_alternative = None
+        self._identifier_group_alternative_2 = None
         self.parent = None
-        self.is_ancestor_live_region = None
+        # Set by TreeIndex.open when the node is added to the index of its frame
+        self.tree = None
+        self.tree_position = -1
+        self._is_ancestor_live_region = None
+        self._path = None
+        # Only the attributes-changed detector compares it, so it is hashed on first use
+        self._attributes_hash = None
+        # Hash of this node and all of its descendants, set by TreeIndex.close
+        self.subtree_hash = None
+
+    @property
+    def identifier_group(self):
+        if self._identifier_group is None:
+            self._identifier_group = (self.resource_id, self.class_name, self.index, self.content_description,
+                                      self.text, self._raw_bounds)
+        return self._identifier_group
+
+    @property
+    def identifier_group_alternative(self):
+        if self._identifier_group_alternative is None:
+            self._identifier_group_alternative = (self.class_name, self.resource_id, self.text, self.index,
+                                                  self.clickable, self.important_for_accessibility, self.liveRegion,
+                                                  self.content_description, self.drawing_order)
+        return self._identifier_group_alternative
+
+    @property
+    def identifier_group_alternative_2(self):
+        if self._identifier_group_alternative_2 is None:
+            self._identifier_group_alternative_2 = (self.class_name, self.resource_id, self.content_description,
+                                                    self.text)
+        return self._identifier_group_alternative_2
+
+    @property
+    def attributes_hash(self) -> int:
+        if self._attributes_hash is None:
+            self._attributes_hash = self.hash_attributes()
+        return self._attributes_hash
+
+    def hash_attributes(self):
+        """Hash of the attributes that the attributes-changed detector compares"""
+        return digest((self.text, self.content_description, self.class_name, self.visible, self.clickable,
+                       self.important_for_accessibility, self.enabled, self.checked, self.selected))
+
+    @property
+    def content(self) -> tuple:
+        """All attributes of the node that the detectors read, including the bounds from the dump"""
+        return (self.text, self.content_description, self.class_name, self.visible, self.clickable,
+                self.important_for_accessibility, self.enabled, self.checked, self.selected, self.resource_id,
+                self._raw_bounds, self.index, self.liveRegion, self.focusable, self.drawing_order, self.a11yFocused,
+                self.action_list)
+
+    @property
+    def content_hash(self):
+        """Hash of the content of the node"""
+        return digest(self.content)
+
+    @property
+    def path(self):
+        """Class, resource id and index of the node and of each of its ancestors, from the root down. Built on first
+        use from the path of the parent, which hash_nodes only asks for nodes sharing their resource id"""
+        if self._path is None:
+            parent_path = self.parent.path if self.parent is not None else ()
+            self._path = parent_path + ((self.class_name, self.resource_id, self.index),)
+        return self._path
+
+    @property
+    def is_ancestor_live_region(self):
+        """Whether any ancestor has a liveRegion that is not "0", read from the tree index of the frame"""
+        if self._is_ancestor_live_region is None and self.tree is not None:
+            return self.tree.ancestor_live_region[self.tree_position]
+        return self._is_ancestor_live_region
+
+    @is_ancestor_live_region.setter
+    def is_ancestor_live_region(self, value):
+        self._is_ancestor_live_region = value
+
+    def __getstate__(self):
+        # The state is a tuple in slot order, which is smaller and faster to load than a dict. It keeps the index of
+        # the frame, which the timeline diff walks, and the flags read from it
+        state = [getattr(self, slot) for slot in self.__slots__]
+        state[_ANCESTOR_LIVE_REGION_SLOT] = self.is_ancestor_live_region
+        # Paths grow with the depth of the node, so they are left out and built again when needed
+        state[_PATH_SLOT] = None
+        return tuple(state)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Nodes pickled while the state was a dict, i.e. the instance dict of nodes without slots or a dict of
+            # the slots of the time. Attributes that became properties are stored in their slots
+            for key, value in state.items():
+                setattr(self, _LEGACY_SLOTS.get(key, key), value)
+        else:
+            # Tuples pickled before slots were added at the end are shorter
+            for slot, value in zip(self.__slots__, state):
+                setattr(self, slot, value)
+        self._set_missing_slots()
+
+    def _set_missing_slots(self):
+        """Sets the slots that did not exist yet when the node was pickled"""
+        for slot in ('is_changed', 'is_appearing', 'is_disappearing', 'is_short_lived', 'is_moving',
+                     'moving_direction', 'parent', 'tree', '_is_ancestor_live_region', '_identifier_group',
+                     '_identifier_group_alternative', '_identifier_group_alternative_2', '_path',
+                     '_attributes_hash'):
+            if not hasattr(self, slot):
+                setattr(self, slot, None)
+        if not hasattr(self, 'tree_position'):
+            self.tree_position = -1
+        if not hasattr(self, '_raw_bounds'):
+            # The first identifier group ends with the bounds string from the dump, which the loaders replaced
+            # with coordinates
+            if self._identifier_group is not None:
+                self._raw_bounds = self._identifier_group[-1]
+            else:
+                self._raw_bounds = self.bounds
+        if not hasattr(self, 'subtree_hash'):
+            # Without the tree of its frame only the node itself can be hashed
+            self.subtree_hash = self.content_hash
 
     @staticmethod
     def calculate_size(bounds_str):
@@ -81,4 +224,14 @@ class Node:
             if current_node.liveRegion != "0":
                 return True
             current_node = current_node.parent  # Move to the next ancestor
-        return False
\ No newline at end of file
+        return False
+
+
+_ANCESTOR_LIVE_REGION_SLOT = Node.__slots__.index('_is_ancestor_live_region')
+_PATH_SLOT = Node.__slots__.index('_path')
+# Attributes of nodes pickled with a dict state that are now read through properties
+_LEGACY_SLOTS = {'identifier_group': '_identifier_group',
+                 'identifier_group_alternative': '_identifier_group_alternative',
+                 'identifier_group_alternative_2': '_identifier_group_alternative_2',
+                 'is_ancestor_live_region': '_is_ancestor_live_region',
+                 'attributes_hash': '_attributes_hash'}
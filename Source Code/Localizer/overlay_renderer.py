@@ -0,0 +1,103 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw
+from consts import RESULTS_FOLDER
+
+# Result image prefix and box color of each change category, in the order of the analysis results
+CATEGORY_COLORS = {"sl": "blue", "d": "red", "a": "orange", "m": "purple", "ca": "black"}
+# Extension and save() arguments of each output format. png matches the images overlay_boxes_on_image writes
+IMAGE_FORMATS = {
+    "png": (".png", {}),
+    "png-fast": (".png", {"compress_level": 1}),
+    "jpeg": (".jpg", {"quality": 90}),
+    "webp": (".webp", {"quality": 90, "method": 0}),
+}
+OVERLAY_SPEC = "overlays.json"
+
+_pool = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+    return _pool
+
+
+def overlay_spec(frames: list, regions: list) -> dict:
+    """Describes the result images of a scenario. frames are the paths of the initial, middle and final screenshots,
+    regions the bounds of each category in the order of CATEGORY_COLORS"""
+    return {"frames": frames,
+            "regions": {prefix: [list(map(list, box)) for box in boxes]
+                        for prefix, boxes in zip(CATEGORY_COLORS, regions) if len(boxes) != 0}}
+
+
+def _draw_and_save(image, boxes: list, color: str, output_path: str, image_format: str) -> None:
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        top_left, bottom_right = box
+        draw.rectangle([tuple(top_left), tuple(bottom_right)], outline=color, width=3)
+    extension, save_options = IMAGE_FORMATS[image_format]
+    if extension == ".jpg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(output_path, **save_options)
+
+
+def render_overlays(spec: dict, folder_name: str, image_format: str = "png") -> bool:
+    """Writes the result images described by an overlay spec into the given folder. Each screenshot is decoded once,
+    and the boxes of every category are drawn on copies that are encoded in a thread pool. Returns whether all
+    images could be written"""
+    extension = IMAGE_FORMATS[image_format][0]
+    has_error = False
+    images = []
+    for frame_path in spec["frames"]:
+        try:
+            with Image.open(frame_path) as image:
+                image.load()
+            images.append(image)
+        except Exception:
+            logging.error(f"Error showing image {frame_path}")
+            images.append(None)
+            has_error = True
+    futures = []
+    for prefix, boxes in spec["regions"].items():
+        for frame_number, (image, frame_path) in enumerate(zip(images, spec["frames"]), start=1):
+            if image is None:
+                continue
+            output_path = f"{folder_name}/{prefix}_{frame_number}_out{extension}"
+            futures.append((frame_path, _get_pool().submit(_draw_and_save, image, boxes, CATEGORY_COLORS[prefix],
+                                                            output_path, image_format)))
+    for frame_path, future in futures:
+        try:
+            future.result()
+        except Exception:
+            logging.error(f"Error showing image {frame_path}")
+            has_error = True
+    return not has_error
+
+
+def render_pending(results_folder: str = RESULTS_FOLDER, image_format: str = "png") -> None:
+    """Renders the images of all result folders that were saved with lazy image rendering"""
+    for spec_path in sorted(glob.glob(f"{results_folder}/*/{OVERLAY_SPEC}")):
+        folder_name = os.path.dirname(spec_path)
+        with open(spec_path, encoding="utf-8") as f:
+            spec = json.load(f)
+        if render_overlays(spec, folder_name, image_format):
+            os.remove(spec_path)
+        else:
+            shutil.rmtree(folder_name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Renders the result images of a run with --lazy-images")
+    parser.add_argument("--results-folder", default=RESULTS_FOLDER)
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS), default="png")
+    args = parser.parse_args()
+    render_pending(args.results_folder, args.image_format)
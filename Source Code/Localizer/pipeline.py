@@ -0,0 +1,83 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, NamedTuple
+
+# Marks the end of the items in a queue
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    """A step of a pipeline. function runs on threads of its own, at most concurrency items at a time, and its
+    results are passed on in input order. queue_size bounds the results waiting for the next stage"""
+    name: str
+    function: Callable
+    concurrency: int = 1
+    queue_size: int = 1
+
+
+async def _discover(items: Iterable, outbox: asyncio.Queue) -> None:
+    for item in items:
+        await outbox.put(item)
+    await outbox.put(_DONE)
+
+
+async def _run_stage(stage: Stage, executor: ThreadPoolExecutor, inbox: asyncio.Queue,
+                     outbox: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    running = deque()
+    # Task taking the next item from the inbox
+    next_item = None
+    inputs_done = False
+    while running or not inputs_done:
+        # Pass the oldest result on once it is ready or no more items can be started, so results keep their order
+        if running and (inputs_done or len(running) >= stage.concurrency or running[0].done()):
+            # Waits while the next stage is behind, which stops this stage from taking more items
+            await outbox.put(await running.popleft())
+            continue
+        if next_item is None:
+            next_item = asyncio.ensure_future(inbox.get())
+        if running:
+            # Start the next item as soon as it arrives, unless the oldest result is ready first
+            await asyncio.wait((running[0], next_item), return_when=asyncio.FIRST_COMPLETED)
+            if not next_item.done():
+                continue
+        item = await next_item
+        next_item = None
+        if item is _DONE:
+            inputs_done = True
+        else:
+            running.append(loop.run_in_executor(executor, stage.function, item))
+    await outbox.put(_DONE)
+
+
+async def _collect(collect: Callable, inbox: asyncio.Queue) -> None:
+    while (item := await inbox.get()) is not _DONE:
+        collect(item)
+
+
+async def _run(items: Iterable, stages: list, collect: Callable) -> None:
+    executors = [ThreadPoolExecutor(max_workers=stage.concurrency, thread_name_prefix=stage.name)
+                 for stage in stages]
+    queues = [asyncio.Queue(maxsize=1)] + [asyncio.Queue(maxsize=stage.queue_size) for stage in stages]
+    try:
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(_discover(items, queues[0]))
+            for stage, executor, inbox, outbox in zip(stages, executors, queues, queues[1:]):
+                tasks.create_task(_run_stage(stage, executor, inbox, outbox))
+            tasks.create_task(_collect(collect, queues[-1]))
+    finally:
+        for executor in executors:
+            executor.shutdown(cancel_futures=True)
+
+
+def run_pipeline(items: Iterable, stages: list, collect: Callable) -> None:
+    """Passes every item through the stages in order and calls collect with each final result, in input order.
+
+    Each stage runs on its own threads, so e.g. reading the files of one scenario overlaps with analyzing the
+    previous one. Stages block once the queue to the next stage is full, so a slow stage holds the earlier ones back
+    instead of letting items pile up in memory. The first exception of a stage stops the pipeline and is raised."""
+    try:
+        asyncio.run(_run(items, stages, collect))
+    except ExceptionGroup as group:
+        raise group.exceptions[0]
@@ -0,0 +1,92 @@
+import glob
+import json
+import logging
+import os
+import shutil
+from consts import RESULTS_FOLDER
+from instrumentation import span
+from overlay_renderer import OVERLAY_SPEC, overlay_spec, render_overlays
+from utils import get_scenario_folder, nodes_to_important_attrs_list
+
+save_only_on_error = True
+
+
+def get_results_folder(base_path: str) -> str:
+    """Returns the folder in the results folder holding the results of a scenario"""
+    return f"{RESULTS_FOLDER}/{base_path.split('/')[-2]}"
+
+
+def save_scenario_results(base_path: str, wc: bool, results: tuple, images="render", image_format="png") -> None:
+    """Logs the findings of a scenario and writes them to its folder in the results folder. images is "render" to
+    draw the result images, "lazy" to only describe them for overlay_renderer.py, or "none" to skip them"""
+    short_lived_nodes, disappearing_nodes, appearing_nodes, moving_nodes, attributes_changed_nodes = results
+    if save_only_on_error and len(short_lived_nodes) == 0 and len(disappearing_nodes) == 0 and len(
+            appearing_nodes) == 0 and len(moving_nodes) == 0 and len(attributes_changed_nodes) == 0:
+        logging.info(f"\nTest: {base_path}")
+        logging.info("No accessibility issues found")
+        return
+    # Announce results
+    short_lived_regions = [i.bounds for i in short_lived_nodes]
+    disappearing_regions = [i.bounds for i in disappearing_nodes]
+    appearing_regions = [i.bounds for i in appearing_nodes]
+    moving_regions = [i.bounds for i in moving_nodes]
+    attributes_changed_regions = [i.bounds for i in attributes_changed_nodes]
+    logging.info(f"\nTest: {base_path}")
+    logging.info(f"Short-lived regions [{len(short_lived_nodes)}]: {short_lived_regions}")
+    logging.info(f"Disappearing regions [{len(disappearing_nodes)}]: {disappearing_regions}")
+    logging.info(f"Appearing regions [{len(appearing_nodes)}]: {appearing_regions}")
+    logging.info(f"Moving regions [{len(moving_nodes)}]: {moving_regions}")
+    logging.info(f"Attributes changed regions [{len(attributes_changed_nodes)}]: {attributes_changed_regions}")
+    # Save results
+    # Create folder in results folder
+    folder_name = get_results_folder(base_path)
+    os.makedirs(folder_name, exist_ok=True)
+    # Print results to text file
+    short_lived_nodes = nodes_to_important_attrs_list(short_lived_nodes)
+    disappearing_nodes = nodes_to_important_attrs_list(disappearing_nodes)
+    appearing_nodes = nodes_to_important_attrs_list(appearing_nodes)
+    moving_nodes = nodes_to_important_attrs_list(moving_nodes, is_moving=True)
+    attributes_changed_nodes = nodes_to_important_attrs_list(attributes_changed_nodes)
+    with open(folder_name + "/results.txt", 'w', encoding="utf-8") as f:
+        f.write(f"Test: {base_path}\n")
+        f.write(f"Window changed: {'True' if wc else 'False'}\n")
+        f.write(f"Short-lived Elements [{len(short_lived_nodes)}]: \n")
+        for node in short_lived_nodes:
+            json_dump = json.dumps(node)
+            f.write(json_dump + "\n")
+        f.write(f"Disappearing Elements [{len(disappearing_nodes)}]: \n")
+        for node in disappearing_nodes:
+            json_dump = json.dumps(node)
+            f.write(json_dump + "\n")
+        f.write(f"Appearing Elements [{len(appearing_nodes)}]: \n")
+        for node in appearing_nodes:
+            json_dump = json.dumps(node)
+            f.write(json_dump + "\n")
+        f.write(f"Moving Elements [{len(moving_nodes)}]: \n")
+        for node in moving_nodes:
+            json_dump = json.dumps(node)
+            f.write(json_dump + "\n")
+        f.write(f"Attributes Changed Elements [{len(attributes_changed_nodes)}]: \n")
+        for node in attributes_changed_nodes:
+            json_dump = json.dumps(node)
+            f.write(json_dump + "\n")
+
+        base_path = get_scenario_folder(base_path)
+    if images == "none":
+        return
+    # Print separate images
+    img1 = glob.glob(f"{base_path}/*.1.png")[0]
+    img2 = glob.glob(f"{base_path}/*.action.2.png")[0]
+    img3 = glob.glob(f"{base_path}/*.3.png")[0]
+    spec = overlay_spec([img1, img2, img3], [short_lived_regions, disappearing_regions, appearing_regions,
+                                             moving_regions, attributes_changed_regions])
+    if images == "lazy":
+        # Rendered later by overlay_renderer.py
+        with open(f"{folder_name}/{OVERLAY_SPEC}", 'w', encoding="utf-8") as f:
+            json.dump(spec, f)
+    else:
+        with span("render_images"):
+            rendered = render_overlays(spec, folder_name, image_format)
+        if not rendered:
+            # Remove folder
+            shutil.rmtree(folder_name)
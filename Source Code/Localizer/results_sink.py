@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import pickle
+from node import Node, A11yFocusedStatus
+from consts import RESULTS_JSONL, RESULTS_PICKLE
+
+# Change categories in the order of the analysis results tuple
+CATEGORIES = ('short_lived', 'disappearing', 'appearing', 'moving', 'attributes_changed')
+RESULTS_FORMAT = 'localizer-results'
+RESULTS_FORMAT_VERSION = 1
+# Node attributes kept besides important_attributes(), so the converter can rebuild nodes for results.pickle
+EXTRA_ATTRIBUTES = ('moving_from_above_to_below', '_raw_bounds', 'index', 'drawing_order', 'a11yFocused', 'checked',
+                    'selected', 'focusable', 'enabled', 'action_list', 'size', 'is_ancestor_live_region')
+
+
+def node_to_record(node: Node) -> dict:
+    record = node.important_attributes()
+    for attribute in EXTRA_ATTRIBUTES:
+        record[attribute] = getattr(node, attribute)
+    return record
+
+
+def record_to_node(record: dict) -> Node:
+    """Rebuilds a node from its record. Nodes are not linked to their parents or frames anymore"""
+    node = Node.__new__(Node)
+    for slot in Node.__slots__:
+        setattr(node, slot, None)
+    node.tree_position = -1
+    for attribute, value in record.items():
+        if attribute == 'a11yFocusedStatus':
+            value = A11yFocusedStatus[value]
+        elif attribute == 'bounds' and isinstance(value, list):
+            value = tuple(tuple(point) for point in value)
+        elif attribute == 'size' and value is not None:
+            value = tuple(value)
+        setattr(node, attribute, value)
+    return node
+
+
+def scenario_record(base_path: str, wc: bool, results: tuple) -> dict:
+    """Flattens the analysis results of a scenario into a JSON-compatible record without any Node objects"""
+    return {'scenario': base_path, 'app': base_path.split('/')[-3], 'window_changed': bool(wc),
+            'findings': {category: [node_to_record(node) for node in nodes]
+                         for category, nodes in zip(CATEGORIES, results)}}
+
+
+def record_to_results(record: dict) -> tuple:
+    """Rebuilds the analysis results tuple of a scenario from its record"""
+    return tuple([record_to_node(attributes) for attributes in record['findings'][category]]
+                 for category in CATEGORIES)
+
+
+class ResultsWriter:
+    """Appends one JSON line per scenario to a results file as soon as the scenario is analyzed.
+
+    Records are flushed one at a time, so a crashed run leaves every finished scenario readable. A scenario may be
+    recorded more than once, e.g. by incremental runs, in which case the last record wins. Removed scenarios are
+    recorded as tombstones."""
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        is_new = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            _truncate_partial_line(path)
+        self.file = open(path, 'w' if is_new else 'a', encoding='utf-8')
+        if is_new:
+            self._write_line({'format': RESULTS_FORMAT, 'version': RESULTS_FORMAT_VERSION})
+
+    def _write_line(self, data: dict) -> None:
+        # One write per line, so an interrupted run can at most truncate the last line
+        self.file.write(json.dumps(data, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def write(self, record: dict) -> None:
+        self._write_line(record)
+
+    def remove(self, base_path: str) -> None:
+        self._write_line({'scenario': base_path, 'removed': True})
+
+    def close(self) -> None:
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _truncate_partial_line(path: str) -> None:
+    """Cuts off the incomplete last line an interrupted run may have left, so appended lines start on their own"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != size:
+            f.truncate(position)
+
+
+def iter_records(path: str):
+    """Yields the lines of a results file in the order they were written, including tombstones. A truncated last
+    line from an interrupted run is skipped"""
+    with open(path, encoding='utf-8') as f:
+        header = f.readline()
+        if not header:
+            return
+        if json.loads(header).get('format') != RESULTS_FORMAT:
+            raise ValueError(f"{path} is not a results file")
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            yield json.loads(line)
+
+
+def load_records(path: str) -> dict:
+    """Returns the last record of every scenario that is still in the results file"""
+    records = dict()
+    for record in iter_records(path):
+        if record.get('removed'):
+            records.pop(record['scenario'], None)
+        else:
+            # Keep the position of the first record, like a dict update
+            records[record['scenario']] = record
+    return records
+
+
+def recorded_scenarios(path: str) -> set:
+    """Returns the base paths of the scenarios in a results file, without keeping their records in memory"""
+    scenarios = set()
+    for record in iter_records(path):
+        if record.get('removed'):
+            scenarios.discard(record['scenario'])
+        else:
+            scenarios.add(record['scenario'])
+    return scenarios
+
+
+def compact(path: str) -> None:
+    """Rewrites a results file with only the last record of each scenario, in the order of load_records.
+
+    Only the offset of each scenario's last record is kept in memory. The records are then copied line by line to a
+    temporary file, which replaces the results file"""
+    offsets = dict()
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if not header:
+            return
+        if json.loads(header).get('format') != RESULTS_FORMAT:
+            raise ValueError(f"{path} is not a results file")
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            record = json.loads(line)
+            if record.get('removed'):
+                offsets.pop(record['scenario'], None)
+            else:
+                offsets[record['scenario']] = offset
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as out:
+            out.write(header)
+            for offset in offsets.values():
+                f.seek(offset)
+                out.write(f.readline())
+            out.flush()
+            os.fsync(out.fileno())
+    os.replace(temp_path, path)
+
+
+def convert_to_pickle(jsonl_path: str = RESULTS_JSONL, pickle_path: str = RESULTS_PICKLE, order=None) -> dict:
+    """Writes the legacy results.pickle, {base path: results tuple of Node lists}, from a results file. order lists
+    the base paths in the order they should be pickled, by default the order of the results file"""
+    records = load_records(jsonl_path)
+    if order is None:
+        order = records.keys()
+    results_dict = {base_path: record_to_results(records[base_path]) for base_path in order if base_path in records}
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(results_dict, f)
+    return results_dict
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts a results file to the legacy results.pickle")
+    parser.add_argument("jsonl", nargs="?", default=RESULTS_JSONL)
+    parser.add_argument("pickle", nargs="?", default=RESULTS_PICKLE)
+    args = parser.parse_args()
+    convert_to_pickle(args.jsonl, args.pickle)
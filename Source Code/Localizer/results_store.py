@@ -0,0 +1,218 @@
+import argparse
+import datetime
+import hashlib
+import sqlite3
+from consts import RESULTS_JSONL, RESULTS_DB
+from results_sink import CATEGORIES, load_records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    code_version TEXT
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    scenario TEXT NOT NULL,
+    app TEXT NOT NULL,
+    window_changed INTEGER NOT NULL,
+    UNIQUE (run_id, scenario)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    finding_key INTEGER NOT NULL,
+    app TEXT NOT NULL,
+    category TEXT NOT NULL,
+    resource_id TEXT,
+    class_name TEXT,
+    text TEXT,
+    content_description TEXT,
+    bounds TEXT,
+    live_region TEXT,
+    visible TEXT,
+    a11y_focused_status TEXT,
+    clickable TEXT,
+    important_for_accessibility TEXT,
+    moving_direction TEXT
+);
+CREATE INDEX IF NOT EXISTS scenarios_app ON scenarios (run_id, app);
+CREATE INDEX IF NOT EXISTS findings_app ON findings (run_id, app, category);
+CREATE INDEX IF NOT EXISTS findings_category ON findings (run_id, category);
+CREATE INDEX IF NOT EXISTS findings_resource_id ON findings (resource_id);
+CREATE INDEX IF NOT EXISTS findings_bounds ON findings (bounds);
+CREATE INDEX IF NOT EXISTS findings_scenario ON findings (scenario_id);
+CREATE INDEX IF NOT EXISTS findings_key ON findings (run_id, finding_key);
+"""
+
+# Columns that identify a finding across runs, besides its scenario
+FINDING_KEY = ('category', 'resource_id', 'class_name', 'text', 'content_description', 'bounds')
+FINDING_COLUMNS = FINDING_KEY + ('live_region', 'visible', 'a11y_focused_status', 'clickable',
+                                 'important_for_accessibility', 'moving_direction')
+# Record attributes stored in each column
+RECORD_ATTRIBUTES = {'resource_id': 'resource_id', 'class_name': 'class_name', 'text': 'text',
+                     'content_description': 'content_description', 'bounds': 'bounds', 'live_region': 'liveRegion',
+                     'visible': 'visible', 'a11y_focused_status': 'a11yFocusedStatus', 'clickable': 'clickable',
+                     'important_for_accessibility': 'important_for_accessibility',
+                     'moving_direction': 'moving_direction'}
+
+
+def bounds_to_text(bounds) -> str:
+    """Returns bounds in the format of the XML dumps, so they can be indexed and compared as text"""
+    if bounds is None or isinstance(bounds, str):
+        return bounds
+    (x1, y1), (x2, y2) = bounds
+    return f"[{x1},{y1}][{x2},{y2}]"
+
+
+def finding_key(scenario: str, values) -> int:
+    """Returns a 64 bit hash of a finding's scenario and FINDING_KEY values. Runs are compared by looking up these
+    hashes in the index instead of comparing all the text columns"""
+    data = '\x1f'.join([scenario, *('' if value is None else str(value) for value in values)])
+    return int.from_bytes(hashlib.blake2b(data.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+class ResultsStore:
+    """SQLite database of the findings of many localizer runs, indexed to compare runs without loading them"""
+    def __init__(self, path: str = RESULTS_DB):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # Safe with WAL, a crash can only lose the last committed run
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run_id(self, name: str) -> int:
+        row = self.connection.execute("SELECT id FROM runs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown run {name}")
+        return row[0]
+
+    def runs(self) -> list:
+        """Returns (name, created_at, scenario count, finding count) of every run, oldest first"""
+        return self.connection.execute(
+            "SELECT name, created_at, "
+            "(SELECT COUNT(*) FROM scenarios WHERE run_id = runs.id), "
+            "(SELECT COUNT(*) FROM findings WHERE run_id = runs.id) "
+            "FROM runs ORDER BY id").fetchall()
+
+    def add_run(self, records, name: str = None, code_version: str = None) -> str:
+        """Stores the scenario records of a run in one transaction and returns its name. A run with the same name
+        is replaced"""
+        created_at = datetime.datetime.now().isoformat(timespec='seconds')
+        name = name or created_at
+        placeholders = ', '.join('?' * (len(FINDING_COLUMNS) + 4))
+        insert_finding = (f"INSERT INTO findings (run_id, scenario_id, finding_key, app, {', '.join(FINDING_COLUMNS)}) "
+                          f"VALUES ({placeholders})")
+        with self.connection:
+            self.connection.execute("DELETE FROM runs WHERE name = ?", (name,))
+            run_id = self.connection.execute("INSERT INTO runs (name, created_at, code_version) VALUES (?, ?, ?)",
+                                             (name, created_at, code_version)).lastrowid
+            for record in records:
+                if record.get('removed'):
+                    continue
+                scenario_id = self.connection.execute(
+                    "INSERT INTO scenarios (run_id, scenario, app, window_changed) VALUES (?, ?, ?, ?)",
+                    (run_id, record['scenario'], record['app'], int(record['window_changed']))).lastrowid
+                rows = []
+                for category in CATEGORIES:
+                    for node in record['findings'][category]:
+                        values = (category, *(bounds_to_text(node.get('bounds')) if column == 'bounds'
+                                              else node.get(attribute)
+                                              for column, attribute in RECORD_ATTRIBUTES.items()))
+                        rows.append((run_id, scenario_id, finding_key(record['scenario'], values[:len(FINDING_KEY)]),
+                                     record['app'], *values))
+                self.connection.executemany(insert_finding, rows)
+        return name
+
+    def import_results(self, jsonl_path: str = RESULTS_JSONL, name: str = None, code_version: str = None) -> str:
+        """Stores a results file as a run. Files written by incremental runs or the watcher can record a scenario
+        more than once or record its removal, so only the last record of each scenario that was not removed is
+        stored"""
+        return self.add_run(load_records(jsonl_path).values(), name, code_version)
+
+    @staticmethod
+    def _only_in_query(columns: str) -> str:
+        """Selects the findings of the first run whose key is missing from the second run. The keys are compared
+        on the covering finding_key index, and only the differing rows are read from the table. Takes the first
+        run's id twice, then the second run's id"""
+        return (f"SELECT DISTINCT {columns} FROM findings f JOIN scenarios s ON s.id = f.scenario_id "
+                f"WHERE f.run_id = ? AND f.finding_key IN "
+                f"(SELECT finding_key FROM findings WHERE run_id = ? "
+                f"EXCEPT SELECT finding_key FROM findings WHERE run_id = ?)")
+
+    def diff(self, old_run: str, new_run: str) -> tuple:
+        """Returns the (scenario, app, *FINDING_KEY) rows only found by the new run and those only found by the old
+        run"""
+        old_id, new_id = self.run_id(old_run), self.run_id(new_run)
+        query = self._only_in_query(f"s.scenario, s.app, {', '.join('f.' + column for column in FINDING_KEY)}") + \
+            " ORDER BY 1, 3"
+        added = self.connection.execute(query, (new_id, new_id, old_id)).fetchall()
+        removed = self.connection.execute(query, (old_id, old_id, new_id)).fetchall()
+        return added, removed
+
+    def regressed_apps(self, old_run: str, new_run: str) -> list:
+        """Returns (app, new findings, fixed findings) of every app whose findings changed between the runs, apps
+        with the most new findings first"""
+        old_id, new_id = self.run_id(old_run), self.run_id(new_run)
+        query = self._only_in_query("f.app, f.finding_key")
+        return self.connection.execute(
+            f"WITH added AS ({query}), removed AS ({query}) "
+            f"SELECT app, SUM(is_added), SUM(1 - is_added) FROM "
+            f"(SELECT app, 1 AS is_added FROM added UNION ALL SELECT app, 0 FROM removed) "
+            f"GROUP BY app ORDER BY 2 DESC, app",
+            (new_id, new_id, old_id, old_id, old_id, new_id)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stores localizer results in SQLite and compares runs")
+    parser.add_argument("--db", default=RESULTS_DB, help=f"Database file (default: {RESULTS_DB})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="Store a results file as a run")
+    import_command.add_argument("jsonl", nargs="?", default=RESULTS_JSONL)
+    import_command.add_argument("--name", help="Name of the run (default: the current time)")
+    commands.add_parser("runs", help="List the stored runs")
+    diff_command = commands.add_parser("diff", help="Compare the findings of two runs")
+    diff_command.add_argument("old_run")
+    diff_command.add_argument("new_run")
+    diff_command.add_argument("--apps", action="store_true", help="Only list the apps whose findings changed")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "diff":
+            for run in (args.old_run, args.new_run):
+                try:
+                    store.run_id(run)
+                except KeyError as e:
+                    parser.error(e.args[0])
+        if args.command == "import":
+            print(store.import_results(args.jsonl, args.name))
+        elif args.command == "runs":
+            for name, created_at, scenario_count, finding_count in store.runs():
+                print(f"{name}\t{created_at}\t{scenario_count} tests\t{finding_count} findings")
+        elif args.apps:
+            for app, added_count, removed_count in store.regressed_apps(args.old_run, args.new_run):
+                print(f"{app}\t+{added_count}\t-{removed_count}")
+        else:
+            added, removed = store.diff(args.old_run, args.new_run)
+            for sign, rows in (('+', added), ('-', removed)):
+                for scenario, app, category, resource_id, class_name, text, content_description, bounds in rows:
+                    print(f"{sign} {scenario}\t{category}\t{resource_id}\t{class_name}\t{text!r}\t"
+                          f"{content_description!r}\t{bounds}")
+            print(f"{len(added)} new findings, {len(removed)} fixed findings")
+
+
+if __name__ == "__main__":
+    main()
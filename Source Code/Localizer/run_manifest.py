@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import tempfile
+from scenario_cache import SCENARIO_FILE_PATTERNS, fingerprint_files, scenario_input_files
+
+# Inputs of a scenario's results, including the middle screenshot the overlays are drawn on
+RESULT_FILE_PATTERNS = SCENARIO_FILE_PATTERNS + ('*.action.2.png',)
+MANIFEST_FORMAT_VERSION = 1
+# Modules that parse the scenarios, detect the changes and write the results. Tools such as the benchmark, the
+# service or the watcher are left out, so editing them does not invalidate the stored results
+ANALYSIS_MODULES = ('consts.py', 'detectors.py', 'event_log.py', 'frame_diff.py', 'geometry.py', 'GUI_utils.py',
+                    'image_fingerprint.py', 'localizer.py', 'node.py', 'overlay_renderer.py', 'results_folder.py',
+                    'results_sink.py', 'scenario.py', 'spatial_index.py', 'tree_index.py', 'utils.py')
+
+
+def code_version() -> str:
+    """Returns a hash of the analysis modules, so results are recomputed whenever the analysis code changes"""
+    digest = hashlib.blake2b(digest_size=16)
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in ANALYSIS_MODULES:
+        digest.update(name.encode())
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """Records the input fingerprints and code version each scenario's results were computed with"""
+    def __init__(self, path: str, scenarios: dict = None):
+        self.path = path
+        self.scenarios = scenarios if scenarios is not None else {}
+
+    @classmethod
+    def load(cls, path: str):
+        """Returns the manifest at the given path, or an empty one if it is missing or unreadable"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format_version') == MANIFEST_FORMAT_VERSION:
+                return cls(path, data['scenarios'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls(path)
+
+    def save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'format_version': MANIFEST_FORMAT_VERSION, 'scenarios': self.scenarios}, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def fingerprint(self, base_path: str) -> dict:
+        """Fingerprints the inputs of a scenario, reusing the content hashes of files whose size and mtime are
+        unchanged since the last run"""
+        previous = self.scenarios.get(base_path, {}).get('files')
+        return fingerprint_files(scenario_input_files(base_path, RESULT_FILE_PATTERNS), previous)
+
+    def is_current(self, base_path: str, fingerprints: dict, version: str) -> bool:
+        """Whether the recorded results of a scenario were computed from the same inputs and code"""
+        entry = self.scenarios.get(base_path)
+        if entry is None or entry['version'] != version or entry['files'].keys() != fingerprints.keys():
+            return False
+        return all(entry['files'][path][2] == fingerprint[2] for path, fingerprint in fingerprints.items())
+
+    def update(self, base_path: str, fingerprints: dict, version: str) -> None:
+        self.scenarios[base_path] = {'files': fingerprints, 'version': version}
+
+    def remove(self, base_path: str) -> None:
+        self.scenarios.pop(base_path, None)
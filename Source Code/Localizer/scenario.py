@@ -0,0 +1,74 @@
+from spatial_index import RectIndex
+from utils import frame_hash, import_data
+from instrumentation import span
+
+
+class ScenarioContext:
+    """Per-scenario state shared by the detectors in detectors.py"""
+    def __init__(self, base_path, events, full_events, target_elements_1, target_element_middle, target_elements_2,
+                 wc, af, is_scrolling_new_content, is_click_new_window, last_focused_bounds, last_clicked_bounds,
+                 is_significant_content, is_focus_changed, intermediate_frames=()):
+        self.base_path = base_path
+        self.events = events
+        self.full_events = full_events
+        self.target_elements_1 = target_elements_1
+        self.target_element_middle = target_element_middle
+        self.target_elements_2 = target_elements_2
+        # Frames dumped after the middle frame and before the final frame, in timeline order
+        self.intermediate_frames = list(intermediate_frames)
+        self.wc = wc
+        self.af = af
+        self.is_scrolling_new_content = is_scrolling_new_content
+        self.is_click_new_window = is_click_new_window
+        self.last_focused_bounds = last_focused_bounds
+        self.last_clicked_bounds = last_clicked_bounds
+        self.is_significant_content = is_significant_content
+        self.is_focus_changed = is_focus_changed
+        self.accessibility_focuses = self.find_accessibility_focuses()
+        # Areas refreshed by TYPE_WINDOW_CONTENT_CHANGED events, indexed once for all detectors
+        self.refreshed_areas = RectIndex((e[4][0], e[4][1], e[4][2], e[4][3]) for e in events
+                                         if e[2] == 'TYPE_WINDOW_CONTENT_CHANGED')
+
+    @classmethod
+    def from_base_path(cls, base_path: str, cache=None, hasher=None, prefetched=None):
+        """Loads all data of the scenario at the given base path, through the given ScenarioCache if any. hasher is
+        the image_fingerprint.ImageHasher comparing the screenshots, by default the shared one. prefetched is the
+        scenario_cache.PrefetchedScenario read ahead with the same cache"""
+        with span("load_scenario") as stage:
+            if cache is not None:
+                data = cache.get_or_import(base_path, hasher, prefetched)
+            else:
+                data = import_data(base_path, hasher, prefetched.files if prefetched is not None else None)
+            ctx = cls(base_path, *data)
+            stage.count(events=len(ctx.full_events), nodes=sum(len(frame) for frame in ctx.frames))
+        return ctx
+
+    @property
+    def frames(self) -> list:
+        """All frames of the scenario in timeline order, from the initial to the final frame"""
+        return [self.target_elements_1, self.target_element_middle, *self.intermediate_frames,
+                self.target_elements_2]
+
+    def frames_unchanged(self) -> bool:
+        """Whether all frames of the scenario hold the same nodes, so no content changed. Frames with the same hash
+        are compared node by node, so a hash collision does not drop the scenario"""
+        frames = self.frames
+        if len({frame_hash(frame) for frame in frames}) != 1:
+            return False
+        contents = [node.content for node in frames[0]]
+        return all([node.content for node in frame] == contents for frame in frames[1:])
+
+    def find_accessibility_focuses(self) -> list:
+        accessibility_focuses = [i.bounds for i in self.target_elements_1 if i.a11yFocused == 'true']
+        accessibility_focuses += [i.bounds for i in self.target_elements_2 if i.a11yFocused == 'true']
+        if self.af:
+            ally_focus = [i[4] for i in self.events if i[2] == 'TYPE_VIEW_ACCESSIBILITY_FOCUSED']
+            ally_focus = [((i[0], i[1]), (i[2], i[3])) for i in ally_focus]
+            accessibility_focuses += ally_focus
+        return accessibility_focuses
+
+    def has_enough_data(self) -> bool:
+        """Whether the frames and focuses allow looking for accessibility issues"""
+        return len(self.target_elements_2) != 0 and (
+                len(self.target_elements_1) != 0 or len(self.target_element_middle) != 0) and len(
+            self.accessibility_focuses) != 0
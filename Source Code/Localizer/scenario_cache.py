@@ -0,0 +1,263 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+from collections import OrderedDict
+from typing import NamedTuple
+from utils import import_data, get_scenario_folder, get_timeline_dumps
+
+# Bump when import_data, the loaders or Node change what is stored. Detector and filter changes do not matter,
+# since the cache only holds parsed inputs
+CACHE_FORMAT_VERSION = 6
+CACHE_MAGIC = b'LCZC'
+CACHE_SUFFIX = '.scenario'
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+DEFAULT_MEMORY_CACHE_SIZE = 256 * 1024 * 1024
+# Stores between scans of the cache folder, which pick up the entries other processes sharing the cache wrote
+EVICT_SCAN_INTERVAL = 64
+# Share of max_bytes a cache that grew beyond max_bytes is trimmed to, so a full cache is not scanned on every store
+EVICT_LOW_WATER = 0.9
+SCENARIO_FILE_PATTERNS = ('*-ev.txt', '*.1-a11y.xml', '*.action-a11y.xml', '*.3-a11y.xml', '*.1.png', '*.3.png')
+
+
+def scenario_input_files(base_path: str, patterns=SCENARIO_FILE_PATTERNS) -> list:
+    """Returns the files import_data reads for a scenario, including every dump of its timeline"""
+    folder = get_scenario_folder(base_path)
+    files = []
+    for pattern in patterns:
+        # import_data uses the first match of each pattern
+        files.extend(glob.glob(f"{folder}/{pattern}")[:1])
+    return files + get_timeline_dumps(folder)
+
+
+def file_stat(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def content_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_files(paths: list, previous: dict = None) -> dict:
+    """Returns {path: [size, mtime_ns, content hash]}. Content hashes of files whose size and mtime match the previous
+    fingerprint are reused instead of reading the file again"""
+    previous = previous or {}
+    fingerprints = {}
+    for path in paths:
+        stat = file_stat(path)
+        old = previous.get(path)
+        if old is not None and old[:2] == stat:
+            fingerprints[path] = old
+        else:
+            fingerprints[path] = stat + [content_hash(path)]
+    return fingerprints
+
+
+class PrefetchedScenario(NamedTuple):
+    """Inputs of a scenario read ahead of parsing. data is the cached import_data result, otherwise files holds the
+    content of each input file and fingerprints their fingerprints when they were read"""
+    data: tuple
+    files: dict
+    fingerprints: dict
+
+
+def prefetch_scenario(base_path: str, cache=None) -> PrefetchedScenario:
+    """Reads the cached import_data result of a scenario, or else its input files, so parsing does not wait for I/O"""
+    data = cache.load(base_path) if cache is not None else None
+    if data is not None:
+        return PrefetchedScenario(data, {}, {})
+    files = dict()
+    fingerprints = dict()
+    for path in scenario_input_files(base_path):
+        # Stat before reading, like fingerprint_files, so files changing meanwhile are picked up on the next run
+        stat = file_stat(path)
+        with open(path, 'rb') as f:
+            files[path] = f.read()
+        fingerprints[path] = stat + [hashlib.blake2b(files[path], digest_size=16).hexdigest()]
+    return PrefetchedScenario(None, files, fingerprints)
+
+
+class ScenarioCache:
+    """On-disk cache of import_data results, one compressed file per scenario.
+
+    Each file starts with a magic number, the format version and a JSON header with the fingerprints of the input
+    files. Entries are reused when the sizes and mtimes of the inputs match, or when their content hashes still match
+    after the files were touched. The least recently used files are evicted once the cache grows beyond max_bytes.
+    The size of the cache is tracked in memory between scans of the folder."""
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        # Total size of the entries, known after the first scan
+        self.total_bytes = None
+        self.stores_since_scan = 0
+
+    def _path(self, base_path: str) -> str:
+        name = hashlib.blake2b(os.path.abspath(base_path).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, name + CACHE_SUFFIX)
+
+    def _read_header(self, f):
+        magic, version, header_length = struct.unpack('<4sHI', f.read(10))
+        if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+            return None
+        return json.loads(f.read(header_length))
+
+    def _write(self, path: str, header: dict, payload: bytes) -> int:
+        """Writes an entry and returns its size"""
+        header_bytes = json.dumps(header).encode()
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<4sHI', CACHE_MAGIC, CACHE_FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+        # Replace atomically, since several workers may share the cache
+        os.replace(temp_path, path)
+        return 10 + len(header_bytes) + len(payload)
+
+    def load(self, base_path: str):
+        """Returns the cached import_data result of a scenario, or None if it is missing or outdated"""
+        path = self._path(base_path)
+        try:
+            with open(path, 'rb') as f:
+                header = self._read_header(f)
+                if header is None or header['base_path'] != base_path:
+                    return None
+                files = scenario_input_files(base_path)
+                if sorted(files) != sorted(header['files']):
+                    return None
+                fingerprints = fingerprint_files(files, header['files'])
+                if fingerprints != header['files']:
+                    # Compare the content hashes of files that were touched but may not have changed
+                    if any(fingerprints[file][2] != header['files'][file][2] for file in files):
+                        return None
+                payload = f.read()
+            data = pickle.loads(zlib.decompress(payload))
+        except (OSError, ValueError, KeyError, struct.error, zlib.error, pickle.UnpicklingError, EOFError):
+            return None
+        if fingerprints != header['files']:
+            header['files'] = fingerprints
+            self._write(path, header, payload)
+        else:
+            # Mark as recently used for the LRU eviction
+            os.utime(path)
+        return data
+
+    def store(self, base_path: str, data: tuple, fingerprints: dict = None) -> None:
+        if fingerprints is None:
+            fingerprints = fingerprint_files(scenario_input_files(base_path))
+        header = {'base_path': base_path, 'files': fingerprints}
+        payload = zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        path = self._path(base_path)
+        if self.total_bytes is None or self.stores_since_scan >= EVICT_SCAN_INTERVAL:
+            self.evict()
+        try:
+            replaced_size = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced_size = 0
+        self.total_bytes += self._write(path, header, payload) - replaced_size
+        self.stores_since_scan += 1
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_import(self, base_path: str, hasher=None, prefetched: PrefetchedScenario = None) -> tuple:
+        """Returns import_data(base_path, hasher), from the cache when possible. prefetched is the result of
+        prefetch_scenario with this cache"""
+        if prefetched is not None:
+            data, files, fingerprints = prefetched
+        else:
+            data, files = self.load(base_path), None
+            if data is None:
+                # Fingerprint before parsing, so files changing during the parse are picked up on the next run
+                fingerprints = fingerprint_files(scenario_input_files(base_path))
+        if data is None:
+            data = import_data(base_path, hasher, files)
+            self.store(base_path, data, fingerprints)
+        return data
+
+    def evict(self) -> None:
+        """Scans the cache folder. If the cache grew beyond max_bytes, removes the least recently used entries until
+        it fits into EVICT_LOW_WATER of max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+            total += stat.st_size
+        entries.sort()
+        limit = self.max_bytes * EVICT_LOW_WATER if total > self.max_bytes else self.max_bytes
+        for _, size, name in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
+        self.stores_since_scan = 0
+
+
+class MemoryScenarioCache:
+    """In-memory LRU cache of import_data results, in front of an on-disk ScenarioCache if any.
+
+    Entries are keyed by base path and the sizes and mtimes of the input files, so a scenario is parsed again once
+    its files change. They are kept pickled, since the detectors update the nodes they are given, and each hit
+    returns fresh nodes. The least recently used entries are dropped once the pickles grow beyond max_bytes."""
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_CACHE_SIZE, disk_cache: ScenarioCache = None):
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self.entries = OrderedDict()
+        self.keys = dict()
+        self.total_bytes = 0
+
+    def _key(self, base_path: str) -> tuple:
+        return base_path, tuple((path, *file_stat(path)) for path in scenario_input_files(base_path))
+
+    def _remember(self, key: tuple, data: tuple) -> None:
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        # Forget the entry of the previous version of the files
+        self._forget(self.keys.pop(key[0], None))
+        if len(payload) > self.max_bytes:
+            return
+        self.entries[key] = payload
+        self.keys[key[0]] = key
+        self.total_bytes += len(payload)
+        while self.total_bytes > self.max_bytes:
+            old_key, old_payload = self.entries.popitem(last=False)
+            self.total_bytes -= len(old_payload)
+            del self.keys[old_key[0]]
+
+    def _forget(self, key) -> None:
+        payload = self.entries.pop(key, None)
+        if payload is not None:
+            self.total_bytes -= len(payload)
+
+    def get_or_import(self, base_path: str, hasher=None, prefetched: PrefetchedScenario = None) -> tuple:
+        """Returns import_data(base_path, hasher), from memory when possible, else from the disk cache or by parsing.
+        prefetched is the result of prefetch_scenario with the disk cache"""
+        # Stat before parsing, so files changing during the parse are picked up on the next call
+        key = self._key(base_path)
+        payload = self.entries.get(key)
+        if payload is not None:
+            self.entries.move_to_end(key)
+            return pickle.loads(payload)
+        if self.disk_cache is not None:
+            data = self.disk_cache.get_or_import(base_path, hasher, prefetched)
+        else:
+            data = import_data(base_path, hasher, prefetched.files if prefetched is not None else None)
+        self._remember(key, data)
+        return data
@@ -0,0 +1,272 @@
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from functools import partial
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.utils import secure_filename
+from analysis import Analyzer, scenario_base_path
+from consts import DATASET_FOLDER, TIMELINE_DUMP_PATTERN
+from localizer import init_worker
+from scenario_cache import SCENARIO_FILE_PATTERNS
+from utils import get_base_paths, get_scenario_folder
+
+DEFAULT_URL = "http://127.0.0.1:5000"
+# The analysis reads the event log and the three dumps. Screenshots and the dumps of a timeline are optional
+REQUIRED_FILE_PATTERNS = SCENARIO_FILE_PATTERNS[:4]
+UPLOAD_FILE_PATTERNS = SCENARIO_FILE_PATTERNS + (TIMELINE_DUMP_PATTERN,)
+LATENCY_WINDOW = 1000
+
+# Analyzer of each worker process, kept warm between requests
+_analyzer = None
+
+
+def init_service_worker(cache_dir: str = None) -> None:
+    global _analyzer
+    init_worker(ignore_interrupt=True)
+    # Every upload is stored in a new folder, so parsed scenarios could never be reused. Only the screenshot hashes
+    # are cached, by the content of the screenshots
+    _analyzer = Analyzer(cache_dir, cache_scenarios=False)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def analyze_upload(base_path: str) -> tuple:
+    """Analyzes an uploaded scenario in a worker and returns its record and the analysis time in seconds"""
+    start = time.perf_counter()
+    record = _analyzer.analyze(base_path).to_record(base_path)
+    return record, time.perf_counter() - start
+
+
+def percentiles(values, points=(50, 90, 99)) -> dict:
+    """Returns the nearest-rank percentiles of values, e.g. {'p50': ...}, or None for each when there are none"""
+    values = sorted(values)
+    result = dict()
+    for point in points:
+        result[f"p{point}"] = values[max(0, -(-len(values) * point // 100) - 1)] if values else None
+    return result
+
+
+def _stop_serving(signum, frame):
+    raise KeyboardInterrupt
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AnalysisService:
+    """Analyzes uploaded scenarios on a pool of worker processes that are started up front and stay warm.
+
+    At most workers + queue_size scenarios are accepted at a time, further uploads are refused with QueueFull so
+    clients back off instead of piling up requests. Latencies of the last LATENCY_WINDOW scenarios are kept for
+    stats()."""
+    def __init__(self, workers: int = None, queue_size: int = 16, upload_dir: str = None, cache_dir: str = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue_size
+        self.upload_dir = upload_dir
+        if upload_dir is not None:
+            os.makedirs(upload_dir, exist_ok=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            initializer=partial(init_service_worker, cache_dir))
+        # Start every worker now, rather than forking them from the request threads of the server
+        wait([self.executor.submit(_worker_ready) for _ in range(self.workers)])
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.analysis_times = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, files, app: str = None, scenario: str = None):
+        """Stores the uploaded files of a scenario, given as (filename, file object) pairs, and queues its analysis.
+        Returns a future of analyze_upload. Raises ValueError when a required file is missing and QueueFull when
+        the queue is full"""
+        app = secure_filename(app or "") or "upload"
+        scenario = secure_filename(scenario or "") or "scenario"
+        files = [(secure_filename(filename), file) for filename, file in files]
+        files = [(filename, file) for filename, file in files
+                 if any(fnmatch.fnmatch(filename, pattern) for pattern in UPLOAD_FILE_PATTERNS)]
+        missing = [pattern for pattern in REQUIRED_FILE_PATTERNS
+                   if not any(fnmatch.fnmatch(filename, pattern) for filename, _ in files)]
+        if missing:
+            raise ValueError(f"Missing files matching {', '.join(missing)}")
+        with self.lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise QueueFull(f"{self.in_flight} tests are already queued or running")
+            self.in_flight += 1
+        start = time.perf_counter()
+        upload = tempfile.mkdtemp(prefix="localizer_upload_", dir=self.upload_dir)
+        try:
+            # Laid out like the dataset, so the record names the app
+            base_path = f"{upload}/{app}/{scenario}/{scenario}"
+            os.makedirs(get_scenario_folder(base_path))
+            for filename, file in files:
+                file.save(os.path.join(get_scenario_folder(base_path), filename))
+            future = self.executor.submit(analyze_upload, base_path)
+        except BaseException:
+            shutil.rmtree(upload, ignore_errors=True)
+            with self.lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(partial(self._finished, upload, start))
+        return future
+
+    def _finished(self, upload: str, start: float, future) -> None:
+        shutil.rmtree(upload, ignore_errors=True)
+        with self.lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            self.completed += 1
+            self.latencies.append(time.perf_counter() - start)
+            self.analysis_times.append(future.result()[1])
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "latency": percentiles(self.latencies),
+                "analysis_time": percentiles(self.analysis_times),
+            }
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+def create_app(service: AnalysisService, timeout: float = 300.0) -> Flask:
+    """Creates the web app of a service. POST /analyze takes the files of a scenario as a multipart upload, with
+    optional app and scenario form fields naming it, and returns its findings. GET /stats returns the queue depth
+    and latency percentiles in seconds"""
+    app = Flask(__name__)
+
+    @app.post("/analyze")
+    def analyze():
+        files = [(file.filename, file) for _, file in request.files.items(multi=True)]
+        try:
+            future = service.submit(files, request.form.get("app"), request.form.get("scenario"))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        except QueueFull as e:
+            return jsonify(error=str(e)), 503, {"Retry-After": "1"}
+        try:
+            record, analysis_time = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return jsonify(error=f"The analysis took longer than {timeout} s"), 504
+        except Exception as e:
+            logging.exception("Could not analyze an uploaded test")
+            return jsonify(error=f"Could not analyze the test: {e!r}"), 500
+        # Name the test as uploaded rather than by its temporary folder
+        record["scenario"] = "/".join(record["scenario"].split("/")[-3:-1])
+        return jsonify(findings=record, analysis_time=analysis_time)
+
+    @app.get("/stats")
+    def stats():
+        return jsonify(service.stats())
+
+    return app
+
+
+def upload_scenario(scenario: str, url: str = DEFAULT_URL, timeout: float = 300.0) -> dict:
+    """Uploads a scenario folder or base path to a running service and returns its response. Retries while the
+    queue of the service is full"""
+    base_path = scenario_base_path(scenario)
+    folder = get_scenario_folder(base_path)
+    paths = [path for path in sorted(os.listdir(folder))
+             if any(fnmatch.fnmatch(path, pattern) for pattern in UPLOAD_FILE_PATTERNS)]
+    data = {"app": base_path.split('/')[-3], "scenario": base_path.split('/')[-2]}
+    while True:
+        handles = [open(os.path.join(folder, path), 'rb') for path in paths]
+        try:
+            response = requests.post(f"{url}/analyze", data=data, timeout=timeout,
+                                    files=[(str(index), (path, handle)) for index, (path, handle)
+                                           in enumerate(zip(paths, handles))])
+        finally:
+            for handle in handles:
+                handle.close()
+        if response.status_code != 503:
+            break
+        time.sleep(float(response.headers.get("Retry-After", 1)))
+    if not response.ok:
+        raise RuntimeError(f"{scenario}: {response.status_code} {response.json().get('error')}")
+    return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the localizer analysis over HTTP, or uploads tests to it")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_command = commands.add_parser("serve", help="Start the analysis service")
+    serve_command.add_argument("--host", default="127.0.0.1")
+    serve_command.add_argument("--port", type=int, default=5000)
+    serve_command.add_argument("--workers", type=int, default=None,
+                               help="Worker processes (default: the number of CPUs)")
+    serve_command.add_argument("--queue-size", type=int, default=16,
+                               help="Tests waiting for a worker before uploads are refused (default: 16)")
+    serve_command.add_argument("--timeout", type=float, default=300.0,
+                               help="Seconds a request waits for its analysis (default: 300)")
+    serve_command.add_argument("--upload-dir", default=None, help="Folder the uploads are stored in while analyzed")
+    serve_command.add_argument("--cache-dir", default=None,
+                               help="Folder the workers keep screenshot hashes in between restarts")
+    serve_command.add_argument("--max-upload-mb", type=int, default=256)
+    analyze_command = commands.add_parser("analyze", help="Upload tests to a running service and print the findings")
+    analyze_command.add_argument("scenarios", nargs="*",
+                                 help=f"Scenario folders (default: every test in {DATASET_FOLDER})")
+    analyze_command.add_argument("--url", default=DEFAULT_URL)
+    analyze_command.add_argument("--concurrency", type=int, default=4, help="Uploads at a time (default: 4)")
+    analyze_command.add_argument("--output", help="JSON lines file the findings of every test are written to")
+    stats_command = commands.add_parser("stats", help="Print the queue depth and latencies of a running service")
+    stats_command.add_argument("--url", default=DEFAULT_URL)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO)
+        service = AnalysisService(args.workers, args.queue_size, args.upload_dir, args.cache_dir)
+        logging.info(f"Started {service.workers} workers")
+        app = create_app(service, args.timeout)
+        app.config["MAX_CONTENT_LENGTH"] = args.max_upload_mb * 1024 * 1024
+        # Stopping the service with SIGTERM also stops the workers
+        signal.signal(signal.SIGTERM, _stop_serving)
+        try:
+            app.run(args.host, args.port, threaded=True)
+        finally:
+            service.close()
+    elif args.command == "stats":
+        print(json.dumps(requests.get(f"{args.url}/stats", timeout=10).json(), indent=2))
+    else:
+        scenarios = args.scenarios or get_base_paths(DATASET_FOLDER)
+        output = open(args.output, 'w', encoding='utf-8') if args.output else None
+        try:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as uploads:
+                for response in uploads.map(partial(upload_scenario, url=args.url), scenarios):
+                    record = response["findings"]
+                    count = sum(len(nodes) for nodes in record["findings"].values())
+                    print(f"{record['scenario']}: {count} findings ({response['analysis_time'] * 1000:.1f} ms)")
+                    if output is not None:
+                        output.write(json.dumps(record) + "\n")
+        finally:
+            if output is not None:
+                output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from consts import SCREEN_BOUNDS
+
+
+class RectIndex:
+    """Uniform grid over screen coordinates for overlap, point and containment queries on many rectangles.
+
+    Rectangles are (x1, y1, x2, y2) tuples. Each one is registered in every cell its bounding box touches and
+    coordinates outside the screen are clamped to the border cells, so queries only look at rectangles that share a
+    cell with the query and then apply the exact same comparisons as the linear helpers in utils.py."""
+    def __init__(self, rects=(), columns=16, rows=32, extent=SCREEN_BOUNDS):
+        self.columns = columns
+        self.rows = rows
+        self.min_x, self.min_y, max_x, max_y = extent
+        self.cell_width = max(1, -(-(max_x - self.min_x) // columns))
+        self.cell_height = max(1, -(-(max_y - self.min_y) // rows))
+        self.rects = []
+        self.cells = [[] for _ in range(columns * rows)]
+        for rect in dict.fromkeys(rects):
+            self.add(rect)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __iter__(self):
+        return iter(self.rects)
+
+    def _column(self, x):
+        return min(self.columns - 1, max(0, (x - self.min_x) // self.cell_width))
+
+    def _row(self, y):
+        return min(self.rows - 1, max(0, (y - self.min_y) // self.cell_height))
+
+    def _cell_range(self, x1, y1, x2, y2):
+        return (self._column(min(x1, x2)), self._row(min(y1, y2)),
+                self._column(max(x1, x2)), self._row(max(y1, y2)))
+
+    def add(self, rect) -> None:
+        rect = tuple(rect)
+        self.rects.append(rect)
+        c1, r1, c2, r2 = self._cell_range(*rect)
+        for row in range(r1, r2 + 1):
+            offset = row * self.columns
+            for column in range(c1, c2 + 1):
+                self.cells[offset + column].append(rect)
+
+    def candidates(self, x1, y1, x2, y2):
+        """Yields the rectangles sharing a cell with the given area, possibly more than once"""
+        c1, r1, c2, r2 = self._cell_range(x1, y1, x2, y2)
+        # Scanning the list is cheaper than the grid when the area covers more cells than there are rectangles
+        if (c2 - c1 + 1) * (r2 - r1 + 1) > len(self.rects):
+            yield from self.rects
+            return
+        for row in range(r1, r2 + 1):
+            offset = row * self.columns
+            for column in range(c1, c2 + 1):
+                yield from self.cells[offset + column]
+
+    def overlaps(self, x1, y1, x2, y2) -> bool:
+        """Whether any rectangle overlaps or touches the given one"""
+        for rx1, ry1, rx2, ry2 in self.candidates(x1, y1, x2, y2):
+            if not (x2 < rx1 or x1 > rx2 or y2 < ry1 or y1 > ry2):
+                return True
+        return False
+
+    def overlapping(self, x1, y1, x2, y2) -> list:
+        """Returns the rectangles that overlap or touch the given one"""
+        return [rect for rect in dict.fromkeys(self.candidates(x1, y1, x2, y2))
+                if not (x2 < rect[0] or x1 > rect[2] or y2 < rect[1] or y1 > rect[3])]
+
+    def contains_point(self, x, y, strict=False) -> bool:
+        """Whether any rectangle contains the point, on its edges too unless strict"""
+        if strict:
+            for rx1, ry1, rx2, ry2 in self.candidates(x, y, x, y):
+                if rx1 < x < rx2 and ry1 < y < ry2:
+                    return True
+        else:
+            for rx1, ry1, rx2, ry2 in self.candidates(x, y, x, y):
+                if rx1 <= x <= rx2 and ry1 <= y <= ry2:
+                    return True
+        return False
+
+    def contains(self, x1, y1, x2, y2) -> bool:
+        """Whether any rectangle fully contains the given one"""
+        # A rectangle containing the given one covers its top left corner, unless the corners of the given one are
+        # flipped. It then still shares a cell with the given area
+        if x1 <= x2 and y1 <= y2:
+            candidates = self.candidates(x1, y1, x1, y1)
+        else:
+            candidates = self.candidates(x1, y1, x2, y2)
+        for rx1, ry1, rx2, ry2 in candidates:
+            if rx1 <= x1 and ry1 <= y1 and x2 <= rx2 and y2 <= ry2:
+                return True
+        return False
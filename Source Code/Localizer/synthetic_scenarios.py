@@ -0,0 +1,298 @@
+import argparse
+import os
+import random
+import xml.etree.ElementTree as ET
+from PIL import Image, ImageDraw
+from consts import DATASET_FOLDER, SCREEN_BOUNDS
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 1080, SCREEN_BOUNDS[3]
+PACKAGE = "com.example.synthetic"
+LEAF_CLASSES = ("android.widget.TextView", "android.widget.ImageView", "android.widget.Button",
+                "android.widget.CheckBox")
+LAYOUT_CLASSES = ("android.widget.FrameLayout", "android.widget.LinearLayout", "android.view.ViewGroup",
+                  "androidx.recyclerview.widget.RecyclerView")
+# Clicks are left out, a click followed by a focus change makes the localizer skip appearing and disappearing elements
+EVENT_TYPES = ("TYPE_VIEW_ACCESSIBILITY_FOCUSED", "TYPE_WINDOW_CONTENT_CHANGED", "TYPE_VIEW_SCROLLED",
+               "TYPE_VIEW_FOCUSED", "TYPE_VIEW_TEXT_CHANGED")
+# The localizer only reports elements as moving when they moved by more than this
+MOVE_DISTANCE = 2000
+
+
+class SyntheticNode:
+    """A node of a generated frame, written as a <node> element of an accessibility dump"""
+    def __init__(self, key: int, class_name: str, bounds: tuple, text: str = "", depth: int = 0):
+        self.key = key
+        self.class_name = class_name
+        self.bounds = bounds
+        self.text = text
+        self.depth = depth
+        self.live_region = "0"
+        self.a11y_focused = False
+        self.children = []
+
+    def copy(self):
+        node = SyntheticNode(self.key, self.class_name, self.bounds, self.text, self.depth)
+        node.live_region = self.live_region
+        node.children = [child.copy() for child in self.children]
+        return node
+
+    def walk(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def shift(self, dy: int) -> None:
+        for node in self.walk():
+            x1, y1, x2, y2 = node.bounds
+            node.bounds = (x1, y1 + dy, x2, y2 + dy)
+
+
+def generate_tree(rng: random.Random, node_count: int, max_depth: int) -> SyntheticNode:
+    """Generates a tree of node_count nodes at most max_depth levels deep. Children split the height of their
+    parent, like nested vertical and horizontal layouts"""
+    root = SyntheticNode(0, LAYOUT_CLASSES[0], (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+    parents = [root]
+    nodes = [root]
+    for key in range(1, node_count):
+        # Prefer recent parents, which gives lists of siblings instead of a single long chain
+        parent = parents[max(0, len(parents) - 1 - int(rng.expovariate(0.3)))]
+        node = SyntheticNode(key, "", (0, 0, 0, 0), depth=parent.depth + 1)
+        parent.children.append(node)
+        nodes.append(node)
+        if node.depth < max_depth:
+            parents.append(node)
+    for node in nodes:
+        node.class_name = rng.choice(LAYOUT_CLASSES if node.children else LEAF_CLASSES)
+        if not node.children:
+            node.text = f"Item {node.key}" if rng.random() < 0.6 else ""
+        if rng.random() < 0.02:
+            node.live_region = "1"
+    _layout(root)
+    return root
+
+
+def _layout(node: SyntheticNode) -> None:
+    """Splits the bounds of a node between its children, in rows at even depths and in columns at odd depths"""
+    x1, y1, x2, y2 = node.bounds
+    count = len(node.children)
+    for position, child in enumerate(node.children):
+        if node.depth % 2 == 0:
+            child.bounds = (x1, y1 + (y2 - y1) * position // count, x2, y1 + (y2 - y1) * (position + 1) // count)
+        else:
+            child.bounds = (x1 + (x2 - x1) * position // count, y1, x1 + (x2 - x1) * (position + 1) // count, y2)
+        _layout(child)
+
+
+def _leaves(root: SyntheticNode) -> list:
+    return [node for node in root.walk() if not node.children]
+
+
+def _remove(root: SyntheticNode, removed: set) -> None:
+    for node in root.walk():
+        node.children = [child for child in node.children if child.key not in removed]
+
+
+def _add_leaves(rng: random.Random, root: SyntheticNode, count: int, next_key: int) -> list:
+    """Adds new leaves over the bounds of existing ones and returns their bounds"""
+    hosts = [node for node in root.walk() if node.children]
+    added = []
+    for key in range(next_key, next_key + count):
+        host = rng.choice(hosts)
+        x1, y1, x2, y2 = host.bounds
+        node = SyntheticNode(key, rng.choice(LEAF_CLASSES), (x1, y1, x2, y1 + max(0, (y2 - y1) // 4)),
+                             f"New item {key}", host.depth + 1)
+        host.children.append(node)
+        added.append(node.bounds)
+    return added
+
+
+def generate_frames(rng: random.Random, node_count: int, max_depth: int, change_rate: float) -> tuple:
+    """Returns the initial, middle and final frames of a scenario, and the areas that changed between them.
+
+    The middle frame has changed texts and short-lived leaves. The final frame has removed, added and moved leaves
+    and changed texts."""
+    initial = generate_tree(rng, node_count, max_depth)
+    leaves = _leaves(initial)
+    changes = max(1, int(len(leaves) * change_rate))
+    focused = rng.choice(leaves)
+    focused.a11y_focused = True
+    changed_areas = []
+
+    middle = initial.copy()
+    for node in rng.sample(_leaves(middle), min(changes, len(leaves))):
+        node.text = f"Updated {node.key}"
+        changed_areas.append(node.bounds)
+    changed_areas += _add_leaves(rng, middle, changes, node_count)
+
+    final = initial.copy()
+    final_leaves = [node for node in _leaves(final) if node.key != focused.key]
+    rng.shuffle(final_leaves)
+    removed = final_leaves[:changes]
+    moved = final_leaves[changes:2 * changes]
+    updated = final_leaves[2 * changes:3 * changes]
+    _remove(final, {node.key for node in removed})
+    changed_areas += [node.bounds for node in removed]
+    for node in moved:
+        # Leaves far enough from the other edge jump across the screen, the others move a little
+        if node.bounds[3] + MOVE_DISTANCE < SCREEN_HEIGHT:
+            dy = rng.randint(MOVE_DISTANCE + 1, SCREEN_HEIGHT - node.bounds[3])
+        elif node.bounds[1] > MOVE_DISTANCE:
+            dy = -rng.randint(MOVE_DISTANCE + 1, node.bounds[1])
+        else:
+            dy = rng.choice((-1, 1)) * rng.randint(20, 200)
+        if 0 <= node.bounds[1] + dy and node.bounds[3] + dy <= SCREEN_HEIGHT:
+            node.shift(dy)
+            changed_areas.append(node.bounds)
+    for node in updated:
+        node.text = f"Updated {node.key}"
+        changed_areas.append(node.bounds)
+    changed_areas += _add_leaves(rng, final, changes, node_count + changes)
+    return initial, middle, final, changed_areas
+
+
+def generate_timeline(rng: random.Random, initial: SyntheticNode, frame_count: int, change_rate: float,
+                      next_key: int) -> tuple:
+    """Returns frame_count frames to dump between the middle and the final frame, each with short-lived leaves of its
+    own, and the areas that changed in them"""
+    changes = max(1, int(len(_leaves(initial)) * change_rate))
+    frames = []
+    changed_areas = []
+    for position in range(frame_count):
+        frame = initial.copy()
+        changed_areas += _add_leaves(rng, frame, changes, next_key + position * changes)
+        frames.append(frame)
+    return frames, changed_areas
+
+
+def write_dump(root: SyntheticNode, path: str) -> None:
+    """Writes a frame in the format of the accessibility service's XML dumps"""
+    hierarchy = ET.Element("hierarchy", rotation="0")
+
+    def add(parent_element, node, index):
+        x1, y1, x2, y2 = node.bounds
+        element = ET.SubElement(parent_element, "node", {
+            "index": str(index), "resource-id": f"{PACKAGE}:id/view_{node.key}", "text": node.text,
+            "class": node.class_name, "package": PACKAGE, "content-desc": "", "checkable": "false",
+            "checked": "false", "clickable": "true" if not node.children else "false", "enabled": "true",
+            "focusable": "true" if not node.children else "false", "importantForAccessibility": "true",
+            "focused": "false", "a11yFocused": "true" if node.a11y_focused else "false", "scrollable": "false",
+            "long-clickable": "false", "password": "false", "selected": "false", "visible": "true",
+            "invalid": "false", "liveRegion": node.live_region, "drawingOrder": str(index + 1),
+            "actionList": "4-8-64" if not node.children else "4-64",
+            "bounds": f"[{x1},{y1}][{x2},{y2}]"})
+        for child_index, child in enumerate(node.children):
+            add(element, child, child_index)
+
+    add(hierarchy, root, 0)
+    ET.ElementTree(hierarchy).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def event_line(rng: random.Random, position: int, event_type: str, bounds: tuple, scroll_delta: int = 0) -> str:
+    """Returns one event in the logcat format of the accessibility service"""
+    x1, y1, x2, y2 = bounds
+    seconds = position // 10
+    return (f"01-15 10:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{position % 10 * 100:03d}  4242  4242 I "
+            f"A11yEvent: EventType: {event_type}; EventTime: {1000000 + position * 100}; PackageName: {PACKAGE}; "
+            f"MovementGranularity: 0; Action: 0; ContentChangeTypes: []; WindowChangeTypes: []; "
+            f"ClassName: {rng.choice(LEAF_CLASSES)}; Text: []; ContentDescription: null; ItemCount: -1; "
+            f"CurrentItemIndex: -1; Enabled: true; ScrollDeltaX: 0; ScrollDeltaY: {scroll_delta}; "
+            f"boundsInScreen: Rect({x1}, {y1} - {x2}, {y2}); recordCount: 0\n")
+
+
+def write_event_log(rng: random.Random, path: str, event_count: int, focused_bounds: tuple,
+                    changed_areas: list, scrolling: bool = False) -> None:
+    """Writes event_count events. They start with the accessibility focus, and content changes report the changed
+    areas. Scroll events only move the content when scrolling is set, which makes the localizer skip the appearing
+    and disappearing elements"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(event_line(rng, 0, "TYPE_VIEW_ACCESSIBILITY_FOCUSED", focused_bounds))
+        for position in range(1, event_count):
+            event_type = rng.choice(EVENT_TYPES)
+            if event_type == "TYPE_WINDOW_CONTENT_CHANGED" and changed_areas:
+                bounds = rng.choice(changed_areas)
+            else:
+                x1, y1 = rng.randrange(SCREEN_WIDTH - 100), rng.randrange(SCREEN_HEIGHT - 100)
+                bounds = (x1, y1, x1 + rng.randint(20, 100), y1 + rng.randint(20, 100))
+            scroll_delta = rng.randint(-300, 300) if scrolling and event_type == "TYPE_VIEW_SCROLLED" else 0
+            f.write(event_line(rng, position, event_type, bounds, scroll_delta))
+
+
+def write_screenshot(root: SyntheticNode, path: str, scale: float = 1.0) -> None:
+    """Draws the leaves of a frame as boxes, scaled down by scale to write smaller files"""
+    width, height = max(1, int(SCREEN_WIDTH * scale)), max(1, int(SCREEN_HEIGHT * scale))
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for node in root.walk():
+        if node.children:
+            continue
+        x1, y1, x2, y2 = (int(value * scale) for value in node.bounds)
+        shade = 40 + node.key * 37 % 180
+        draw.rectangle([x1, y1, max(x1, x2 - 1), max(y1, y2 - 1)], fill=(shade, 255 - shade, 128),
+                       outline="black")
+    image.save(path)
+
+
+def generate_scenario(folder: str, node_count: int = 500, max_depth: int = 8, event_count: int = 200,
+                      change_rate: float = 0.05, scrolling: bool = False, screenshot_scale: float = 1.0,
+                      timeline_frames: int = 0, seed: int = 0) -> str:
+    """Writes a scenario folder in the layout import_data expects and returns its base path. timeline_frames adds
+    that many dumps between the middle and the final dump"""
+    rng = random.Random(seed)
+    name = os.path.basename(os.path.normpath(folder))
+    os.makedirs(folder, exist_ok=True)
+    initial, middle, final, changed_areas = generate_frames(rng, node_count, max_depth, change_rate)
+    prefix = os.path.join(folder, name)
+    if timeline_frames:
+        # Keys after the leaves added to the middle and final frames
+        next_key = max(node.key for frame in (middle, final) for node in frame.walk()) + 1
+        frames, timeline_areas = generate_timeline(rng, initial, timeline_frames, change_rate, next_key)
+        changed_areas += timeline_areas
+        for position, frame in enumerate(frames):
+            write_dump(frame, f"{prefix}.action-{position + 2}-a11y.xml")
+    for root, dump, screenshot in ((initial, ".1-a11y.xml", ".1.png"), (middle, ".action-a11y.xml", ".action.2.png"),
+                                   (final, ".3-a11y.xml", ".3.png")):
+        write_dump(root, prefix + dump)
+        write_screenshot(root, prefix + screenshot, screenshot_scale)
+    focused = next(node for node in initial.walk() if node.a11y_focused)
+    write_event_log(rng, prefix + "-ev.txt", event_count, focused.bounds, changed_areas, scrolling)
+    return f"{folder}/{name}".replace(os.sep, '/')
+
+
+def generate_dataset(dataset_dir: str = DATASET_FOLDER, apps: int = 1, scenarios: int = 1, seed: int = 0,
+                     **sizes) -> list:
+    """Writes apps x scenarios synthetic scenarios and returns their base paths"""
+    base_paths = []
+    for app in range(apps):
+        for scenario in range(scenarios):
+            folder = f"{dataset_dir}/synthetic_app_{app}/scenario_{scenario}"
+            base_paths.append(generate_scenario(folder, seed=seed + app * scenarios + scenario, **sizes))
+    return base_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes synthetic scenarios for benchmarks and tests")
+    parser.add_argument("--dataset", default=DATASET_FOLDER, help=f"Dataset folder (default: {DATASET_FOLDER})")
+    parser.add_argument("--apps", type=int, default=1, help="Number of apps (default: 1)")
+    parser.add_argument("--scenarios", type=int, default=1, help="Number of scenarios per app (default: 1)")
+    parser.add_argument("--nodes", type=int, default=500, help="Nodes per frame (default: 500)")
+    parser.add_argument("--depth", type=int, default=8, help="Maximum depth of the frames (default: 8)")
+    parser.add_argument("--events", type=int, default=200, help="Events per scenario (default: 200)")
+    parser.add_argument("--change-rate", type=float, default=0.05,
+                        help="Fraction of the leaves changed between frames (default: 0.05)")
+    parser.add_argument("--scrolling", action="store_true", help="Generate scroll events that show new content")
+    parser.add_argument("--screenshot-scale", type=float, default=1.0,
+                        help="Scale of the screenshots, smaller ones are faster to write (default: 1.0)")
+    parser.add_argument("--timeline-frames", type=int, default=0,
+                        help="Dumps to add between the middle and the final dump (default: 0)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    base_paths = generate_dataset(args.dataset, args.apps, args.scenarios, args.seed, node_count=args.nodes,
+                                  max_depth=args.depth, event_count=args.events, change_rate=args.change_rate, scrolling=args.scrolling,
+                                  screenshot_scale=args.screenshot_scale, timeline_frames=args.timeline_frames)
+    print(f"Wrote {len(base_paths)} scenarios to {args.dataset}")
+
+
+if __name__ == "__main__":
+    main()
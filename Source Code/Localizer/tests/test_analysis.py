@@ -0,0 +1,41 @@
+import glob
+import os
+from analysis import Analyzer
+from synthetic_scenarios import generate_scenario
+
+
+def test_analyzer_reuses_parsed_scenarios_until_their_files_change(tmp_path):
+    folder = str(tmp_path / "app" / "scenario_0")
+    generate_scenario(folder, node_count=300, seed=1)
+    with Analyzer() as analyzer:
+        first = analyzer.analyze(folder)
+        assert first.count() > 0
+        assert len(analyzer.cache.entries) == 1
+
+        # Cached scenarios are unpickled again, so the findings do not depend on an earlier analysis
+        assert analyzer.analyze(folder).to_record(folder) == first.to_record(folder)
+        assert len(analyzer.cache.entries) == 1
+
+        key = next(iter(analyzer.cache.entries))
+        dump = glob.glob(f"{folder}/*.3-a11y.xml")[0]
+        stat = os.stat(dump)
+        os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert analyzer.analyze(folder).to_record(folder) == first.to_record(folder)
+        assert len(analyzer.cache.entries) == 1 and key not in analyzer.cache.entries
+
+
+def test_analyzer_drops_the_least_recently_used_scenarios(tmp_path):
+    folders = [str(tmp_path / "app" / f"scenario_{i}") for i in range(3)]
+    for seed, folder in enumerate(folders):
+        generate_scenario(folder, node_count=200, seed=seed)
+    with Analyzer() as analyzer:
+        sizes = []
+        for folder in folders:
+            analyzer.analyze(folder)
+            sizes.append(len(next(reversed(analyzer.cache.entries.values()))))
+    with Analyzer(memory_cache_size=sizes[1] + sizes[2]) as analyzer:
+        for folder in folders:
+            analyzer.analyze(folder)
+        assert analyzer.cache.total_bytes == sizes[1] + sizes[2]
+        assert [key[0] for key in analyzer.cache.entries] == [f"{folder}/{os.path.basename(folder)}"
+                                                              for folder in folders[1:]]
@@ -0,0 +1,299 @@
+import random
+import re
+import chardet
+import pytest
+from event_log import convert_to_tuple, parse_event_log
+from synthetic_scenarios import EVENT_TYPES, event_line
+
+
+# The functions import_data used before parse_event_log, each reading the whole log
+
+
+def load_event_log(path: str):
+    line_regex = r'(\d{2}-\d{2}) (\d{2}:\d{2}:\d{2}.\d{3}).*EventType: (\S*);.*EventTime: (\d*);.*boundsInScreen: ([^;]*);'
+    rect_regex = r'Rect\((\d+), (\d+) - (\d+). (\d+)\)'
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    events = []
+    for line in lines:
+        # If the line matches the regex, add all captured groups to the event list as a tuple
+        match = re.match(line_regex, line)
+        if match:
+            elems = list(match.groups())
+            rect = elems[-1]
+            match_rect = re.match(rect_regex, rect)
+            if match_rect:
+                elems[-1] = tuple([int(i) for i in match_rect.groups()])
+                events.append(elems + [line])
+    return events
+
+
+def load_all_events(path: str):
+    ev_regex = r'EventType: (\S*);'
+    rect_regex = r'Rect\((\d+), (\d+) - (\d+). (\d+)\)'
+
+    with open(path, 'rb') as file:
+        raw_data = file.read()
+
+    # Detect the encoding
+    detected = chardet.detect(raw_data)
+    encoding = detected['encoding']
+
+    try:
+        with open(path, 'r', encoding = encoding) as f:
+            lines = f.readlines()
+    except UnicodeDecodeError:
+        print(f"Error: Failed to decode the file {path} with encoding {encoding}.")
+
+    events = []
+    for line in lines:
+        match = re.search(ev_regex, line)
+        if match != None:
+            ev_type = match.groups(1)[0]
+            if ev_type == 'TYPE_WINDOW_CONTENT_CHANGED':
+                match_rect = re.search(rect_regex, line)
+                if match_rect:
+                    coords = tuple([int(i) for i in match_rect.groups()])
+                    events.append((ev_type, coords))
+                else:
+                    events.append((ev_type, None))
+            else:
+                events.append((ev_type, None))
+
+    return events  # List of event types
+
+
+def analyze_events_scroll_click(file_path: str) -> bool:
+    # Define possible immediate follow-ups for each event of interest
+    # (i.e., events that might occur immediately after the event of interest)
+    follow_up_events_scroll = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOW_CONTENT_CHANGED"}
+    follow_up_events_click = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOWS_CHANGED"}
+
+    # Initialize booleans for scrolling and clicking
+    is_scrolling_new_content = False
+    is_click_new_window = False
+
+    # Helper function to parse scroll details from a line
+    def parse_scroll_details(line):
+        details = {}
+        parts = line.split(";")
+        for part in parts:
+            if ":" in part:
+                key_value = part.split(":", 1)  # Split on first colon only
+                if len(key_value) == 2:
+                    key, value = key_value
+                    key = key.strip()
+                    value = value.strip()
+                    # Try converting numeric values
+                    if key in ['ScrollDeltaX', 'ScrollDeltaY', 'FromIndex', 'ToIndex']:
+                        try:
+                            details[key] = int(value.split(" ")[0])  # Assuming value might end with units or additional info
+                        except ValueError:
+                            pass
+        return details
+
+    # Helper function to check if a real scroll occurred
+    def did_scroll_occur(scroll_details):
+        scroll_delta_x = scroll_details.get('ScrollDeltaX', 0)
+        scroll_delta_y = scroll_details.get('ScrollDeltaY', 0)
+        from_index = scroll_details.get('FromIndex', -1)
+        to_index = scroll_details.get('ToIndex', -1)
+
+        return scroll_delta_x != 0 or scroll_delta_y != 0
+
+    last_event_type = None
+    last_scroll_details = {}
+
+    try:
+        with open(file_path, 'r') as file:
+            for line in file:
+                if "EventType: TYPE_VIEW_SCROLLED" in line:
+                    last_event_type = "TYPE_VIEW_SCROLLED"
+                    last_scroll_details = parse_scroll_details(line)
+                elif "EventType: TYPE_VIEW_CLICKED" in line:
+                    last_event_type = "TYPE_VIEW_CLICKED"
+                elif "EventType:" in line:
+                    current_event_type = line.split("EventType:")[1].split(";")[0].strip()
+                    if last_event_type == "TYPE_VIEW_SCROLLED" and current_event_type in follow_up_events_scroll:
+                        if did_scroll_occur(last_scroll_details):
+                            is_scrolling_new_content = True
+                    elif last_event_type == "TYPE_VIEW_CLICKED" and (current_event_type in follow_up_events_click):
+                        is_click_new_window = True
+                    # Update last_event_type if it's not a follow-up event we are interested in
+                    if "TYPE_VIEW_" not in current_event_type and last_event_type != "TYPE_VIEW_CLICKED":
+                        last_event_type = None
+    except Exception as e:
+        print(f"Error: Failed to read the file {file_path}.")
+        print(e)
+
+    # If no matching pattern is found in the file, return False
+    return is_scrolling_new_content, is_click_new_window
+
+
+def check_event(path: str, events: list) -> bool:
+    try:
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        for line in lines:
+            for ev in events:
+                if ev in line:
+                    return True
+    except Exception as e:
+        print(f"Error: Failed to read the file {path}.")
+        print(e)
+        return False
+    return False
+
+
+def extract_bounds_of_last_focused_element(file_path):
+    last_focused_element_bounds = None
+    last_focused_element_info = None
+    last_clicked_element_info = None
+    last_clicked_element_bounds = None
+    try:
+        with open(file_path, 'r') as file:
+            for line in file:
+                if 'EventType: TYPE_VIEW_ACCESSIBILITY_FOCUSED' in line:
+                    # Capture the line for further processing
+                    last_focused_element_info = line
+                if 'EventType: TYPE_VIEW_CLICKED' in line:
+                    # Capture the line for further processing
+                    last_clicked_element_info = line
+    except Exception as e:
+        print(f"Error: Failed to read the file {file_path}.")
+        print(e)
+
+    # Now, extract the bounds from the last focused element info
+    if last_focused_element_info:
+        # Find the part of the line that contains "boundsInScreen"
+        start = last_focused_element_info.find('boundsInScreen: Rect(')
+        if start != -1:
+            # Extract the substring containing the bounds
+            end = last_focused_element_info.find(')', start) + 1
+            bounds_str = last_focused_element_info[start:end]
+            # Extract just the numbers from the bounds string
+            bounds = convert_to_tuple(bounds_str)
+            last_focused_element_bounds = bounds
+
+    if last_clicked_element_info:
+        start = last_clicked_element_info.find('boundsInScreen: Rect(')
+        if start != -1:
+            end = last_clicked_element_info.find(')', start) + 1
+            bounds_str = last_clicked_element_info[start:end]
+            bounds = convert_to_tuple(bounds_str)
+            last_clicked_element_bounds = bounds
+
+    if not last_focused_element_bounds:
+        last_focused_element_bounds = "Bounds not found."
+
+    if not last_clicked_element_bounds:
+        last_clicked_element_bounds = "Bounds not found."
+
+    return last_focused_element_bounds, last_clicked_element_bounds
+
+
+def is_accessibility_focus_changed_after_clicking(file_path : str) -> bool:
+    is_accessibility_focus_changed = False
+    last_event_type = None
+
+    try:
+        with open(file_path, 'r') as file:
+            for line in file:
+                if "EventType: TYPE_VIEW_CLICKED" in line:
+                    last_event_type = "TYPE_VIEW_CLICKED"
+                elif "EventType:" in line:
+                    current_event_type = line.split("EventType:")[1].split(";")[0].strip()
+                    if last_event_type == "TYPE_VIEW_CLICKED" and (current_event_type == "TYPE_VIEW_ACCESSIBILITY_FOCUSED"):
+                        is_accessibility_focus_changed = True
+                        break
+    except:
+        print(f"Error: Failed to read the file {file_path}.")
+        return False
+
+    return is_accessibility_focus_changed
+
+
+def load_event_log_with_legacy_functions(path: str) -> tuple:
+    scrolling, click_new_window = analyze_events_scroll_click(path)
+    last_focused_bounds, last_clicked_bounds = extract_bounds_of_last_focused_element(path)
+    return (load_event_log(path), load_all_events(path), scrolling, click_new_window, last_focused_bounds,
+            last_clicked_bounds, check_event(path, ['TYPE_WINDOWS_CHANGED', 'TYPE_WINDOW_STATE_CHANGED']),
+            is_accessibility_focus_changed_after_clicking(path))
+
+
+def describe(log) -> tuple:
+    return ([list(event) for event in log.events], [tuple(event) for event in log.full_events],
+            log.is_scrolling_new_content, log.is_click_new_window, log.last_focused_bounds, log.last_clicked_bounds,
+            log.window_changed, log.is_accessibility_focus_changed)
+
+
+EVENT_TYPES_WITH_FOLLOW_UPS = EVENT_TYPES + ("TYPE_VIEW_CLICKED", "TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOWS_CHANGED",
+                                             "TYPE_VIEW_LONG_CLICKED", "TYPE_ANNOUNCEMENT")
+WESTERN_TEXTS = ("Café", "Größe ändern", "Ça va", "naïve £5")
+CYRILLIC_TEXTS = ("Привет", "Настройки", "Поиск")
+
+
+def generate_event_log(rng: random.Random, line_count: int, texts=WESTERN_TEXTS + CYRILLIC_TEXTS) -> str:
+    """Returns a log mixing events of every kind the flags look at with noise: lines that are not events, events
+    without bounds or with negative bounds, other scroll deltas, non-ASCII texts and mixed line endings"""
+    # Each log only has some of the event types, so that every flag is set in some logs and not in others
+    event_types = rng.sample(EVENT_TYPES_WITH_FOLLOW_UPS, rng.randint(1, len(EVENT_TYPES_WITH_FOLLOW_UPS)))
+    lines = []
+    for position in range(line_count):
+        x1, y1 = rng.randrange(1000), rng.randrange(2200)
+        line = event_line(rng, position, rng.choice(event_types),
+                          (x1, y1, x1 + rng.randint(0, 100), y1 + rng.randint(0, 100)),
+                          rng.choice([0, 0, -120, 45]))
+        choice = rng.random()
+        if choice < 0.05:
+            line = line.replace("boundsInScreen: Rect(", "boundsInScreen: Rect(-")
+        elif choice < 0.1:
+            line = line.replace("boundsInScreen: Rect(", "boundsInScreen: null; Old: Rect(")
+        elif choice < 0.13:
+            line = line.replace("ScrollDeltaX: 0", f"ScrollDeltaX: {rng.choice(['7', 'x', '3 px'])}")
+        elif choice < 0.16:
+            line = f"01-15 10:00:00.000  4242  4242 D WindowManager: {rng.choice(event_types)}\n"
+        elif choice < 0.19:
+            line = "--------- beginning of main\n"
+        if rng.random() < 0.2:
+            line = line.replace("Text: []", f"Text: [{rng.choice(texts)}]")
+        if rng.random() < 0.1:
+            line = line.replace("\n", "\r\n")
+        lines.append(line)
+    return "".join(lines)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_parse_event_log_matches_the_legacy_functions(tmp_path, seed):
+    rng = random.Random(seed)
+    path = str(tmp_path / "scenario-ev.txt")
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(generate_event_log(rng, rng.randint(0, 300)))
+
+    expected = load_event_log_with_legacy_functions(path)
+    assert describe(parse_event_log(path)) == expected
+    with open(path, 'rb') as f:
+        assert describe(parse_event_log(path, f.read())) == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("encoding, texts", [("latin-1", WESTERN_TEXTS), ("cp1251", CYRILLIC_TEXTS),
+                                             ("utf-16", WESTERN_TEXTS + CYRILLIC_TEXTS)])
+def test_parse_event_log_matches_the_legacy_functions_on_logs_that_are_not_utf8(tmp_path, seed, encoding, texts):
+    rng = random.Random(seed)
+    raw_data = generate_event_log(rng, rng.randint(50, 300), texts).encode(encoding)
+    with pytest.raises(UnicodeDecodeError):
+        raw_data.decode('utf-8')
+    path = str(tmp_path / "scenario-ev.txt")
+    with open(path, 'wb') as f:
+        f.write(raw_data)
+    # Only load_all_events detected the encoding, the other functions failed on such logs. They are compared on the
+    # text load_all_events decoded, written as UTF-8
+    decoded_path = str(tmp_path / "decoded-ev.txt")
+    with open(decoded_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(raw_data.decode(chardet.detect(raw_data)['encoding']))
+
+    expected = load_event_log_with_legacy_functions(decoded_path)
+    assert load_all_events(path) == expected[1]
+    assert describe(parse_event_log(path)) == expected
+    assert describe(parse_event_log(path, raw_data)) == expected
@@ -0,0 +1,100 @@
+import random
+from collections import Counter
+from frame_diff import FrameDiff
+from node import A11yFocusedStatus
+from scenario import ScenarioContext
+from synthetic_scenarios import generate_scenario
+from utils import filter_attributes_changed_nodes, filter_elements, filter_moving_nodes, filter_nodes_by_resource_id, \
+    get_problematic_dynamic_content_changes
+
+
+# The filters as they were before the hash indexes, scanning lists node by node
+
+
+def filter_short_lived_nodes(nodes, excluded_nodes):
+    filtered_nodes = [node for node in nodes if node.clickable == 'true' or (
+                node.liveRegion == '0' and not node.is_ancestor_live_region and node.important_for_accessibility == 'true' and node.visible == 'true')]
+    return [node for node in filtered_nodes if node not in excluded_nodes]
+
+
+def filter_disappearing_nodes(nodes, excluded_nodes, additional_nodes, target_elements):
+    nodes = [node for node in nodes if node not in excluded_nodes and node.visible == 'true' and (
+                node.important_for_accessibility == 'true' or node.focusable == 'true' or node.text != "" or node.content_description != "")]
+    if additional_nodes:
+        nodes = filter_elements(nodes, additional_nodes)
+    return filter_nodes_based_on_target_elements(nodes, target_elements)
+
+
+def filter_appearing_nodes(nodes, excluded_nodes, additional_nodes, target_elements):
+    nodes = [node for node in nodes if node not in excluded_nodes and node.visible == 'true' and (
+                node.important_for_accessibility == 'true' or node.focusable == 'true' or node.text != "" or node.content_description != "")]
+    if additional_nodes:
+        nodes = filter_elements(nodes, additional_nodes)
+    return filter_nodes_based_on_target_elements(nodes, target_elements, before_focus=True)
+
+
+def filter_nodes_based_on_target_elements(nodes, target_elements, before_focus=False):
+    resource_id_counts = Counter(element.resource_id for element in target_elements)
+    unique_resource_ids = {resource_id for resource_id, count in resource_id_counts.items() if count == 1}
+    text_list = [element.text for element in target_elements if element.text != ""]
+    content_description_list = [element.content_description for element in target_elements if
+                                element.content_description != ""]
+
+    focus_status_check = (lambda node: node.a11yFocusedStatus == A11yFocusedStatus.BEFORE) if before_focus else (
+        lambda node: node.a11yFocusedStatus == A11yFocusedStatus.AFTER)
+
+    return [node for node in nodes if
+            focus_status_check(node) and node.liveRegion == '0' and node.resource_id not in unique_resource_ids and (
+                        node.text not in text_list) and (node.content_description not in content_description_list)]
+
+
+def get_problematic_dynamic_content_changes_by_lists(attributes_changed_nodes, moving_nodes, short_lived_nodes,
+                                                     disappearing_nodes, appearing_nodes, target_elements_1,
+                                                     target_elements_2):
+    attributes_changed_nodes = filter_attributes_changed_nodes(attributes_changed_nodes)
+    attributes_changed_nodes = filter_nodes_by_resource_id(attributes_changed_nodes)
+
+    moving_nodes = filter_moving_nodes(moving_nodes)
+
+    short_lived_nodes = filter_short_lived_nodes(short_lived_nodes, attributes_changed_nodes)
+
+    disappearing_nodes = filter_disappearing_nodes(disappearing_nodes, moving_nodes + short_lived_nodes,
+                                                   appearing_nodes, target_elements_2)
+
+    appearing_nodes = filter_appearing_nodes(appearing_nodes, moving_nodes + short_lived_nodes, disappearing_nodes,
+                                             target_elements_1)
+
+    return attributes_changed_nodes, moving_nodes, short_lived_nodes, disappearing_nodes, appearing_nodes
+
+
+def test_indexed_filters_match_the_list_based_filters(tmp_path):
+    for seed in range(3):
+        base_path = generate_scenario(str(tmp_path / f"scenario_{seed}"), node_count=300, event_count=50, seed=seed)
+        ctx = ScenarioContext.from_base_path(base_path)
+        changes = FrameDiff(ctx).classify()
+        rng = random.Random(seed)
+        nodes = [node for frame in ctx.frames for node in frame]
+        for _ in range(20):
+            # Nodes sharing resource ids, texts and content descriptions, with any focus status and live region
+            for node in nodes:
+                if rng.random() < 0.3:
+                    node.resource_id = rng.choice(["app:id/item", "app:id/title", "",
+                                                   f"app:id/view_{rng.randrange(len(nodes) // 2)}"])
+                if rng.random() < 0.1:
+                    node.text = rng.choice(["", "Item", "Title"])
+                if rng.random() < 0.1:
+                    node.content_description = rng.choice(["", "Item"])
+                node.a11yFocusedStatus = rng.choice(list(A11yFocusedStatus))
+                node.liveRegion = rng.choice(["0", "0", "1"])
+            # Categories overlap, e.g. a node can be both moving and short-lived
+            arguments = [changes.attributes_changed + rng.sample(nodes, 20), changes.moving + rng.sample(nodes, 20),
+                         changes.short_lived + rng.sample(nodes, 20), changes.disappearing + rng.sample(nodes, 20),
+                         changes.appearing + rng.sample(nodes, 20)]
+            arguments = [rng.sample(category, len(category)) for category in arguments]
+            expected = get_problematic_dynamic_content_changes_by_lists(*arguments, ctx.target_elements_1,
+                                                                        ctx.target_elements_2)
+            assert any(expected)
+            results = get_problematic_dynamic_content_changes(*arguments, ctx.target_elements_1,
+                                                              ctx.target_elements_2)
+            assert [[id(node) for node in category] for category in results] == \
+                   [[id(node) for node in category] for category in expected]
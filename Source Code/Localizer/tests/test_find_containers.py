@@ -0,0 +1,47 @@
+import random
+from utils import filter_contained_elements, find_containers
+
+
+def is_container(container_bounds, child_bounds):
+    return (container_bounds[0][0] < child_bounds[0][0] and
+            container_bounds[0][1] < child_bounds[0][1] and
+            container_bounds[1][0] > child_bounds[1][0] and
+            container_bounds[1][1] > child_bounds[1][1])
+
+
+def find_containers_pairwise(bounds_list) -> set:
+    """Compares all pairs of bounds, like filter_contained_elements did before find_containers"""
+    return {i for i, bounds in enumerate(bounds_list) for j, other_bounds in enumerate(bounds_list)
+            if i != j and is_container(bounds, other_bounds)}
+
+
+def random_bounds(rng: random.Random, count: int, extent: int) -> list:
+    """Random bounds on a small grid, so that edges are often shared and bounds often repeat"""
+    bounds_list = []
+    for _ in range(count):
+        x1, x2 = sorted(rng.randint(0, extent) for _ in range(2))
+        y1, y2 = sorted(rng.randint(0, extent) for _ in range(2))
+        bounds_list.append(((x1, y1), (x2, y2)))
+    if bounds_list and rng.random() < 0.3:
+        bounds_list.extend(rng.choices(bounds_list, k=rng.randint(1, count)))
+        rng.shuffle(bounds_list)
+    return bounds_list
+
+
+def test_find_containers_matches_pairwise():
+    for seed in range(3000):
+        rng = random.Random(seed)
+        bounds_list = random_bounds(rng, rng.randint(0, 40), rng.choice((3, 10, 100, 2000)))
+        assert find_containers(bounds_list) == find_containers_pairwise(bounds_list), f"seed {seed}"
+
+
+def test_filter_contained_elements_keeps_order():
+    class Element:
+        def __init__(self, bounds):
+            self.bounds = bounds
+
+    rng = random.Random(0)
+    elements = [Element(bounds) for bounds in random_bounds(rng, 200, 50)]
+    containers = find_containers_pairwise([element.bounds for element in elements])
+    assert filter_contained_elements(elements) == [element for index, element in enumerate(elements)
+                                                   if index not in containers]
@@ -0,0 +1,57 @@
+import glob
+import json
+import os
+import sys
+import localizer
+from analysis import Analyzer
+from consts import DATASET_FOLDER, RESULTS_JSONL, RESULTS_PICKLE
+from results_sink import iter_records
+from synthetic_scenarios import generate_dataset, generate_scenario
+
+SIZES = {'node_count': 150, 'event_count': 40}
+
+
+def run_localizer(monkeypatch, *args) -> list:
+    """Runs the localizer in the current folder and returns the base paths it analyzed"""
+    analyzed = []
+    process_scenario = localizer.process_scenario
+
+    def process(base_path, **options):
+        analyzed.append(base_path)
+        return process_scenario(base_path, **options)
+
+    monkeypatch.setattr(localizer, "process_scenario", process)
+    monkeypatch.setattr(sys, "argv", ["localizer.py", "--no-images", "--no-cache", *args])
+    localizer.main()
+    return analyzed
+
+
+def test_incremental_runs_only_analyze_modified_scenarios(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base_paths = generate_dataset(DATASET_FOLDER, apps=1, scenarios=3, **SIZES)
+
+    assert sorted(run_localizer(monkeypatch, "--incremental")) == sorted(base_paths)
+    records = list(iter_records(RESULTS_JSONL))
+    assert sorted(record['scenario'] for record in records) == sorted(base_paths)
+
+    # Nothing changed, and files that were only touched are compared by content
+    for path in glob.glob(f"{os.path.dirname(base_paths[0])}/*"):
+        os.utime(path)
+    assert run_localizer(monkeypatch, "--incremental") == []
+    assert list(iter_records(RESULTS_JSONL)) == records
+
+    modified = base_paths[1]
+    generate_scenario(os.path.dirname(modified), seed=100, **SIZES)
+    assert run_localizer(monkeypatch, "--incremental") == [modified]
+
+    # The record of the modified scenario was replaced in place, and the others were kept
+    new_records = list(iter_records(RESULTS_JSONL))
+    assert [record['scenario'] for record in new_records] == [record['scenario'] for record in records]
+    for record, new_record in zip(records, new_records):
+        if record['scenario'] == modified:
+            with Analyzer() as analyzer:
+                expected = analyzer.analyze(modified).to_record(modified)
+            assert new_record == json.loads(json.dumps(expected)) != record
+        else:
+            assert new_record == record
+    assert os.path.exists(RESULTS_PICKLE)
@@ -0,0 +1,86 @@
+import copyreg
+import pickle
+import xml.etree.ElementTree as ET
+from node import A11yFocusedStatus, Node
+
+PARENT = ET.fromstring('<node index="0" text="" resource-id="app:id/list" class="android.widget.ListView" '
+                       'content-desc="" checked="false" clickable="false" enabled="true" focusable="false" '
+                       'importantForAccessibility="true" selected="false" visible="true" liveRegion="1" '
+                       'drawingOrder="1" a11yFocused="false" actionList="4-64" bounds="[0,100][1080,900]"/>')
+CHILD = ET.fromstring('<node index="2" text="Item" resource-id="app:id/item" class="android.widget.TextView" '
+                      'content-desc="An item" checked="false" clickable="true" enabled="true" focusable="true" '
+                      'importantForAccessibility="true" selected="false" visible="true" liveRegion="0" '
+                      'drawingOrder="3" a11yFocused="false" actionList="4-8-64" bounds="[40,300][1040,200]"/>')
+
+
+class BaselineNode:
+    """Pickles like a Node of the first version, which kept its attributes in an instance dict"""
+    def __init__(self, element, bounds, parent=None, is_ancestor_live_region=False):
+        get = element.attrib.get
+        state = {'text': get('text', ''), 'content_description': get('content-desc', ''),
+                 'class_name': get('class', ''), 'resource_id': get('resource-id', ''),
+                 'bounds': get('bounds', ''), 'size': Node.calculate_size(get('bounds', '')),
+                 'a11yFocused': get('a11yFocused', ''), 'liveRegion': get('liveRegion', ''),
+                 'visible': get('visible', ''), 'checked': get('checked', ''), 'moving_from_above_to_below': False,
+                 'is_changed': None, 'is_appearing': True, 'is_disappearing': None, 'is_short_lived': None,
+                 'is_moving': None, 'index': get('index', ''), 'action_list': get('actionList', ''),
+                 'a11yFocusedStatus': A11yFocusedStatus.AFTER, 'clickable': get('clickable', ''),
+                 'important_for_accessibility': get('importantForAccessibility', ''),
+                 'selected': get('selected', ''), 'focusable': get('focusable', ''),
+                 'enabled': get('enabled', ''), 'drawing_order': get('drawingOrder', '')}
+        state['identifier_group'] = (state['resource_id'], state['class_name'], state['index'],
+                                     state['content_description'], state['text'], state['bounds'])
+        state['moving_direction'] = None
+        state['identifier_group_alternative'] = (state['class_name'], state['resource_id'], state['text'],
+                                                 state['index'], state['clickable'],
+                                                 state['important_for_accessibility'], state['liveRegion'],
+                                                 state['content_description'], state['drawing_order'])
+        state['identifier_group_alternative_2'] = (state['class_name'], state['resource_id'],
+                                                   state['content_description'], state['text'])
+        state['parent'] = parent
+        state['is_ancestor_live_region'] = is_ancestor_live_region
+        # The loader replaced the bounds string with coordinates
+        state['bounds'] = bounds
+        self.state = state
+
+    def __reduce_ex__(self, protocol):
+        # Loads like an object created without calling __init__ whose state is then set from the dict
+        return copyreg._reconstructor, (Node, object, None), self.state
+
+
+def test_unpickle_baseline_node():
+    parent = BaselineNode(PARENT, ((0, 100), (1080, 900)))
+    child = BaselineNode(CHILD, ((40, 200), (1040, 300)), parent, is_ancestor_live_region=True)
+    node = pickle.loads(pickle.dumps({'scenario': ([child], [])}))['scenario'][0][0]
+
+    parsed = Node(CHILD)
+    assert isinstance(node, Node) and isinstance(node.parent, Node)
+    assert node.bounds == ((40, 200), (1040, 300))
+    assert node._raw_bounds == "[40,300][1040,200]"
+    assert node.identifier_group == parsed.identifier_group
+    assert node.identifier_group_alternative == parsed.identifier_group_alternative
+    assert node.identifier_group_alternative_2 == parsed.identifier_group_alternative_2
+    assert node.is_ancestor_live_region is True
+    assert node.parent.is_ancestor_live_region is False
+    assert node.attributes_hash == parsed.attributes_hash
+    assert node.subtree_hash == parsed.content_hash
+    assert node.tree is None and node.tree_position == -1
+    assert node.is_appearing and node.a11yFocusedStatus == A11yFocusedStatus.AFTER
+    assert node.important_attributes()['bounds'] == ((40, 200), (1040, 300))
+
+    # Loaded nodes pickle again with the current state
+    again = pickle.loads(pickle.dumps(node))
+    assert [getattr(again, slot) for slot in Node.__slots__ if slot != 'parent'] == \
+           [getattr(node, slot) for slot in Node.__slots__ if slot != 'parent']
+
+
+def test_unpickle_node_without_newer_slots():
+    node = Node(CHILD)
+    node.parent = Node(PARENT)
+    # A tuple state from before the hashes were added to the slots
+    state = node.__getstate__()[:Node.__slots__.index('_attributes_hash')]
+    loaded = Node.__new__(Node)
+    loaded.__setstate__(state)
+    assert loaded.attributes_hash == node.attributes_hash
+    assert loaded.subtree_hash == node.content_hash
+    assert loaded.identifier_group == node.identifier_group
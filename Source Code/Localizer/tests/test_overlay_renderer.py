@@ -0,0 +1,63 @@
+import glob
+import os
+import pytest
+from PIL import Image, ImageChops
+from frame_diff import FrameDiff
+from GUI_utils import overlay_boxes_on_image
+from overlay_renderer import CATEGORY_COLORS, IMAGE_FORMATS, overlay_spec, render_overlays
+from scenario import ScenarioContext
+from synthetic_scenarios import generate_scenario
+
+
+def scenario_spec(tmp_path) -> dict:
+    """The overlay spec of a generated scenario with the boxes of all its changes, so every category is drawn"""
+    base_path = generate_scenario(str(tmp_path / "app" / "scenario_0"), node_count=200, event_count=50,
+                                  screenshot_scale=0.5)
+    ctx = ScenarioContext.from_base_path(base_path)
+    changes = FrameDiff(ctx).classify()
+    regions = [[node.bounds for node in nodes] for nodes in (changes.short_lived, changes.disappearing,
+                                                              changes.appearing, changes.moving,
+                                                              changes.attributes_changed)]
+    folder = os.path.dirname(base_path)
+    frames = [glob.glob(f"{folder}/*{suffix}")[0] for suffix in (".1.png", ".action.2.png", ".3.png")]
+    return overlay_spec(frames, regions)
+
+
+@pytest.mark.parametrize("image_format", sorted(IMAGE_FORMATS))
+def test_render_overlays_writes_an_image_of_each_frame_per_category(tmp_path, image_format):
+    spec = scenario_spec(tmp_path)
+    assert len(spec["regions"]) >= 3
+    output = tmp_path / "results"
+    output.mkdir()
+
+    assert render_overlays(spec, str(output), image_format)
+
+    extension = IMAGE_FORMATS[image_format][0]
+    expected = {f"{prefix}_{frame_number}_out{extension}" for prefix in spec["regions"]
+                for frame_number in range(1, 4)}
+    assert set(os.listdir(output)) == expected
+    for prefix in spec["regions"]:
+        for frame_number, frame_path in enumerate(spec["frames"], start=1):
+            output_path = output / f"{prefix}_{frame_number}_out{extension}"
+            with Image.open(frame_path) as frame, Image.open(output_path) as image:
+                assert frame.size == (540, 1170)
+                assert image.size == frame.size
+                if extension == ".png":
+                    # Lossless, so the same pixels as the images overlay_boxes_on_image draws one at a time
+                    boxes = [spec["regions"][prefix] if category == prefix else [] for category in CATEGORY_COLORS]
+                    reference = str(tmp_path / "reference.png")
+                    overlay_boxes_on_image(frame_path, *boxes, reference)
+                    with Image.open(reference) as expected_image:
+                        assert ImageChops.difference(image.convert("RGB"),
+                                                     expected_image.convert("RGB")).getbbox() is None
+
+
+def test_render_overlays_reports_missing_screenshots(tmp_path):
+    spec = scenario_spec(tmp_path)
+    os.remove(spec["frames"][1])
+    output = tmp_path / "results"
+    output.mkdir()
+
+    assert not render_overlays(spec, str(output))
+    assert set(os.listdir(output)) == {f"{prefix}_{frame_number}_out.png" for prefix in spec["regions"]
+                                       for frame_number in (1, 3)}
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+import pytest
+from pipeline import Stage, run_pipeline
+
+
+class Counter:
+    """Counts the calls of a function running at the same time"""
+    def __init__(self, function):
+        self.function = function
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self, item):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            return self.function(item)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def sleep_then(function, seconds: float):
+    def run(item):
+        time.sleep(seconds)
+        return function(item)
+    return run
+
+
+def test_results_keep_the_input_order():
+    rng = random.Random(0)
+    delays = [rng.random() / 200 for _ in range(60)]
+    results = []
+    run_pipeline(range(60), [Stage("read", lambda item: (time.sleep(delays[item]), item)[1], concurrency=4),
+                             Stage("parse", lambda item: (time.sleep(delays[-item - 1]), item * 2)[1], concurrency=3,
+                                   queue_size=2)],
+                 results.append)
+    assert results == [item * 2 for item in range(60)]
+
+
+def test_a_slow_stage_holds_the_earlier_stages_back():
+    stages = [Stage("read", Counter(sleep_then(lambda item: item, 0.003)), concurrency=2, queue_size=1),
+              Stage("analyze", Counter(sleep_then(lambda item: item, 0.005)), concurrency=2, queue_size=2)]
+    # Items waiting to be queued by the discovery and in the first queue, then the running items, the next item
+    # taken and the queued results of each stage, and the item being collected
+    limit = 2 + sum(stage.concurrency + 1 + stage.queue_size for stage in stages) + 1
+    taken = 0
+    in_flight = []
+
+    def items():
+        nonlocal taken
+        for item in range(100):
+            taken += 1
+            yield item
+
+    def collect(item):
+        in_flight.append(taken - item)
+        time.sleep(0.002)
+
+    run_pipeline(items(), stages, collect)
+    assert taken == len(in_flight) == 100
+    assert max(in_flight) <= limit
+    assert [stage.function.max_running for stage in stages] == [2, 2]
+
+
+def test_the_first_exception_of_a_stage_stops_the_pipeline():
+    taken = []
+    collected = []
+
+    def items():
+        for item in range(1000):
+            taken.append(item)
+            yield item
+
+    def parse(item):
+        if item == 10:
+            raise ValueError(f"Cannot parse {item}")
+        return item
+
+    with pytest.raises(ValueError, match="Cannot parse 10"):
+        run_pipeline(items(), [Stage("read", lambda item: item, concurrency=2), Stage("parse", parse)],
+                     collected.append)
+    assert collected == list(range(10))
+    # No more items were taken once the pipeline stopped
+    assert len(taken) < 100
+
+    with pytest.raises(KeyError):
+        run_pipeline(range(10), [Stage("read", lambda item: item)], lambda item: {}[item])
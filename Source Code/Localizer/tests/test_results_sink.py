@@ -0,0 +1,26 @@
+import random
+from results_sink import ResultsWriter, compact, iter_records, load_records
+
+
+def test_compact_keeps_the_last_record_of_each_scenario(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    rng = random.Random(0)
+    with ResultsWriter(path) as writer:
+        for run in range(200):
+            scenario = f"app/scenario_{rng.randrange(20)}/scenario"
+            if rng.random() < 0.2:
+                writer.remove(scenario)
+            else:
+                writer.write({'scenario': scenario, 'run': run, 'findings': {'moving': ["é" * rng.randrange(5)]}})
+    with open(path, 'a', encoding='utf-8') as f:
+        # Left by an interrupted run
+        f.write('{"scenario": "app/scenario_0/scen')
+    expected = load_records(path)
+
+    compact(path)
+
+    assert list(iter_records(path)) == list(expected.values())
+    with ResultsWriter(path, append=True) as writer:
+        writer.remove("app/scenario_1/scenario")
+    expected.pop("app/scenario_1/scenario", None)
+    assert load_records(path) == expected
@@ -0,0 +1,50 @@
+from results_sink import CATEGORIES, ResultsWriter
+from results_store import ResultsStore
+
+
+def finding(resource_id: str, y: int) -> dict:
+    return {'resource_id': f"app:id/{resource_id}", 'class_name': "android.widget.TextView", 'text': resource_id,
+            'content_description': "", 'bounds': [[0, y], [100, y + 50]], 'liveRegion': "0", 'visible': "true",
+            'a11yFocusedStatus': "AFTER", 'clickable': "false", 'important_for_accessibility': "true"}
+
+
+def record(app: str, scenario: str, **findings) -> dict:
+    return {'scenario': f"{app}/{scenario}/{scenario}", 'app': app, 'window_changed': False,
+            'findings': {category: findings.get(category, []) for category in CATEGORIES}}
+
+
+def test_import_keeps_the_last_record_of_each_scenario_and_runs_are_compared(tmp_path):
+    old_path, new_path = str(tmp_path / "old.jsonl"), str(tmp_path / "new.jsonl")
+    # Written like an incremental run: a test analyzed again and a test that was deleted
+    with ResultsWriter(old_path) as writer:
+        writer.write(record("app_1", "a", moving=[finding("title", 0), finding("stale", 100)]))
+        writer.write(record("app_2", "b", appearing=[finding("banner", 200)]))
+        writer.write(record("app_1", "a", moving=[finding("title", 0)]))
+        writer.write(record("app_3", "c", disappearing=[finding("deleted", 300)]))
+        writer.remove("app_3/c/c")
+    with ResultsWriter(new_path) as writer:
+        writer.write(record("app_1", "a", moving=[finding("title", 0)], short_lived=[finding("toast", 400)]))
+        writer.write(record("app_2", "b"))
+        writer.write(record("app_3", "d", attributes_changed=[finding("counter", 500)]))
+
+    with ResultsStore(str(tmp_path / "results.db")) as store:
+        assert store.import_results(old_path, "old") == "old"
+        assert store.import_results(new_path, "new") == "new"
+        assert [(name, scenarios, findings) for name, _, scenarios, findings in store.runs()] == \
+               [("old", 2, 2), ("new", 3, 3)]
+
+        added, removed = store.diff("old", "new")
+        assert added == [
+            ("app_1/a/a", "app_1", "short_lived", "app:id/toast", "android.widget.TextView", "toast", "",
+             "[0,400][100,450]"),
+            ("app_3/d/d", "app_3", "attributes_changed", "app:id/counter", "android.widget.TextView", "counter", "",
+             "[0,500][100,550]")]
+        assert removed == [("app_2/b/b", "app_2", "appearing", "app:id/banner", "android.widget.TextView", "banner",
+                            "", "[0,200][100,250]")]
+        assert store.regressed_apps("old", "new") == [("app_1", 1, 0), ("app_3", 1, 0), ("app_2", 0, 1)]
+        assert store.diff("new", "old") == (removed, added)
+
+        # Importing a run again under the same name replaces it
+        store.import_results(new_path, "old")
+        assert store.diff("old", "new") == ([], [])
+        assert store.regressed_apps("old", "new") == []
@@ -0,0 +1,107 @@
+import glob
+import math
+import os
+import random
+import struct
+import scenario_cache
+from scenario_cache import CACHE_FORMAT_VERSION, CACHE_MAGIC, ScenarioCache
+from synthetic_scenarios import generate_scenario, generate_tree, write_dump
+from utils import import_data
+
+
+def describe(data: tuple) -> tuple:
+    """The parsed events, flags and the nodes of every frame of an import_data result"""
+    frames = [data[2], data[3], data[4], *data[13]]
+    return data[0], data[1], data[5:13], [[node.identifier_group for node in frame] for frame in frames]
+
+
+def touch(path: str, seconds: int = 1) -> None:
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_cache_reuses_entries_until_the_content_of_an_input_changes(tmp_path, monkeypatch):
+    base_path = generate_scenario(str(tmp_path / "app" / "scenario_0"), node_count=100, event_count=30,
+                                  timeline_frames=2)
+    expected = describe(import_data(base_path))
+    cache = ScenarioCache(str(tmp_path / "cache"))
+    assert cache.load(base_path) is None
+    assert describe(cache.get_or_import(base_path)) == expected
+
+    hashed = []
+    content_hash = scenario_cache.content_hash
+    monkeypatch.setattr(scenario_cache, "content_hash", lambda path: hashed.append(path) or content_hash(path))
+    assert describe(cache.load(base_path)) == expected
+    # Sizes and mtimes match, so no file is read again
+    assert hashed == []
+
+    # Touched without changing: hashed once, and the new mtime is kept in the entry
+    dump = glob.glob(f"{os.path.dirname(base_path)}/*.3-a11y.xml")[0]
+    touch(dump)
+    assert describe(cache.load(base_path)) == expected
+    assert hashed == [dump]
+    assert describe(cache.load(base_path)) == expected
+    assert hashed == [dump]
+
+    with open(dump, 'ab') as f:
+        f.write(b"\n")
+    touch(dump, 2)
+    assert cache.load(base_path) is None
+
+    # A dump added to the timeline changes the inputs too
+    assert describe(cache.get_or_import(base_path)) == describe(import_data(base_path))
+    assert cache.load(base_path) is not None
+    write_dump(generate_tree(random.Random(0), 20, 3), f"{base_path}.action-4-a11y.xml")
+    assert cache.load(base_path) is None
+
+
+def test_cache_rejects_entries_of_other_versions(tmp_path, monkeypatch):
+    base_path = generate_scenario(str(tmp_path / "app" / "scenario_0"), node_count=100, event_count=30)
+    cache = ScenarioCache(str(tmp_path / "cache"))
+    cache.get_or_import(base_path)
+    path = cache._path(base_path)
+    assert cache.load(base_path) is not None
+
+    with open(path, 'r+b') as f:
+        f.write(struct.pack('<4sH', CACHE_MAGIC, CACHE_FORMAT_VERSION - 1))
+    assert cache.load(base_path) is None
+    with open(path, 'r+b') as f:
+        f.write(struct.pack('<4sH', b'XXXX', CACHE_FORMAT_VERSION))
+    assert cache.load(base_path) is None
+
+    # Written again by the next import
+    cache.get_or_import(base_path)
+    assert cache.load(base_path) is not None
+    monkeypatch.setattr(scenario_cache, "CACHE_FORMAT_VERSION", CACHE_FORMAT_VERSION + 1)
+    assert cache.load(base_path) is None
+
+
+def test_cache_evicts_the_least_recently_used_entries(tmp_path):
+    base_paths = [generate_scenario(str(tmp_path / "app" / f"scenario_{i}"), node_count=100 + 50 * i,
+                                    event_count=30, seed=i) for i in range(4)]
+    cache_dir = str(tmp_path / "cache")
+    cache = ScenarioCache(cache_dir)
+    for base_path in base_paths[:3]:
+        cache.get_or_import(base_path)
+    sizes = [os.path.getsize(cache._path(base_path)) for base_path in base_paths[:3]]
+    for age, base_path in enumerate(base_paths[:3]):
+        os.utime(cache._path(base_path), ns=(0, (1_000_000 + age) * 1_000_000_000))
+    # Loading the oldest entry makes it the most recently used one
+    assert cache.load(base_paths[0]) is not None
+
+    cache = ScenarioCache(cache_dir)
+    cache.get_or_import(base_paths[3])
+    sizes.append(os.path.getsize(cache._path(base_paths[3])))
+    # Everything but the least recently used entry fits into the share of the limit the cache is trimmed to
+    max_bytes = math.ceil((sizes[0] + sizes[2] + sizes[3]) / scenario_cache.EVICT_LOW_WATER) + 1
+    cache = ScenarioCache(cache_dir, max_bytes)
+    assert sum(sizes) > cache.max_bytes
+    cache.evict()
+    assert [os.path.exists(cache._path(base_path)) for base_path in base_paths] == [True, False, True, True]
+    assert cache.total_bytes == sizes[0] + sizes[2] + sizes[3]
+
+    # Stores trim the cache as soon as it grows beyond the limit
+    cache.get_or_import(base_paths[1])
+    assert cache.total_bytes <= cache.max_bytes
+    assert os.path.exists(cache._path(base_paths[1]))
+    assert cache.total_bytes == sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
@@ -0,0 +1,66 @@
+import fnmatch
+import json
+import os
+import time
+from analysis import Analyzer
+from service import UPLOAD_FILE_PATTERNS, AnalysisService, create_app
+from synthetic_scenarios import generate_scenario
+
+
+def upload_data(folder: str, names=None) -> dict:
+    """Form data uploading the files of a scenario the way the bundled client does"""
+    data = {"app": "synthetic_app", "scenario": "scenario_0"}
+    for index, name in enumerate(sorted(os.listdir(folder))):
+        if any(fnmatch.fnmatch(name, pattern) for pattern in UPLOAD_FILE_PATTERNS) and (names is None or
+                                                                                       name in names):
+            data[str(index)] = (open(os.path.join(folder, name), 'rb'), name)
+    return data
+
+
+def wait_until_finished(service: AnalysisService, timeout: float = 10.0) -> None:
+    """The request returns as soon as the result is set, before the callback counting the finished test runs"""
+    deadline = time.monotonic() + timeout
+    while service.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_service_analyzes_uploads_and_refuses_them_when_the_queue_is_full(tmp_path):
+    folder = str(tmp_path / "dataset" / "synthetic_app" / "scenario_0")
+    base_path = generate_scenario(folder, node_count=300, timeline_frames=2, seed=3)
+    with Analyzer() as analyzer:
+        expected = analyzer.analyze(base_path).to_record(base_path)
+    assert any(expected["findings"].values())
+
+    service = AnalysisService(workers=1, queue_size=0, upload_dir=str(tmp_path / "uploads"))
+    try:
+        client = create_app(service).test_client()
+        response = client.post("/analyze", data=upload_data(folder))
+        assert response.status_code == 200
+        record = response.get_json()["findings"]
+        assert record["scenario"] == "synthetic_app/scenario_0"
+        assert record["findings"] == json.loads(json.dumps(expected["findings"]))
+        assert response.get_json()["analysis_time"] > 0
+        wait_until_finished(service)
+        # Uploads are removed once analyzed
+        assert os.listdir(tmp_path / "uploads") == []
+
+        # The final dump is required
+        response = client.post("/analyze", data=upload_data(folder, [name for name in os.listdir(folder)
+                                                                    if not name.endswith(".3-a11y.xml")]))
+        assert response.status_code == 400
+        assert "*.3-a11y.xml" in response.get_json()["error"]
+
+        # A test is already running on the only worker and none can wait
+        service.in_flight += 1
+        response = client.post("/analyze", data=upload_data(folder))
+        service.in_flight -= 1
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+        stats = client.get("/stats").get_json()
+        assert stats["workers"] == 1 and stats["capacity"] == 1
+        assert stats["in_flight"] == stats["queue_depth"] == 0
+        assert (stats["completed"], stats["failed"], stats["rejected"]) == (1, 0, 1)
+        assert stats["latency"]["p50"] == stats["latency"]["p99"] >= stats["analysis_time"]["p50"] > 0
+    finally:
+        service.close()
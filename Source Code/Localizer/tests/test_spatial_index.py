@@ -0,0 +1,84 @@
+import pickle
+import random
+from types import SimpleNamespace
+import pytest
+import frame_diff
+from consts import SCREEN_BOUNDS
+from detectors import diff_engine_matches_legacy
+from frame_diff import FrameDiff
+from scenario import ScenarioContext
+from spatial_index import RectIndex
+from synthetic_scenarios import generate_scenario
+from utils import in_bounds_1, in_bounds_2, is_within_refreshed_area
+
+SCREEN_WIDTH, SCREEN_HEIGHT = SCREEN_BOUNDS[2], SCREEN_BOUNDS[3]
+
+
+def random_rect(rng: random.Random) -> tuple:
+    """A rectangle on the screen, partly or fully off the screen, or with its corners flipped"""
+    x1, y1 = rng.randint(-300, SCREEN_WIDTH + 300), rng.randint(-300, SCREEN_HEIGHT + 300)
+    x2, y2 = x1 + rng.choice([0, rng.randint(1, 100), rng.randint(1, SCREEN_WIDTH)]), y1 + rng.randint(0, 600)
+    choice = rng.random()
+    if choice < 0.15:
+        return x2, y2, x1, y1
+    if choice < 0.25:
+        return x2, y1, x1, y2
+    return x1, y1, x2, y2
+
+
+def random_point(rng: random.Random, rects: list) -> tuple:
+    """A point anywhere, or on a corner or edge of one of the rectangles"""
+    if rects and rng.random() < 0.5:
+        x1, y1, x2, y2 = rng.choice(rects)
+        return rng.choice([x1, x2, (x1 + x2) // 2]), rng.choice([y1, y2, (y1 + y2) // 2])
+    return rng.randint(-400, SCREEN_WIDTH + 400), rng.randint(-400, SCREEN_HEIGHT + 400)
+
+
+def describe_changes(changes) -> list:
+    return [[(node.identifier_group, node.a11yFocusedStatus, node.moving_direction) for node in category]
+            for category in changes]
+
+
+@pytest.mark.parametrize("columns, rows", [(16, 32), (3, 2), (1, 1)])
+@pytest.mark.parametrize("seed", range(5))
+def test_rect_index_matches_the_linear_helpers(seed, columns, rows):
+    rng = random.Random(seed)
+    for _ in range(10):
+        rects = [random_rect(rng) for _ in range(rng.choice([0, 1, 5, 50, 300]))]
+        # Areas may be recorded more than once
+        rects += rng.sample(rects, len(rects) // 4)
+        index = RectIndex(rects, columns, rows)
+        flat_areas = set(rects)
+        nested_areas = {((x1, y1), (x2, y2)) for x1, y1, x2, y2 in rects}
+        assert len(index) == len(flat_areas)
+
+        for _ in range(100):
+            query = rng.choice(rects) if rects and rng.random() < 0.2 else random_rect(rng)
+            x1, y1, x2, y2 = query
+            element = SimpleNamespace(bounds=((x1, y1), (x2, y2)))
+            expected = is_within_refreshed_area(element, flat_areas)
+            assert index.overlaps(*query) == is_within_refreshed_area(element, index) == expected
+            assert set(index.overlapping(*query)) == {rect for rect in flat_areas
+                                                      if is_within_refreshed_area(element, {rect})}
+            assert index.contains(*query) == any(rx1 <= x1 and ry1 <= y1 and x2 <= rx2 and y2 <= ry2
+                                                 for rx1, ry1, rx2, ry2 in flat_areas)
+
+            point = random_point(rng, rects)
+            assert index.contains_point(*point) == in_bounds_1(index, point) == in_bounds_1(flat_areas, point)
+            assert index.contains_point(*point, strict=True) == in_bounds_2(index, point) == \
+                   in_bounds_2(nested_areas, point)
+
+
+def test_frame_diff_finds_the_same_changes_through_the_index(tmp_path, monkeypatch):
+    for seed in range(3):
+        base_path = generate_scenario(str(tmp_path / f"scenario_{seed}"), node_count=400, event_count=100,
+                                      timeline_frames=3, seed=seed)
+        ctx = ScenarioContext.from_base_path(base_path)
+        expected = describe_changes(FrameDiff(pickle.loads(pickle.dumps(ctx))).classify())
+        assert any(expected)
+        monkeypatch.setattr(frame_diff, "INDEXED_REFRESHED_AREAS", 0)
+        changes = FrameDiff(ctx)
+        assert changes.refreshed_areas is None
+        assert describe_changes(changes.classify()) == expected
+        assert diff_engine_matches_legacy(ctx)
+        monkeypatch.undo()
@@ -0,0 +1,73 @@
+import random
+import re
+import xml.etree.ElementTree as ET
+import pytest
+from consts import BOUNDS_REGEX, SCREEN_BOUNDS
+from node import Node
+from synthetic_scenarios import generate_tree, write_dump
+from utils import stream_all_elements
+
+
+def load_all_elements_from_tree(path: str) -> list:
+    """Loads the on-screen elements of a dump from a fully built XML tree, the way the localizer did before it
+    streamed the dumps"""
+    root = ET.parse(path).getroot()
+    nodes = []
+    stack = [(child, None) for child in list(root)]
+    while stack:
+        element, parent = stack.pop()
+        node = Node(element)
+        node.parent = parent
+        nodes.append(node)
+        stack.extend([(child, node) for child in list(element)])
+
+    elements = []
+    screen_x1, screen_y1, screen_x2, screen_y2 = SCREEN_BOUNDS
+    for node in nodes:
+        node.is_ancestor_live_region = node.check_live_region_ancestors()
+        coords = [int(group) for group in re.match(BOUNDS_REGEX, node.bounds).groups()]
+        if any(i < 0 for i in coords):
+            continue
+        x1, y1, x2, y2 = coords
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        if not (screen_x1 <= x1 <= screen_x2 and screen_y1 <= y1 <= screen_y2 and
+                screen_x1 <= x2 <= screen_x2 and screen_y1 <= y2 <= screen_y2):
+            continue
+        node.bounds = ((x1, y1), (x2, y2))
+        elements.append(node)
+    return elements
+
+
+def scramble_bounds(rng: random.Random, root) -> None:
+    """Flips, negates or moves off-screen the bounds of some nodes, and marks some as live regions"""
+    for node in root.walk():
+        x1, y1, x2, y2 = node.bounds
+        choice = rng.random()
+        if choice < 0.1:
+            node.bounds = (x2, y2, x1, y1)
+        elif choice < 0.15:
+            node.bounds = (-x1 - 1, y1, x2, y2)
+        elif choice < 0.2:
+            node.bounds = (x1, y1, x2, SCREEN_BOUNDS[3] + 1 + y2)
+        if rng.random() < 0.05:
+            node.live_region = "1"
+
+
+def describe(node: Node) -> tuple:
+    parent = node.parent._raw_bounds if node.parent is not None else None
+    return node.identifier_group, node.bounds, node.size, node.is_ancestor_live_region, parent
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stream_all_elements_matches_tree_loader(tmp_path, seed):
+    rng = random.Random(seed)
+    root = generate_tree(rng, rng.randint(1, 400), rng.randint(1, 10))
+    scramble_bounds(rng, root)
+    path = str(tmp_path / "dump.xml")
+    write_dump(root, path)
+
+    expected = [describe(node) for node in load_all_elements_from_tree(path)]
+    assert [describe(node) for node in stream_all_elements(path)] == expected
+    with open(path, 'rb') as f:
+        assert [describe(node) for node in stream_all_elements(path, f.read())] == expected
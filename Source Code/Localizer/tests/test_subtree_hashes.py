@@ -0,0 +1,44 @@
+import pickle
+import scenario
+from detectors import diff_engine_matches_legacy
+from scenario import ScenarioContext
+from synthetic_scenarios import generate_scenario
+
+
+def test_diff_engine_skipping_shared_subtrees_matches_the_legacy_detectors(tmp_path):
+    for seed in range(4):
+        base_path = generate_scenario(str(tmp_path / f"scenario_{seed}"), node_count=400, event_count=50, seed=seed)
+        ctx = ScenarioContext.from_base_path(base_path)
+        assert not ctx.frames_unchanged()
+        assert diff_engine_matches_legacy(ctx)
+        # Frames loaded without their tree index are matched node by node
+        loaded = pickle.loads(pickle.dumps(ctx))
+        for frame in loaded.frames:
+            for node in frame:
+                node.tree = None
+        assert diff_engine_matches_legacy(loaded)
+
+
+def test_paths_are_built_on_first_use(tmp_path):
+    ctx = ScenarioContext.from_base_path(generate_scenario(str(tmp_path / "scenario"), node_count=200,
+                                                           event_count=20))
+    assert all(node._path is None for frame in ctx.frames for node in frame)
+    loaded = pickle.loads(pickle.dumps(ctx))
+    for frame, loaded_frame in zip(ctx.frames, loaded.frames):
+        for node, loaded_node in zip(frame, loaded_frame):
+            path = []
+            ancestor = node
+            while ancestor is not None:
+                path.insert(0, (ancestor.class_name, ancestor.resource_id, ancestor.index))
+                ancestor = ancestor.parent
+            assert node.path == loaded_node.path == tuple(path)
+
+
+def test_frames_with_the_same_hash_are_compared_before_the_scenario_is_skipped(tmp_path, monkeypatch):
+    ctx = ScenarioContext.from_base_path(generate_scenario(str(tmp_path / "scenario"), node_count=200,
+                                                           event_count=20))
+    # Every frame hash collides
+    monkeypatch.setattr(scenario, "frame_hash", lambda frame: 0)
+    assert not ctx.frames_unchanged()
+    ctx.target_element_middle = ctx.target_elements_2 = ctx.target_elements_1
+    assert ctx.frames_unchanged()
@@ -0,0 +1,55 @@
+import pickle
+from collections import Counter
+from frame_diff import FrameDiff, FrameKeys
+from scenario import ScenarioContext
+from synthetic_scenarios import generate_scenario
+
+
+def short_lived_by_full_scan(ctx) -> list:
+    """Short-lived elements found by comparing every node of each frame with all nodes of the frame before it"""
+    in_initial = {node.identifier_group_alternative for node in ctx.target_elements_1}
+    in_final = {node.identifier_group_alternative for node in ctx.target_elements_2}
+    reported = set()
+    short_lived = []
+    in_previous = in_initial
+    for frame in [ctx.target_element_middle, *ctx.intermediate_frames]:
+        found = [node for node in frame
+                 if node.identifier_group_alternative not in in_previous | in_initial | in_final | reported and
+                 node.parent.identifier_group_alternative in in_final]
+        found = FrameDiff(ctx)._in_refreshed_areas(found)
+        short_lived += found
+        reported.update(node.identifier_group_alternative for node in found)
+        in_previous = {node.identifier_group_alternative for node in frame}
+    return short_lived
+
+
+def test_timeline_diff_matches_a_full_scan_of_every_frame(tmp_path):
+    for seed in range(4):
+        base_path = generate_scenario(str(tmp_path / f"scenario_{seed}"), node_count=400, event_count=50,
+                                      timeline_frames=6, seed=seed)
+        ctx = ScenarioContext.from_base_path(base_path)
+        # Repeat a frame, which has nothing new to report
+        ctx.intermediate_frames.insert(2, ctx.intermediate_frames[1])
+        expected = short_lived_by_full_scan(ctx)
+        assert expected
+        assert FrameDiff(ctx).short_lived() == expected
+
+        frames = [FrameKeys(frame) for frame in ctx.frames]
+        assert all(frame.tree is not None for frame in frames)
+        for previous, frame in zip(frames, frames[1:]):
+            added, removed = frame.changes_since(previous)
+            # Only the changed subtrees are visited, and the frames differ by exactly the nodes visited
+            assert len(added) < len(frame.nodes) and [node for node in frame.nodes if node in added] == added
+            assert (Counter(node.identifier_group_alternative for node in previous.nodes + added) ==
+                    Counter(node.identifier_group_alternative for node in frame.nodes + removed))
+
+        # Cached frames keep their tree index, frames without one are matched node by node
+        loaded = pickle.loads(pickle.dumps(ctx))
+        assert loaded.target_elements_2[0].tree is not None
+        assert [node.identifier_group for node in FrameDiff(loaded).short_lived()] == \
+               [node.identifier_group for node in expected]
+        for frame in loaded.frames:
+            for node in frame:
+                node.tree = None
+        assert [node.identifier_group for node in FrameDiff(loaded).short_lived()] == \
+               [node.identifier_group for node in expected]
@@ -0,0 +1,58 @@
+import glob
+import os
+import watcher as watcher_module
+from synthetic_scenarios import generate_scenario
+from watcher import ScenarioWatcher
+
+
+def test_watcher_reports_scenarios_again_after_files_are_rewritten_in_place(tmp_path):
+    dataset = str(tmp_path / "dataset")
+    base_path = generate_scenario(f"{dataset}/app/scenario_0", node_count=50, event_count=20)
+    watcher = ScenarioWatcher(dataset, settle_seconds=2)
+    assert watcher.poll(now=0) == []
+    assert watcher.poll(now=1) == []
+    assert watcher.poll(now=2) == [base_path]
+    assert watcher.poll(now=10) == []
+
+    folder = os.path.dirname(base_path)
+    folder_mtime = os.stat(folder).st_mtime_ns
+    dump = glob.glob(f"{folder}/*.3-a11y.xml")[0]
+    with open(dump, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(b"\n")
+    stat = os.stat(dump)
+    os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert os.stat(folder).st_mtime_ns == folder_mtime
+
+    assert watcher.poll(now=11) == []
+    assert watcher.poll(now=13) == [base_path]
+    assert watcher.poll(now=20) == []
+
+
+def test_watcher_only_stats_the_files_of_older_scenarios_every_recheck_interval(tmp_path, monkeypatch):
+    dataset = str(tmp_path / "dataset")
+    old, new = [generate_scenario(f"{dataset}/app/scenario_{i}", node_count=50, event_count=20, seed=i)
+                for i in range(2)]
+    watcher = ScenarioWatcher(dataset, settle_seconds=2, recheck_seconds=60)
+    # Analyzed by the run before watching started
+    watcher.mark_done(old)
+    assert watcher.poll(now=0) == []
+    assert watcher.poll(now=2) == [new]
+
+    stat_calls = []
+    file_stat = watcher_module.file_stat
+    monkeypatch.setattr(watcher_module, "file_stat", lambda path: stat_calls.append(path) or file_stat(path))
+    assert watcher.poll(now=3) == []
+    # Only the files of the scenario reported within the last minute
+    assert sorted(stat_calls) == sorted(watcher.done[new])
+
+    dump = glob.glob(f"{os.path.dirname(old)}/*.3-a11y.xml")[0]
+    with open(dump, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(b"\n")
+    stat = os.stat(dump)
+    os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert watcher.poll(now=10) == []
+    assert old not in watcher.pending
+    assert watcher.poll(now=60) == []
+    assert watcher.poll(now=62) == [old]
@@ -0,0 +1,171 @@
+class TreeIndex:
+    """Index over all nodes of one XML dump, built while the dump is traversed.
+
+    Positions are given in the order nodes are opened, so the subtree of the node at position p is the contiguous
+    pre-order interval [p, end[p]). Together with the post-order numbers this answers ancestor/descendant questions
+    in O(1). Flags inherited from ancestors are computed top-down when a node is opened, subtree hashes bottom-up
+    when it is closed."""
+    def __init__(self):
+        self.nodes = []
+        self.parent = []
+        self.children = []
+        self.roots = []
+        self.depth = []
+        self.end = []
+        self.post = []
+        self.ancestor_live_region = []
+        self.subtree_hash = []
+        # Whether the node at each position is in the frame, set by the loader once the bounds are filtered
+        self.kept = []
+        self._post_counter = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def open(self, node, parent_position: int = -1) -> int:
+        """Adds a node whose parent has already been opened and returns its position"""
+        position = len(self.nodes)
+        self.nodes.append(node)
+        self.parent.append(parent_position)
+        self.children.append([])
+        self.end.append(-1)
+        self.post.append(-1)
+        self.subtree_hash.append(None)
+        if parent_position < 0:
+            self.roots.append(position)
+            self.depth.append(0)
+            self.ancestor_live_region.append(False)
+        else:
+            self.children[parent_position].append(position)
+            self.depth.append(self.depth[parent_position] + 1)
+            parent_node = self.nodes[parent_position]
+            self.ancestor_live_region.append(parent_node.liveRegion != "0" or
+                                             self.ancestor_live_region[parent_position])
+        node.tree = self
+        node.tree_position = position
+        return position
+
+    def close(self, position: int) -> None:
+        """Marks the end of a node's subtree, after all of its descendants have been opened and closed, and hashes
+        the subtree bottom-up from the hashes of its children.
+
+        Children are hashed in sorted order, so the hash does not depend on the order the loaders open them in. Their
+        bounds and index attributes tell siblings apart"""
+        self.end[position] = len(self.nodes)
+        self.post[position] = self._post_counter
+        self._post_counter += 1
+        node = self.nodes[position]
+        children = self.children[position]
+        if children:
+            subtree_hashes = self.subtree_hash
+            node.subtree_hash = hash((node.content_hash, tuple(sorted([subtree_hashes[child]
+                                                                      for child in children]))))
+        else:
+            node.subtree_hash = node.content_hash
+        self.subtree_hash[position] = node.subtree_hash
+
+    def is_ancestor(self, ancestor: int, descendant: int) -> bool:
+        return ancestor < descendant < self.end[ancestor]
+
+    def is_descendant(self, descendant: int, ancestor: int) -> bool:
+        return self.is_ancestor(ancestor, descendant)
+
+    def subtree(self, position: int) -> list:
+        """Returns the node at the given position and all of its descendants"""
+        return self.nodes[position:self.end[position]]
+
+    def diff(self, previous: 'TreeIndex') -> tuple:
+        """Returns the nodes of the frame that are not in a subtree the previous tree has too, in frame order, and the
+        nodes of the previous frame that are not in a subtree this tree has too.
+
+        The children of a node are matched with the children of its counterpart in the previous tree by subtree hash,
+        and only the unmatched ones are visited, so the cost grows with the number of changed nodes. Unmatched
+        children with the same class, resource id and index are visited as counterparts"""
+        added = []
+        removed = []
+        # The frame is the kept nodes in the order of a depth-first traversal that visits the last child first
+        stack = []
+        self._match_children(self.roots, previous, previous.roots, stack, removed)
+        while stack:
+            position, previous_position = stack.pop()
+            if self.kept[position]:
+                added.append(self.nodes[position])
+            if previous_position < 0:
+                stack.extend((child, -1) for child in self.children[position])
+                continue
+            if previous.kept[previous_position]:
+                removed.append(previous.nodes[previous_position])
+            self._match_children(self.children[position], previous, previous.children[previous_position], stack,
+                                 removed)
+        return added, removed
+
+    def _match_children(self, children: list, previous: 'TreeIndex', previous_children: list, stack: list,
+                        removed: list) -> None:
+        """Pushes the children that are not matched with a child of the previous tree by subtree hash, each with its
+        counterpart if any, and adds the nodes of the previous children left without one to removed"""
+        hashes = self.subtree_hash
+        previous_hashes = previous.subtree_hash
+        nodes = self.nodes
+        previous_nodes = previous.nodes
+        # [child, counterpart] of the changed children in their order. Children are first matched with the child of
+        # the previous tree at the same place, which is the common case when content changes in place
+        visits = []
+        unpaired = []
+        left = []
+        for child, previous_child in zip(children, previous_children):
+            if hashes[child] == previous_hashes[previous_child]:
+                continue
+            node = nodes[child]
+            previous_node = previous_nodes[previous_child]
+            if (node.class_name == previous_node.class_name and node.resource_id == previous_node.resource_id and
+                    node.index == previous_node.index):
+                visits.append([child, previous_child])
+            else:
+                visit = [child, -1]
+                visits.append(visit)
+                unpaired.append(visit)
+                left.append(previous_child)
+        for child in children[len(previous_children):]:
+            visit = [child, -1]
+            visits.append(visit)
+            unpaired.append(visit)
+        left.extend(previous_children[len(children):])
+        if unpaired and left:
+            # Children were inserted, removed or reordered, so the others are matched by subtree hash wherever they
+            # are, or else by class, resource id and index
+            by_hash = dict()
+            for previous_child in left:
+                by_hash.setdefault(previous_hashes[previous_child], []).append(previous_child)
+            by_key = dict()
+            for visit in unpaired:
+                same = by_hash.get(hashes[visit[0]])
+                if same:
+                    same.pop()
+                    visit[1] = None
+            for group in by_hash.values():
+                for previous_child in group:
+                    node = previous_nodes[previous_child]
+                    by_key.setdefault((node.class_name, node.resource_id, node.index), []).append(previous_child)
+            for visit in unpaired:
+                if visit[1] is None:
+                    continue
+                node = nodes[visit[0]]
+                candidates = by_key.get((node.class_name, node.resource_id, node.index))
+                if candidates:
+                    visit[1] = candidates.pop()
+            left = [previous_child for group in by_key.values() for previous_child in group]
+        stack.extend((child, counterpart) for child, counterpart in visits if counterpart is not None)
+        # Subtrees of the previous tree without a counterpart are removed whole
+        previous_kept = previous.kept
+        for previous_child in left:
+            removed.extend(previous_nodes[position] for position in range(previous_child, previous.end[previous_child])
+                           if previous_kept[position])
+
+    def ancestors(self, position: int) -> list:
+        """Returns the ancestors of the node at the given position, nearest first"""
+        result = []
+        position = self.parent[position]
+        while position >= 0:
+            result.append(self.nodes[position])
+            position = self.parent[position]
+        return result
@@ -1,22 +1,37 @@
 import glob
-import hashlib
+from bisect import bisect_left
+import io
+import mmap
 import xml.etree.ElementTree as ET
 import re
 from typing import List
 from collections import Counter
 import os
-import chardet
-from consts import BOUNDS_REGEX, SCREEN_BOUNDS, BOTTOM_NAV_BAR_BOUNDS, TOP_NAV_BAR_BOUNDS
+import numpy as np
+from consts import BOUNDS_REGEX, BOTTOM_NAV_BAR_BOUNDS, TOP_NAV_BAR_BOUNDS, TIMELINE_DUMP_PATTERN, \
+    TIMELINE_DUMP_REGEX
 from node import Node, A11yFocusedStatus
+from event_log import parse_event_log
+from tree_index import TreeIndex
+from spatial_index import RectIndex
+import geometry
+from instrumentation import span
 from GUI_utils import *
 
+BOUNDS_PATTERN = re.compile(BOUNDS_REGEX)
+
+
+def a11y_focus_pivot(last_focused_bounds, accessibility_focuses, last_clicked_bounds="Bounds not found."):
+    """Returns the y coordinate that splits elements into BEFORE and AFTER the accessibility focus"""
+    if last_clicked_bounds != "Bounds not found.":
+        return last_clicked_bounds[1]
+    if last_focused_bounds == "Bounds not found.":
+        return max((i[0][1] for i in accessibility_focuses), default=float('inf'))
+    return last_focused_bounds[1]
 
 def define_a11y_focus(elements: List[Node], last_focused_bounds: str, accessibility_focuses) -> None:
     # Adjust accessibility focus status based on vertical position relative to the minimum focus.
-    if last_focused_bounds == "Bounds not found.":
-        pivot_y = max((i[0][1] for i in accessibility_focuses), default=float('inf'))
-    else:
-        _, pivot_y, _, _ = last_focused_bounds
+    pivot_y = a11y_focus_pivot(last_focused_bounds, accessibility_focuses)
     for element in elements:
         # Decide based on the top edge of the element
         (_, y1), (_, y2) = element.bounds
@@ -28,12 +43,7 @@ def define_a11y_focus(elements: List[Node], last_focused_bounds: str, accessibil
             element.a11yFocusedStatus = A11yFocusedStatus.AFTER
 
 def define_a11y_focus_appearing_disappearing(elements: List[Node], last_focused_bounds: str, accessibility_focuses, last_clicked_bounds) -> None:
-    if last_focused_bounds == "Bounds not found.":
-        pivot_y = max((i[0][1] for i in accessibility_focuses), default=float('inf'))
-    else:
-        _, pivot_y, _, _ = last_focused_bounds
-    if last_clicked_bounds != "Bounds not found.":
-        _, pivot_y, _, _ = last_clicked_bounds
+    pivot_y = a11y_focus_pivot(last_focused_bounds, accessibility_focuses, last_clicked_bounds)
     for element in elements:
         # Extract the top-left and bottom-right y-coordinates of the element
         (_, y1), (_, y2) = element.bounds
@@ -57,6 +67,8 @@ def is_within_refreshed_area(element, refreshed_areas):
     # Check if any corner of the element's bounds is within any refreshed area.
     # Adjusted to correctly unpack element.bounds
     (ex1, ey1), (ex2, ey2) = element.bounds  # Correct unpacking based on provided structure
+    if isinstance(refreshed_areas, RectIndex):
+        return refreshed_areas.overlaps(ex1, ey1, ex2, ey2)
     for rx1, ry1, rx2, ry2 in refreshed_areas:
         # Check if the element overlaps any refreshed area
         if not (ex2 < rx1 or ex1 > rx2 or ey2 < ry1 or ey1 > ry2):
@@ -76,29 +88,70 @@ def is_within_nav_bars(element_bounds):
 
 def filter_contained_elements(moving_elements):
     """Filter out elements that act as containers for other elements based solely on bounds."""
-
-    # Helper function to determine if one element's bounds are within another's
-    def is_container(container_bounds, child_bounds):
-        return (container_bounds[0][0] < child_bounds[0][0] and
-                container_bounds[0][1] < child_bounds[0][1] and
-                container_bounds[1][0] > child_bounds[1][0] and
-                container_bounds[1][1] > child_bounds[1][1])
-
-    # Determine containers by comparing bounds of all elements
-    containers = set()
-    for i, element in enumerate(moving_elements):
-        for j, other_element in enumerate(moving_elements):
-            if i != j and is_container(element.bounds, other_element.bounds):
-                containers.add(i)  # Mark the index of the container element
+    containers = find_containers([element.bounds for element in moving_elements])
 
     # Filter out the containers, keeping elements not identified as containers
     filtered_elements = [element for index, element in enumerate(moving_elements) if index not in containers]
 
     return filtered_elements
 
-    # Helper function to compare and mark moving elements
 
-    # Helper function to compare and mark moving elements
+def find_containers(bounds_list) -> set:
+    """Returns the indices of the bounds that strictly contain at least one of the other bounds.
+
+    A container has a smaller left edge, smaller top edge, larger right edge and larger bottom edge than its child.
+    Bounds are sorted by left edge and split in halves of distinct left edges. Every element of the half with the
+    larger left edges is a candidate child for the other half. The top edge is handled by a sweep, and a Fenwick tree
+    over right edges holds the smallest bottom edge seen so far. This runs in O(n log^2 n) instead of comparing all
+    pairs."""
+    n = len(bounds_list)
+    containers = set()
+    if n < 2:
+        return containers
+    order = sorted(range(n), key=lambda i: -bounds_list[i][0][0])
+    group_starts = [position for position in range(n)
+                    if position == 0 or bounds_list[order[position]][0][0] != bounds_list[order[position - 1]][0][0]]
+    group_starts.append(n)
+    right_edges = sorted({bounds[1][0] for bounds in bounds_list})
+    infinity = float('inf')
+    tree = [infinity] * (len(right_edges) + 1)
+
+    def solve(first_group, last_group):
+        if last_group - first_group <= 1:
+            return
+        middle_group = (first_group + last_group) // 2
+        solve(first_group, middle_group)
+        solve(middle_group, last_group)
+        start, middle, end = group_starts[first_group], group_starts[middle_group], group_starts[last_group]
+        # Candidate children come from [start, middle), candidate containers from [middle, end). Sweep by top edge
+        # from the bottom, letting containers query before children with the same top edge are added
+        sweep = sorted(range(start, end), key=lambda position: (-bounds_list[order[position]][0][1], position < middle))
+        touched = []
+        for position in sweep:
+            (_, _), (x2, y2) = bounds_list[order[position]]
+            rank = bisect_left(right_edges, x2)
+            if position < middle:
+                rank += 1
+                touched.append(rank)
+                while rank < len(tree):
+                    if y2 < tree[rank]:
+                        tree[rank] = y2
+                    rank += rank & -rank
+            elif order[position] not in containers:
+                smallest_bottom = infinity
+                while rank > 0:
+                    if tree[rank] < smallest_bottom:
+                        smallest_bottom = tree[rank]
+                    rank -= rank & -rank
+                if smallest_bottom < y2:
+                    containers.add(order[position])
+        for rank in touched:
+            while rank < len(tree) and tree[rank] != infinity:
+                tree[rank] = infinity
+                rank += rank & -rank
+
+    solve(0, len(group_starts) - 1)
+    return containers
 
 def filter_elements(elements_1, elements_2):
     resource_ids = {e.resource_id for e in elements_2}
@@ -109,32 +162,36 @@ def filter_elements(elements_1, elements_2):
     return filtered_elements
 
 def hash_nodes(nodes):
-    hashed = {}
-    nodes_by_resource_id = {}
-    duplicate_resource_ids = set()  # Track duplicate resource IDs
+    """Returns the attribute hashes and the nodes of a frame by key. The key of a node is its resource id when no
+    other node has it, and (resource id, path) for nodes sharing a resource id, e.g. the items of a list. Nodes
+    without a resource id, or with the same resource id and path as another node, are left out"""
+    by_resource_id = {}
     for node in nodes:
-        resource_id = node.resource_id
-        if resource_id:
-            if resource_id not in hashed and resource_id not in duplicate_resource_ids:
-                hashed[resource_id] = hash_node_attributes(node)
-                nodes_by_resource_id[resource_id] = node
-            else:
-                # Mark as duplicate and remove if previously added
-                duplicate_resource_ids.add(resource_id)
-                if resource_id in hashed:
-                    del hashed[resource_id]
-                    del nodes_by_resource_id[resource_id]
-    return hashed, nodes_by_resource_id
+        if node.resource_id:
+            by_resource_id.setdefault(node.resource_id, []).append(node)
+    hashed = {}
+    nodes_by_key = {}
+    for resource_id, group in by_resource_id.items():
+        if len(group) == 1:
+            hashed[resource_id] = hash_node_attributes(group[0])
+            nodes_by_key[resource_id] = group[0]
+            continue
+        keys = [(resource_id, node.path) for node in group]
+        key_counts = Counter(keys)
+        for key, node in zip(keys, group):
+            if key_counts[key] == 1:
+                hashed[key] = hash_node_attributes(node)
+                nodes_by_key[key] = node
+    return hashed, nodes_by_key
 
 def hash_node_attributes(node: Node):
-    # Concatenate the string representations of the specified attributes
-    attributes_str = f"{node.text}{node.content_description}{node.class_name}{node.visible}{node.clickable}{node.important_for_accessibility}{node.enabled}{node.checked}{node.selected}"
+    # Hashed on first use
+    return node.attributes_hash
 
-    # Use hashlib's sha256 function to create a hash object
-    hash_object = hashlib.sha256(attributes_str.encode())
 
-    # Return the hexadecimal representation of the digest
-    return hash_object.hexdigest()
+def frame_hash(nodes) -> int:
+    """Hash of a frame from the subtree hashes of its nodes. Frames with the same hash hold the same nodes"""
+    return hash(tuple(node.subtree_hash for node in nodes))
 
 
 def nodes_to_important_attrs_list(nodes: List[Node], is_moving=False):
@@ -166,321 +223,153 @@ def filter_moving_nodes(nodes):
     return [node for node in nodes if node.a11yFocusedStatus == A11yFocusedStatus.BEFORE]
 
 
-def filter_short_lived_nodes(nodes, excluded_nodes):
-    filtered_nodes = [node for node in nodes if node.clickable == 'true' or (
-                node.liveRegion == '0' and not node.is_ancestor_live_region and node.important_for_accessibility == 'true' and node.visible == 'true')]
-    return [node for node in filtered_nodes if node not in excluded_nodes]
+def is_short_lived_candidate(node):
+    return node.clickable == 'true' or (
+                node.liveRegion == '0' and not node.is_ancestor_live_region and node.important_for_accessibility == 'true' and node.visible == 'true')
 
 
-def filter_disappearing_nodes(nodes, excluded_nodes, additional_nodes, target_elements):
-    nodes = [node for node in nodes if node not in excluded_nodes and node.visible == 'true' and (
-                node.important_for_accessibility == 'true' or node.focusable == 'true' or node.text != "" or node.content_description != "")]
-    if additional_nodes:
-        nodes = filter_elements(nodes, additional_nodes)
-    return filter_nodes_based_on_target_elements(nodes, target_elements)
+def is_appearing_disappearing_candidate(node):
+    return node.visible == 'true' and (
+                node.important_for_accessibility == 'true' or node.focusable == 'true' or node.text != "" or node.content_description != "")
 
 
-def filter_appearing_nodes(nodes, excluded_nodes, additional_nodes, target_elements):
-    nodes = [node for node in nodes if node not in excluded_nodes and node.visible == 'true' and (
-                node.important_for_accessibility == 'true' or node.focusable == 'true' or node.text != "" or node.content_description != "")]
-    if additional_nodes:
-        nodes = filter_elements(nodes, additional_nodes)
-    return filter_nodes_based_on_target_elements(nodes, target_elements, before_focus=True)
+class TargetIndex:
+    """Hash lookups of the attributes of a target frame that the filters compare nodes with, built once per frame"""
+    def __init__(self, target_elements):
+        resource_id_counts = Counter(element.resource_id for element in target_elements)
+        self.unique_resource_ids = {resource_id for resource_id, count in resource_id_counts.items() if count == 1}
+        self.texts = {element.text for element in target_elements if element.text != ""}
+        self.content_descriptions = {element.content_description for element in target_elements if
+                                     element.content_description != ""}
 
+    def keeps(self, node, focus_status) -> bool:
+        """Whether the filters keep a node: it has the given focus status, is not a live region and shares neither a
+        unique resource id, a text nor a content description with the target frame"""
+        return (node.a11yFocusedStatus == focus_status and node.liveRegion == '0' and
+                node.resource_id not in self.unique_resource_ids and node.text not in self.texts and
+                node.content_description not in self.content_descriptions)
 
-def filter_nodes_based_on_target_elements(nodes, target_elements, before_focus=False):
-    resource_id_counts = Counter(element.resource_id for element in target_elements)
-    unique_resource_ids = {resource_id for resource_id, count in resource_id_counts.items() if count == 1}
-    text_list = [element.text for element in target_elements if element.text != ""]
-    content_description_list = [element.content_description for element in target_elements if
-                                element.content_description != ""]
 
-    focus_status_check = (lambda node: node.a11yFocusedStatus == A11yFocusedStatus.BEFORE) if before_focus else (
-        lambda node: node.a11yFocusedStatus == A11yFocusedStatus.AFTER)
-
-    return [node for node in nodes if
-            focus_status_check(node) and node.liveRegion == '0' and node.resource_id not in unique_resource_ids and (
-                        node.text not in text_list) and (node.content_description not in content_description_list)]
+def filter_appearing_disappearing_nodes(nodes, excluded_ids: set, additional_nodes, target_index: TargetIndex,
+                                        focus_status):
+    """Appearing or disappearing nodes that are not excluded, given by their id(), nor among the additional nodes
+    and that the index of the target frame keeps"""
+    nodes = [node for node in nodes if id(node) not in excluded_ids and is_appearing_disappearing_candidate(node)]
+    if additional_nodes:
+        nodes = filter_elements(nodes, additional_nodes)
+    return [node for node in nodes if target_index.keeps(node, focus_status)]
 
 
 def get_problematic_dynamic_content_changes(attributes_changed_nodes, moving_nodes, short_lived_nodes,
                                             disappearing_nodes, appearing_nodes, target_elements_1, target_elements_2):
+    """Filters the dynamic content changes of a scenario down to the problematic ones.
+
+    Excluded nodes are looked up by identity in sets of their id() and the attributes of each target frame in a
+    TargetIndex, instead of scanning lists for every node."""
     attributes_changed_nodes = filter_attributes_changed_nodes(attributes_changed_nodes)
     attributes_changed_nodes = filter_nodes_by_resource_id(attributes_changed_nodes)
 
     moving_nodes = filter_moving_nodes(moving_nodes)
 
-    short_lived_nodes = filter_short_lived_nodes(short_lived_nodes, attributes_changed_nodes)
+    attributes_changed_ids = {id(node) for node in attributes_changed_nodes}
+    short_lived_nodes = [node for node in short_lived_nodes
+                         if is_short_lived_candidate(node) and id(node) not in attributes_changed_ids]
 
-    disappearing_nodes = filter_disappearing_nodes(disappearing_nodes, moving_nodes + short_lived_nodes,
-                                                   appearing_nodes, target_elements_2)
-
-    appearing_nodes = filter_appearing_nodes(appearing_nodes, moving_nodes + short_lived_nodes, disappearing_nodes,
-                                             target_elements_1)
+    excluded_ids = {id(node) for node in moving_nodes}
+    excluded_ids.update(id(node) for node in short_lived_nodes)
+    disappearing_nodes = filter_appearing_disappearing_nodes(disappearing_nodes, excluded_ids, appearing_nodes,
+                                                             TargetIndex(target_elements_2), A11yFocusedStatus.AFTER)
+    appearing_nodes = filter_appearing_disappearing_nodes(appearing_nodes, excluded_ids, disappearing_nodes,
+                                                          TargetIndex(target_elements_1), A11yFocusedStatus.BEFORE)
 
     return attributes_changed_nodes, moving_nodes, short_lived_nodes, disappearing_nodes, appearing_nodes
 
-def load_xml(path: str):
-    try:
-        tree = ET.parse(path)
-        nodes = []
-        root = tree.getroot()
-        # Initialize the stack with the children of the root node and None as their parent
-        stack = [(child, None) for child in list(root)]
-        while stack:
-            element, parent_node = stack.pop()
-            current_node = Node(element)
-            if parent_node != None:
-                current_node.parent = parent_node
-            nodes.append(current_node)
-            # Extend the stack with the children of the current element and the current node as their parent
-            stack.extend([(child, current_node) for child in list(element)])
-    except Exception as e:
-        print(f"Error: Failed to load the XML file {path}.")
-        print(e)
-        return []
-    for node in nodes:
-        node.is_ancestor_live_region = node.check_live_region_ancestors()
-    return nodes
-
-# Functions for loading the event log
-def load_event_log(path: str):
-    line_regex = r'(\d{2}-\d{2}) (\d{2}:\d{2}:\d{2}.\d{3}).*EventType: (\S*);.*EventTime: (\d*);.*boundsInScreen: ([^;]*);'
-    rect_regex = r'Rect\((\d+), (\d+) - (\d+). (\d+)\)'
-    with open(path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    events = []
-    for line in lines:
-        # If the line matches the regex, add all captured groups to the event list as a tuple
-        match = re.match(line_regex, line)
-        if match:
-            elems = list(match.groups())
-            rect = elems[-1]
-            match_rect = re.match(rect_regex, rect)
-            if match_rect:
-                elems[-1] = tuple([int(i) for i in match_rect.groups()])
-                events.append(elems + [line])
-    return events
-
-
-def load_all_events(path: str):
-    ev_regex = r'EventType: (\S*);'
-    rect_regex = r'Rect\((\d+), (\d+) - (\d+). (\d+)\)'
-
-    with open(path, 'rb') as file:
-        raw_data = file.read()
-
-    # Detect the encoding
-    detected = chardet.detect(raw_data)
-    encoding = detected['encoding']
-
-    try:
-        with open(path, 'r', encoding = encoding) as f:
-            lines = f.readlines()
-    except UnicodeDecodeError:
-        print(f"Error: Failed to decode the file {path} with encoding {encoding}.")
-
-    events = []
-    for line in lines:
-        match = re.search(ev_regex, line)
-        if match != None:
-            ev_type = match.groups(1)[0]
-            if ev_type == 'TYPE_WINDOW_CONTENT_CHANGED':
-                match_rect = re.search(rect_regex, line)
-                if match_rect:
-                    coords = tuple([int(i) for i in match_rect.groups()])
-                    events.append((ev_type, coords))
-                else:
-                    events.append((ev_type, None))
-            else:
-                events.append((ev_type, None))
-
-    return events  # List of event types
 
 def in_bound(bound: tuple, coord: tuple):
     return bound[0][0] < coord[0] < bound[1][0] and bound[0][1] < coord[1] < bound[1][1]
 
 
-def analyze_events_scroll_click(file_path: str) -> bool:
-    # Define possible immediate follow-ups for each event of interest
-    # (i.e., events that might occur immediately after the event of interest)
-    follow_up_events_scroll = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOW_CONTENT_CHANGED"}
-    follow_up_events_click = {"TYPE_WINDOW_STATE_CHANGED", "TYPE_WINDOWS_CHANGED"}
-
-    # Initialize booleans for scrolling and clicking
-    is_scrolling_new_content = False
-    is_click_new_window = False
-
-    # Helper function to parse scroll details from a line
-    def parse_scroll_details(line):
-        details = {}
-        parts = line.split(";")
-        for part in parts:
-            if ":" in part:
-                key_value = part.split(":", 1)  # Split on first colon only
-                if len(key_value) == 2:
-                    key, value = key_value
-                    key = key.strip()
-                    value = value.strip()
-                    # Try converting numeric values
-                    if key in ['ScrollDeltaX', 'ScrollDeltaY', 'FromIndex', 'ToIndex']:
-                        try:
-                            details[key] = int(value.split(" ")[0])  # Assuming value might end with units or additional info
-                        except ValueError:
-                            pass
-        return details
-
-    # Helper function to check if a real scroll occurred
-    def did_scroll_occur(scroll_details):
-        scroll_delta_x = scroll_details.get('ScrollDeltaX', 0)
-        scroll_delta_y = scroll_details.get('ScrollDeltaY', 0)
-        from_index = scroll_details.get('FromIndex', -1)
-        to_index = scroll_details.get('ToIndex', -1)
-
-        return scroll_delta_x != 0 or scroll_delta_y != 0
-
-    last_event_type = None
-    last_scroll_details = {}
-
-    try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                if "EventType: TYPE_VIEW_SCROLLED" in line:
-                    last_event_type = "TYPE_VIEW_SCROLLED"
-                    last_scroll_details = parse_scroll_details(line)
-                elif "EventType: TYPE_VIEW_CLICKED" in line:
-                    last_event_type = "TYPE_VIEW_CLICKED"
-                elif "EventType:" in line:
-                    current_event_type = line.split("EventType:")[1].split(";")[0].strip()
-                    if last_event_type == "TYPE_VIEW_SCROLLED" and current_event_type in follow_up_events_scroll:
-                        if did_scroll_occur(last_scroll_details):
-                            is_scrolling_new_content = True
-                    # elif last_event_type == "TYPE_VIEW_CLICKED" and (current_event_type in follow_up_events_click or (current_event_type == "TYPE_WINDOW_CONTENT_CHANGED" and "CONTENT_CHANGE_TYPE_SUBTREE" in line)):
-                    elif last_event_type == "TYPE_VIEW_CLICKED" and (current_event_type in follow_up_events_click):
-                        is_click_new_window = True
-                    # Update last_event_type if it's not a follow-up event we are interested in
-                    if "TYPE_VIEW_" not in current_event_type and last_event_type != "TYPE_VIEW_CLICKED":
-                        last_event_type = None
-    except Exception as e:
-        print(f"Error: Failed to read the file {file_path}.")
-        print(e)
-
-    # If no matching pattern is found in the file, return False
-    return is_scrolling_new_content, is_click_new_window
-
-def load_all_elements(file: str) -> list:
+def load_all_elements(file: str, data: bytes = None) -> list:
     # Processing XML dump of the UI hierarchy
-    target_elements = load_xml(file)
-
-    temp_elements = []
-    for e in target_elements:
-        temp_box = e.bounds
-        match = re.match(BOUNDS_REGEX, temp_box)
-        if not match:
-            raise Exception(f"Bounds regex did not match: {temp_box}")
-        altered_match = [int(match.group(i)) for i in range(1, 5)]
-        if True in [i < 0 for i in altered_match]:
-            continue
-        if altered_match[3] < altered_match[1]:
-            temp = altered_match[3]
-            altered_match[3] = altered_match[1]
-            altered_match[1] = temp
-        if altered_match[2] < altered_match[0]:
-            temp = altered_match[2]
-            altered_match[2] = altered_match[0]
-            altered_match[0] = temp
-        # if not (in_bounds_1(set([screen_bounds]), (altered_match[0], altered_match[1])) and in_bounds_1(set([screen_bounds]), (altered_match[2], altered_match[3]))):
-        #     continue
-        if not in_bounds_1(set([SCREEN_BOUNDS]), (altered_match[0], altered_match[1])) or not in_bounds_1(
-                set([SCREEN_BOUNDS]), (altered_match[2], altered_match[3])):
-            continue
-        coords = ((altered_match[0], altered_match[1]), (altered_match[2], altered_match[3]))
-        e.bounds = coords
-        temp_elements.append(e)
-
-
-    return temp_elements
-
-
-def check_event(path: str, events: list) -> bool:
-    try:
-        with open(path, 'r') as f:
-            lines = f.readlines()
-        for line in lines:
-            for ev in events:
-                if ev in line:
-                    return True
-    except Exception as e:
-        print(f"Error: Failed to read the file {path}.")
-        print(e)
-        return False
-    return False
-
+    return stream_all_elements(file, data)
 
 
+def _open_dump(file: str, data: bytes = None):
+    if data is not None:
+        return io.BytesIO(data)
+    with open(file, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 
+def stream_all_elements(file: str, data: bytes = None) -> list:
+    """Loads the on-screen elements of an XML dump in one streaming pass over the memory-mapped file, or over data if
+    the dump was already read.
 
-
-def extract_bounds_of_last_focused_element(file_path):
-    last_focused_element_bounds = None
-    last_focused_element_info = None
-    last_clicked_element_info = None
-    last_clicked_element_bounds = None
+    Bounds are parsed while parsing and every XML element is released once its node is created. The bounds of all
+    nodes are then flipped and filtered at once. Nodes with negative or off-screen bounds are left out, the others
+    are returned in the order of a depth-first traversal that visits the last child first."""
+    tree_index = TreeIndex()
+    # Raw x1, y1, x2, y2 of every node, negative when the bounds did not parse so the node is dropped
+    all_coords = []
+    bad_bounds = None
     try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                if 'EventType: TYPE_VIEW_ACCESSIBILITY_FOCUSED' in line:
-                    # Capture the line for further processing
-                    last_focused_element_info = line
-                if 'EventType: TYPE_VIEW_CLICKED' in line:
-                    # Capture the line for further processing
-                    last_clicked_element_info = line
+        with _open_dump(file, data) as dump:
+            open_nodes = []
+            root = None
+            for event, element in ET.iterparse(dump, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                        continue
+                    bounds = element.attrib.get('bounds', '')
+                    match = BOUNDS_PATTERN.match(bounds)
+                    coords = None
+                    if match:
+                        coords = [int(match.group(i)) for i in range(1, 5)]
+                    elif bad_bounds is None:
+                        bad_bounds = bounds
+                    current_node = Node(element, coords)
+                    parent_position = -1
+                    if open_nodes:
+                        parent_position = open_nodes[-1]
+                        current_node.parent = tree_index.nodes[parent_position]
+                    all_coords.append(coords or (-1, -1, -1, -1))
+                    open_nodes.append(tree_index.open(current_node, parent_position))
+                elif element is not root:
+                    tree_index.close(open_nodes.pop())
+                    element.clear()
+            if root is not None:
+                root.clear()
     except Exception as e:
-        print(f"Error: Failed to read the file {file_path}.")
+        print(f"Error: Failed to load the XML file {file}.")
         print(e)
+        return []
+    if bad_bounds is not None:
+        raise Exception(f"Bounds regex did not match: {bad_bounds}")
 
-    # Now, extract the bounds from the last focused element info
-    if last_focused_element_info:
-        # Find the part of the line that contains "boundsInScreen"
-        start = last_focused_element_info.find('boundsInScreen: Rect(')
-        if start != -1:
-            # Extract the substring containing the bounds
-            end = last_focused_element_info.find(')', start) + 1
-            bounds_str = last_focused_element_info[start:end]
-            # Extract just the numbers from the bounds string
-            bounds = convert_to_tuple(bounds_str)
-            last_focused_element_bounds = bounds
-
-    if last_clicked_element_info:
-        start = last_clicked_element_info.find('boundsInScreen: Rect(')
-        if start != -1:
-            end = last_clicked_element_info.find(')', start) + 1
-            bounds_str = last_clicked_element_info[start:end]
-            bounds = convert_to_tuple(bounds_str)
-            last_clicked_element_bounds = bounds
-
-    if not last_focused_element_bounds:
-        last_focused_element_bounds = "Bounds not found."
-
-    if not last_clicked_element_bounds:
-        last_clicked_element_bounds = "Bounds not found."
-
-
-    return last_focused_element_bounds, last_clicked_element_bounds
-def convert_to_tuple(bounds_str):
-    # Extract the substring that contains the numbers
-    start_index = bounds_str.find('Rect(') + len('Rect(')
-    numbers_str = bounds_str[start_index:-1]
-    # Use regular expression to find all numbers, including negatives
-    parts = re.findall(r'-?\d+', numbers_str)
-    # Convert parts to integers and create a tuple
-    bounds_tuple = tuple(int(part) for part in parts)
-    return bounds_tuple
+    kept = []
+    if all_coords:
+        screen_bounds, on_screen = geometry.clip_to_screen(np.array(all_coords, dtype=np.int64))
+        kept = on_screen.tolist()
+        tree_index.kept = kept
+        for position, (x1, y1, x2, y2) in zip(np.flatnonzero(on_screen).tolist(), screen_bounds[on_screen].tolist()):
+            tree_index.nodes[position].bounds = ((x1, y1), (x2, y2))
+
+    # Depth-first with a stack, so the last child of a node comes first
+    target_elements = []
+    stack = list(tree_index.roots)
+    while stack:
+        position = stack.pop()
+        if kept[position]:
+            target_elements.append(tree_index.nodes[position])
+        stack.extend(tree_index.children[position])
+    return target_elements
 
 
 
 def in_bounds_1(areas: set, coord: tuple):
+    if isinstance(areas, RectIndex):
+        return areas.contains_point(coord[0], coord[1])
     for a in areas:
         if a[0] <= coord[0] <= a[2] and a[1] <= coord[1] <= a[3]:
             return True
@@ -488,33 +377,13 @@ def in_bounds_1(areas: set, coord: tuple):
 
 
 def in_bounds_2(areas: set, coord: tuple):
+    if isinstance(areas, RectIndex):
+        return areas.contains_point(coord[0], coord[1], strict=True)
     for a in areas:
         if in_bound(a, coord):
             return True
     return False
 
-def is_accessibility_focus_changed_after_clicking(file_path : str) -> bool:
-    print()
-    is_accessibility_focus_changed = False
-    last_event_type = None
-
-    try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                if "EventType: TYPE_VIEW_CLICKED" in line:
-                    last_event_type = "TYPE_VIEW_CLICKED"
-                elif "EventType:" in line:
-                    current_event_type = line.split("EventType:")[1].split(";")[0].strip()
-                    if last_event_type == "TYPE_VIEW_CLICKED" and (current_event_type == "TYPE_VIEW_ACCESSIBILITY_FOCUSED"):
-                        is_accessibility_focus_changed = True
-                        break
-    except:
-        print(f"Error: Failed to read the file {file_path}.")
-        return False
-
-    return is_accessibility_focus_changed
-
-
 
 
 def get_base_paths(dataset_dir: str) -> list:
@@ -530,33 +399,71 @@ def get_base_paths(dataset_dir: str) -> list:
     return result
 
 
-def import_data(base_path: str) -> tuple:
-    """Imports all related data in the given directory"""
+def get_scenario_folder(base_path: str) -> str:
+    """Returns the folder holding the files of the scenario at the given base path"""
+    # Base paths are the scenario folder followed by the name of the scenario
+    return os.path.dirname(base_path)
+
+
+def get_timeline_dumps(folder: str) -> list:
+    """Returns the dumps a scenario took between its action and final dumps, in timeline order"""
+    dumps = []
+    for path in glob.glob(f"{folder}/{TIMELINE_DUMP_PATTERN}"):
+        match = re.search(TIMELINE_DUMP_REGEX, path)
+        if match:
+            dumps.append((int(match.group(1)), path))
+    return [path for _, path in sorted(dumps)]
+
+
+def import_data(base_path: str, hasher=None, prefetched: dict = None) -> tuple:
+    """Imports all related data in the given directory. hasher is the image_fingerprint.ImageHasher comparing the
+    screenshots, by default the shared one. prefetched maps the paths of files that were already read to their
+    content, see scenario_cache.prefetch_scenario"""
+    prefetched = prefetched or {}
     # Load events from event log
-    parts = base_path.split('/')
-    # Rejoin the first parts up to the first three slashes
-    base_path = '/'.join(parts[:3])
-    events = load_event_log(glob.glob(f"{base_path}/*-ev.txt")[0])
-    full_events = load_all_events(glob.glob(f"{base_path}/*-ev.txt")[0])
+    base_path = get_scenario_folder(base_path)
+    # Read the event log once and derive all event-based flags from it
+    with span("parse_events") as stage:
+        event_log_path = glob.glob(f"{base_path}/*-ev.txt")[0]
+        event_log = parse_event_log(event_log_path, prefetched.get(event_log_path))
+        stage.count(events=len(event_log.full_events))
+    events = event_log.events
+    full_events = event_log.full_events
     # Import ally node elements
-    target_elements_1 = load_all_elements(glob.glob(f"{base_path}/*.1-a11y.xml")[0])
-    image_initial = glob.glob(f"{base_path}/*.1.png")[0]
-    image_final = glob.glob(f"{base_path}/*.3.png")[0]
-    is_scrolling_new_content, is_click_new_window = analyze_events_scroll_click(glob.glob(f"{base_path}/*-ev.txt")[0])
-    target_elements_middle = load_all_elements(glob.glob(f"{base_path}/*.action-a11y.xml")[0])
-
-    target_elements_2 = load_all_elements(glob.glob(f"{base_path}/*.3-a11y.xml")[0])
-    last_focused_bounds, last_clicked_bounds = extract_bounds_of_last_focused_element(glob.glob(f"{base_path}/*-ev.txt")[0])
+    with span("parse_xml_initial") as stage:
+        dump = glob.glob(f"{base_path}/*.1-a11y.xml")[0]
+        target_elements_1 = load_all_elements(dump, prefetched.get(dump))
+        stage.count(nodes=len(target_elements_1))
+    # Screenshots are optional, e.g. in uploads to the analysis service
+    screenshots = glob.glob(f"{base_path}/*.1.png")[:1] + glob.glob(f"{base_path}/*.3.png")[:1]
+    is_scrolling_new_content, is_click_new_window = event_log.is_scrolling_new_content, event_log.is_click_new_window
+    with span("parse_xml_middle") as stage:
+        dump = glob.glob(f"{base_path}/*.action-a11y.xml")[0]
+        target_elements_middle = load_all_elements(dump, prefetched.get(dump))
+        stage.count(nodes=len(target_elements_middle))
+    intermediate_frames = []
+    timeline_dumps = get_timeline_dumps(base_path)
+    if timeline_dumps:
+        with span("parse_xml_timeline") as stage:
+            intermediate_frames = [load_all_elements(dump, prefetched.get(dump)) for dump in timeline_dumps]
+            stage.count(frames=len(intermediate_frames), nodes=sum(len(frame) for frame in intermediate_frames))
+
+    with span("parse_xml_final") as stage:
+        dump = glob.glob(f"{base_path}/*.3-a11y.xml")[0]
+        target_elements_2 = load_all_elements(dump, prefetched.get(dump))
+        stage.count(nodes=len(target_elements_2))
+    last_focused_bounds, last_clicked_bounds = event_log.last_focused_bounds, event_log.last_clicked_bounds
     # Check if window change occurred
-    w_changed = check_event(glob.glob(f"{base_path}/*-ev.txt")[0], ['TYPE_WINDOWS_CHANGED', 'TYPE_WINDOW_STATE_CHANGED'])
+    w_changed = event_log.window_changed
     # Check if accessibility focus occurred
     has_accessibility_focus = True in [True for i in events if i[2] == 'TYPE_VIEW_ACCESSIBILITY_FOCUSED']
     is_significant_new_content = False
-    if not is_scrolling_new_content and not is_click_new_window:
-        if not compare_images(image_initial, image_final):
-            is_significant_new_content = True
+    if not is_scrolling_new_content and not is_click_new_window and len(screenshots) == 2:
+        with span("compare_images"):
+            if not compare_images(*[prefetched.get(path, path) for path in screenshots], hasher=hasher):
+                is_significant_new_content = True
     is_accessibility_focus_changed = False
     if is_significant_new_content:
-        is_accessibility_focus_changed = is_accessibility_focus_changed_after_clicking(glob.glob(f"{base_path}/*-ev.txt")[0])
+        is_accessibility_focus_changed = event_log.is_accessibility_focus_changed
 
-    return events, full_events, target_elements_1, target_elements_middle, target_elements_2, w_changed, has_accessibility_focus, is_scrolling_new_content, is_click_new_window, last_focused_bounds, last_clicked_bounds, is_significant_new_content, is_accessibility_focus_changed
+    return events, full_events, target_elements_1, target_elements_middle, target_elements_2, w_changed, has_accessibility_focus, is_scrolling_new_content, is_click_new_window, last_focused_bounds, last_clicked_bounds, is_significant_new_content, is_accessibility_focus_changed, intermediate_frames
@@ -0,0 +1,99 @@
+import glob
+import math
+import os
+import time
+from run_manifest import RESULT_FILE_PATTERNS
+from scenario_cache import file_stat, scenario_input_files
+from utils import get_base_paths, get_scenario_folder
+
+
+class ScenarioWatcher:
+    """Polls a dataset folder for scenario folders that the capture scripts finished writing.
+
+    A scenario is ready once a file matches each of the patterns and the sizes and mtimes of those files did not
+    change for settle_seconds. Folders are only listed again when their own mtime changes, so polling a large
+    dataset stays cheap. A finished scenario is reported again when its files change later. Rewriting a file in
+    place does not change the mtime of its folder, so the files of finished scenarios are stat'ed too: those
+    reported within the last recheck_seconds on every poll, since capture scripts usually rewrite a file soon after
+    writing it, and all others only once every recheck_seconds."""
+    def __init__(self, dataset_dir: str, patterns=RESULT_FILE_PATTERNS, settle_seconds: float = 2.0,
+                 recheck_seconds: float = 60.0):
+        self.dataset_dir = dataset_dir
+        self.patterns = patterns
+        self.settle_seconds = settle_seconds
+        self.recheck_seconds = recheck_seconds
+        # Base path -> (stats of its files, time they were first seen unchanged)
+        self.pending = dict()
+        # Base path -> stats of its files when it was reported
+        self.done = dict()
+        # Base path -> time it was reported, not set for scenarios marked as done
+        self.reported_at = dict()
+        self.last_recheck = None
+        self.folder_mtimes = dict()
+
+    def stats(self, base_path: str):
+        """Returns {path: [size, mtime_ns]} of the files of a scenario, or None while a pattern has no match"""
+        folder = get_scenario_folder(base_path)
+        if not all(glob.glob(f"{folder}/{pattern}") for pattern in self.patterns):
+            return None
+        files = scenario_input_files(base_path, self.patterns)
+        try:
+            return {path: file_stat(path) for path in files}
+        except FileNotFoundError:
+            # Moved away while polling
+            return None
+
+    def mark_done(self, base_path: str, stats: dict = None) -> None:
+        """Records a scenario as analyzed, e.g. by a run before watching started"""
+        self.done[base_path] = stats if stats is not None else self.stats(base_path)
+        self.pending.pop(base_path, None)
+        self._folder_changed(base_path)
+
+    def _folder_changed(self, base_path: str) -> bool:
+        try:
+            mtime = os.stat(get_scenario_folder(base_path)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        changed = self.folder_mtimes.get(base_path) != mtime
+        self.folder_mtimes[base_path] = mtime
+        return changed
+
+    def _files_changed(self, base_path: str, now: float, recheck_all: bool) -> bool:
+        """Whether a file of a reported scenario changed since it was reported. Unless recheck_all, only the files of
+        scenarios reported within the last recheck_seconds are checked"""
+        stats = self.done.get(base_path)
+        if not stats:
+            return False
+        if not recheck_all and now - self.reported_at.get(base_path, -math.inf) >= self.recheck_seconds:
+            return False
+        try:
+            return any(file_stat(path) != stat for path, stat in stats.items())
+        except FileNotFoundError:
+            return True
+
+    def poll(self, now: float = None) -> list:
+        """Returns the base paths of the scenarios that became ready since the last poll"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        if not os.path.isdir(self.dataset_dir):
+            return ready
+        recheck_all = self.last_recheck is None or now - self.last_recheck >= self.recheck_seconds
+        if recheck_all:
+            self.last_recheck = now
+        for base_path in get_base_paths(self.dataset_dir):
+            if (base_path not in self.pending and not self._folder_changed(base_path) and
+                    not self._files_changed(base_path, now, recheck_all)):
+                continue
+            stats = self.stats(base_path)
+            if stats is None or stats == self.done.get(base_path):
+                self.pending.pop(base_path, None)
+                continue
+            previous = self.pending.get(base_path)
+            if previous is None or previous[0] != stats:
+                self.pending[base_path] = (stats, now)
+            elif now - previous[1] >= self.settle_seconds:
+                del self.pending[base_path]
+                self.done[base_path] = stats
+                self.reported_at[base_path] = now
+                ready.append(base_path)
+        return ready